@@ -0,0 +1,392 @@
+"""asyncio execution backend, an alternative to engine.ParallelExecutor.
+
+Each database is a coroutine and all of them are fanned out with
+asyncio.gather. Every blocking driver call (connect, execute, fetchmany,
+commit) runs in a bounded thread pool, aioodbc style, so the event loop
+itself never blocks. A database that runs past the RunControl db_timeout,
+or every database after cancel(), is stopped through the driver with
+cursor.cancel().
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import (
+    DEFAULT_MAX_CONCURRENCY, OrderedMerge, RunControl, StatementCache, StatementStats, apply_statement_timeout,
+    cache_lookup, cache_store, cached_batches, commit_or_doubt, commit_transaction, finish_db_task, log_statement_error,
+    raise_in_transaction, retry_delay, retry_transaction, skip_completed, statement_args, worker_capacity,
+)
+from retry import is_connection_error, is_deadlock
+from streaming import RowBatch, estimate_bytes, DEFAULT_FETCH_SIZE
+
+# Seconds to wait for an interrupted driver call before the connection is dropped
+CANCEL_GRACE = 5
+
+
+class AsyncCursor:
+    """Awaitable wrapper around a DB-API cursor; blocking calls run in the executor"""
+
+    def __init__(self, cursor, run):
+        self._cursor = cursor
+        self._run = run
+        self._pending = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    async def _call(self, method, *args):
+        self._pending = self._run(method, *args)
+        try:
+            return await asyncio.wrap_future(self._pending)
+        finally:
+            if self._pending.done():
+                self._pending = None
+
+    async def execute(self, sql, *params):
+        return await self._call(self._cursor.execute, sql, *params)
+
+    async def execute_bulk(self, statement):
+        """Run a bulk statement (bulk_load.BulkInsert) on the wrapped cursor"""
+        return await self._call(statement.execute, self._cursor)
+
+    async def fetchmany(self, size):
+        return await self._call(self._cursor.fetchmany, size)
+
+    async def nextset(self):
+        return await self._call(self._cursor.nextset)
+
+    async def close(self):
+        return await self._call(self._cursor.close)
+
+    async def interrupt(self):
+        """Cancel the statement in flight and wait (briefly) for its call to return"""
+        pending = self._pending
+        if pending is None:
+            return True
+        cancel = getattr(self._cursor, "cancel", None)
+        if cancel is not None:
+            try:
+                cancel()
+            except Exception:
+                pass
+        done, _ = await asyncio.wait([asyncio.wrap_future(pending)], timeout=CANCEL_GRACE)
+        for future in done:
+            # The interrupted call normally fails; that error is expected
+            future.exception()
+        return bool(done)
+
+
+async def stream_results_async(task, cursor, statement_index, emit=None, fetch_size=DEFAULT_FETCH_SIZE, stats=None,
+                               capture=None):
+    """Async counterpart of engine.stream_results; emit is awaited"""
+    result_index = 0
+    while True:
+        if cursor.description is not None:
+            columns = [desc[0] for desc in cursor.description]
+            if not task.columns:
+                task.columns = columns
+            if capture is not None:
+                capture.start(columns)
+
+            returned = 0
+            while True:
+                rows = await cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                returned += len(rows)
+                if stats is not None or capture is not None:
+                    nbytes = estimate_bytes(rows)
+                    if stats is not None:
+                        # Counted per batch: rows already streamed must not be sent again on retry
+                        stats.rows += len(rows)
+                        stats.bytes += nbytes
+                    if capture is not None:
+                        capture.add(rows, nbytes)
+                if emit:
+                    await emit(RowBatch(task.server, task.db, columns, rows, statement_index, result_index,
+                                        cursor.description))
+
+            task.row_count += returned
+            if stats is not None:
+                stats.result_sets += 1
+            task.log(f"  📊 Result set {result_index + 1} returned {returned} row(s)")
+            result_index += 1
+
+        elif cursor.rowcount != -1:
+            task.log(f"  🔄 {cursor.rowcount} row(s) affected")
+
+        if not await cursor.nextset():
+            return
+
+
+async def run_statement_async(task, conn, cursor, index, run, control, emit=None, fetch_size=DEFAULT_FETCH_SIZE):
+    """Async counterpart of engine.run_statement (deadlock retries, lost connections raised,
+    no per-statement commit in the transactional commit modes)"""
+    attempt = 0
+    cache = control.cache
+    while True:
+        statement = task.statements[index]
+        stats = StatementStats(index, str(statement))
+        task.statement_stats.append(stats)
+        try:
+            mark = time.perf_counter()
+            key = capture = cached = None
+            if isinstance(statement, str):
+                args = statement_args(task, statement)
+                key, cached = cache_lookup(task, args, stats, cache, control.cache_results)
+            if cached is not None:
+                for batch in cached_batches(task, cached, index, fetch_size, stats):
+                    if emit:
+                        await emit(batch)
+                stats.fetch_s = time.perf_counter() - mark
+            elif isinstance(statement, str):
+                if key is not None:
+                    capture = cache.capture()
+                await cursor.execute(*args)
+                stats.execute_s = time.perf_counter() - mark
+                await stream_results_async(task, cursor, index, emit, fetch_size, stats, capture)
+                stats.fetch_s = time.perf_counter() - mark - stats.execute_s
+            else:
+                if cache is not None:
+                    task.wrote = True
+                    cache.invalidate(task.server, task.db)
+                loaded = await cursor.execute_bulk(statement)
+                stats.execute_s = time.perf_counter() - mark
+                task.log(f"  📥 {loaded} row(s) loaded into {statement.table}")
+            if not control.transactional and cached is None:
+                mark = time.perf_counter()
+                await asyncio.wrap_future(run(commit_or_doubt, task, conn))
+                stats.commit_s = time.perf_counter() - mark
+            cache_store(task, key, capture, cache, control.transactional)
+
+        except Exception as stmt_err:
+            stats.error = str(stmt_err)
+            if task.in_doubt:
+                raise
+            if control.transactional:
+                raise_in_transaction(task, index, stmt_err)
+            if is_connection_error(stmt_err):
+                if not stats.rows:
+                    raise
+                # Reconnecting would run the statement again and stream its rows twice
+                task.log(f"  ⚠️ Connection lost after {stats.rows} row(s) were streamed; statement {index + 1} is not retried")
+            delay = retry_delay(task, control, stmt_err, attempt) if is_deadlock(stmt_err) and not stats.rows else None
+            if delay is not None:
+                await asyncio.wrap_future(run(_quietly, conn.rollback))
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            log_statement_error(task, stmt_err, control.statement_timeout)
+            return
+
+        if control.journal is not None and not control.transactional:
+            control.journal.statement_done(task.server, task.db, index)
+        return
+
+
+async def cached_cursor_async(cache, conn, statement, run):
+    """Async counterpart of engine.cached_cursor"""
+    key = str(statement)
+    cursor = cache.get(key)
+    if cursor is None:
+        cursor = AsyncCursor(await asyncio.wrap_future(run(conn.cursor)), run)
+        evicted = cache.put(key, cursor)
+        if evicted is not None:
+            await evicted.close()
+    return cursor
+
+
+async def run_statements_async(task, pool, run, control, emit=None, fetch_size=DEFAULT_FETCH_SIZE, started=None):
+    """Async counterpart of engine.run_statements.
+
+    run(func, *args) submits a blocking call and returns a concurrent future.
+    Cancellation (timeout or cancel()) interrupts the running statement and
+    drops the connection instead of returning it to the pool. The
+    transactional commit modes commit or hold the connection at the end.
+    """
+    acquiring = run(pool.acquire, task.server, task.db)
+    try:
+        pooled = await asyncio.wrap_future(acquiring)
+    except asyncio.CancelledError:
+        # The blocking acquire keeps running; give its connection back when it lands
+        acquiring.add_done_callback(functools.partial(_release_late, pool))
+        raise
+    task.connect_s = time.perf_counter() - (started or time.perf_counter())
+    journal = control.journal
+    discard = held = False
+    cursor = None
+    cache = StatementCache()
+    try:
+        apply_statement_timeout(pooled.conn, control.statement_timeout)
+
+        while task.next_statement < len(task.statements):
+            index = task.next_statement
+            if journal is not None and journal.statement_completed(task.server, task.db, index):
+                task.log(f"  ⏭️ Statement {index + 1} already done in a previous run")
+            else:
+                cursor = await cached_cursor_async(cache, pooled.conn, task.statements[index], run)
+                await run_statement_async(task, pooled.conn, cursor, index, run, control, emit, fetch_size)
+            task.next_statement += 1
+
+        for cached in cache.drain():
+            await cached.close()
+        if control.commit_mode == "database":
+            await asyncio.wrap_future(run(commit_transaction, task, pooled.conn))
+        elif control.prepared is not None:
+            control.prepared.hold(task, pooled)
+            held = True
+
+    except BaseException:
+        discard = True
+        if cursor is not None:
+            await cursor.interrupt()
+        raise
+    finally:
+        if not held:
+            await asyncio.wrap_future(run(pool.release, pooled, discard))
+
+
+async def run_db_task_async(task, pool, run, control, emit=None, fetch_size=DEFAULT_FETCH_SIZE):
+    """Async counterpart of engine.run_db_task; lost connections are retried with backoff"""
+    if skip_completed(task, control.journal):
+        return task
+    task.status = "running"
+    task.log(f"\n🟦========== Executing on database: {task.db} ==========")
+
+    started = time.perf_counter()
+    error = None
+    attempt = 0
+    while True:
+        try:
+            await run_statements_async(task, pool, run, control, emit, fetch_size, started)
+            break
+        except Exception as db_err:
+            delay = retry_delay(task, control, db_err, attempt) if retry_transaction(task, control) else None
+            if delay is None:
+                error = db_err
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    task.elapsed_s = time.perf_counter() - started
+    if task.status != "prepared":
+        finish_db_task(task, control, error=error)
+    return task
+
+
+class AsyncExecutor:
+    """Runs DbTasks as asyncio coroutines; drop-in replacement for ParallelExecutor.
+
+    run() owns its event loop (asyncio.run), so it can be called from any
+    thread that has none running. Timeouts come from the RunControl, whose
+    cancel() (or this executor's) may be called from any thread.
+    """
+
+    def __init__(self, pool, max_concurrency=DEFAULT_MAX_CONCURRENCY, server_limits=None,
+                 pipeline=None, fetch_size=DEFAULT_FETCH_SIZE, control=None):
+        self.pool = pool
+        self.pipeline = pipeline
+        self.fetch_size = fetch_size
+        self.control = control or RunControl()
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.server_limits = dict(server_limits or {})
+        self._loop = None
+        self._futures = []
+        self._lock = threading.Lock()
+        self.control.add_listener(self._on_cancel)
+
+    def cancel(self):
+        """Stop scheduling databases and interrupt the ones in flight"""
+        self.control.cancel()
+
+    def _on_cancel(self):
+        with self._lock:
+            loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._cancel_all)
+
+    def _cancel_all(self):
+        for future in self._futures:
+            future.cancel()
+
+    def run(self, tasks, on_complete=None, on_merge=None):
+        """Execute tasks and block until all are finished (same contract as ParallelExecutor.run)"""
+        tasks = list(tasks)
+        asyncio.run(self._run_all(tasks, on_complete, on_merge))
+        return tasks
+
+    async def _run_all(self, tasks, on_complete, on_merge):
+        workers = worker_capacity(tasks, self.max_concurrency, self.server_limits)
+        slots = {}
+        for task in tasks:
+            if task.server not in slots:
+                limit = self.server_limits.get(task.server, self.max_concurrency)
+                slots[task.server] = asyncio.Semaphore(max(1, int(limit)))
+        merge = OrderedMerge(on_merge)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlrunner-async") as threads:
+            run = threads.submit
+            emit = None
+            if self.pipeline:
+                emit = lambda batch: asyncio.wrap_future(run(self.pipeline.emit, batch))
+
+            async def run_one(position, task):
+                try:
+                    async with slots[task.server]:
+                        await self._run_task(task, run, emit)
+                except asyncio.CancelledError:
+                    # Cancelled while waiting for a slot; a finished task keeps its outcome
+                    if task.status == "pending":
+                        task.status = "cancelled"
+                        task.log(f"🚫 Skipped {task.db} (cancelled)")
+                if on_complete:
+                    on_complete(task)
+                merge.add(position, task)
+
+            with self._lock:
+                self._loop = asyncio.get_running_loop()
+                self._futures = [asyncio.ensure_future(run_one(i, task)) for i, task in enumerate(tasks)]
+                if self.control.cancelled:
+                    self._cancel_all()
+            try:
+                await asyncio.gather(*self._futures, return_exceptions=True)
+            finally:
+                with self._lock:
+                    self._loop = None
+
+    async def _run_task(self, task, run, emit):
+        control = self.control
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                run_db_task_async(task, self.pool, run, control, emit, self.fetch_size),
+                timeout=control.db_timeout,
+            )
+        except asyncio.TimeoutError:
+            task.elapsed_s = time.perf_counter() - started
+            finish_db_task(task, control, stopped="timeout")
+        except asyncio.CancelledError:
+            task.elapsed_s = time.perf_counter() - started
+            finish_db_task(task, control, stopped="cancelled")
+        finally:
+            if self.pipeline:
+                await asyncio.wrap_future(run(self.pipeline.end_database, task.server, task.db))
+
+
+def _quietly(func):
+    try:
+        func()
+    except Exception:
+        pass
+
+
+def _release_late(pool, future):
+    if not future.cancelled() and future.exception() is None:
+        pool.release(future.result())
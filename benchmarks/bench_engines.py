@@ -0,0 +1,47 @@
+"""Thread-pool vs asyncio engine on a stand-in driver with injected latency.
+
+    python -m benchmarks.bench_engines [databases] [latency_ms]
+"""
+import sys
+import time
+
+from benchmarks.fake_driver import FakeDriver
+from connection_pool import ConnectionPool
+from engine import ENGINES, run_script
+from streaming import RowSink
+
+SCRIPT = "SELECT * FROM t\nGO\nUPDATE t SET c0 = c0\nGO\nSELECT * FROM t"
+
+
+class CountingSink(RowSink):
+    def __init__(self):
+        self.rows = 0
+
+    def write_batch(self, batch):
+        self.rows += len(batch.rows)
+
+
+def main():
+    databases = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    driver = FakeDriver(latency=latency, connect_latency=latency, rows=100, databases=databases)
+    dbs = driver.database_names
+    ideal = databases * 3 * latency
+
+    print(f"{databases} databases, {latency * 1000:.0f} ms per statement, 3 statements each")
+    print(f"{'engine':<8} {'parallel':>8} {'seconds':>8} {'db/s':>8} {'speedup':>8} {'rows':>8}")
+    for parallel in (1, 8, 32):
+        for engine in ENGINES:
+            pool = ConnectionPool(driver.connect, max_per_server=parallel)
+            sink = CountingSink()
+            start = time.perf_counter()
+            tasks, _ = run_script(pool, "bench", dbs, SCRIPT, [sink], parallel, engine=engine)
+            elapsed = time.perf_counter() - start
+            pool.close_all()
+            failed = sum(task.status != "done" for task in tasks)
+            print(f"{engine:<8} {parallel:>8} {elapsed:>8.2f} {databases / elapsed:>8.1f} "
+                  f"{ideal / elapsed:>7.1f}x {sink.rows:>8}" + (f"  ({failed} failed)" if failed else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Render cost of the results grid as the row count grows.
+
+Run from the repository root (needs a display):
+    python -m benchmarks.bench_grid
+"""
+import random
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from result_grid import VirtualGrid
+
+COLUMNS = ["dbname", "id", "name", "amount", "created"]
+SIZES = [1000, 10000, 100000, 1000000]
+SCROLLS = 200
+LEGACY_MAX_ROWS = 10000
+
+
+def make_rows(count):
+    return [(f"tenant_{i % 300:03d}", i, f"row {i}", i * 1.5, "2025-01-01") for i in range(count)]
+
+
+def bench_virtual(root, rows):
+    grid = VirtualGrid(root)
+    grid.pack(fill=tk.BOTH, expand=True)
+    root.update()
+
+    start = time.perf_counter()
+    grid.set_columns(COLUMNS)
+    grid.set_rows(rows)
+    root.update_idletasks()
+    first_render = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(SCROLLS):
+        grid.scroll_to(random.randrange(len(rows)))
+        root.update_idletasks()
+    per_scroll = (time.perf_counter() - start) / SCROLLS
+
+    start = time.perf_counter()
+    rows.extend(make_rows(1000))
+    grid.refresh()
+    root.update_idletasks()
+    append = time.perf_counter() - start
+
+    grid.destroy()
+    return first_render, per_scroll, append
+
+
+def bench_legacy(root, rows):
+    # The old show_results_table: clear and insert every row into a Treeview
+    tree = ttk.Treeview(root, columns=COLUMNS, show="headings")
+    tree.pack(fill=tk.BOTH, expand=True)
+    start = time.perf_counter()
+    tree.delete(*tree.get_children())
+    for row in rows:
+        tree.insert("", tk.END, values=row)
+    root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    tree.destroy()
+    return elapsed
+
+
+def main():
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"Cannot open a display for the grid benchmark: {e}", file=sys.stderr)
+        return 1
+    root.geometry("900x600")
+
+    print(f"{'rows':>10} {'first render ms':>16} {'scroll ms':>10} {'append ms':>10} {'legacy ms':>10}")
+    for size in SIZES:
+        rows = make_rows(size)
+        first_render, per_scroll, append = bench_virtual(root, rows)
+        legacy = bench_legacy(root, rows[:size]) if size <= LEGACY_MAX_ROWS else None
+        legacy_text = f"{legacy * 1000:10.1f}" if legacy is not None else f"{'-':>10}"
+        print(f"{size:>10} {first_render * 1000:16.2f} {per_scroll * 1000:10.3f} {append * 1000:10.2f} {legacy_text}")
+
+    root.destroy()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Filter latency of the database selection model (no display needed).
+
+    python -m benchmarks.bench_selector [count]
+"""
+import random
+import string
+import sys
+import time
+
+from selection import SelectionModel
+
+FRAME_MS = 16.7
+
+
+def make_names(count):
+    rng = random.Random(42)
+    return [f"tenant_{rng.choice(['eu', 'us', 'ap'])}_{''.join(rng.choices(string.ascii_lowercase, k=8))}_{i}"
+            for i in range(count)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    model = SelectionModel(make_names(count))
+    online = lambda name: not name.endswith("7")
+
+    # A user typing "tenant_eu_ab" one key at a time, then switching modes
+    steps = [("tenant_eu_ab"[:i], "substring") for i in range(1, 13)]
+    steps += [("tenant_us", "prefix"), (r"_ap_[a-y]*z", "regex"), ("", "substring")]
+
+    print(f"{count} names, frame budget {FRAME_MS} ms")
+    print(f"{'query':<16} {'mode':<10} {'ms':>7} {'shown':>7}")
+    worst = 0.0
+    for query, mode in steps:
+        start = time.perf_counter()
+        visible = model.filter(query, mode, online)
+        elapsed = (time.perf_counter() - start) * 1000
+        worst = max(worst, elapsed)
+        print(f"{query:<16} {mode:<10} {elapsed:7.2f} {len(visible):>7}")
+    print(f"worst: {worst:.2f} ms ({'within' if worst < FRAME_MS else 'over'} one frame)")
+
+
+if __name__ == "__main__":
+    main()
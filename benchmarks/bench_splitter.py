@@ -0,0 +1,61 @@
+"""Throughput of the T-SQL batch splitter against the old \\bGO\\b regex.
+
+    python -m benchmarks.bench_splitter [size_mb]
+"""
+import re
+import sys
+import time
+
+import sql_splitter
+
+BATCH = """-- deploy step {i}
+CREATE TABLE dbo.CATEGORY_GO_{i} (id int NOT NULL, [name GO] nvarchar(50), note varchar(200));
+/* seed data
+   GO is not a separator in here */
+INSERT INTO dbo.CATEGORY_GO_{i} VALUES ({i}, N'it''s a GO', 'line one
+GO
+line three');
+GO
+"""
+
+
+def make_script(size_mb):
+    parts = []
+    size = 0
+    i = 0
+    while size < size_mb * 1024 * 1024:
+        part = BATCH.format(i=i)
+        parts.append(part)
+        size += len(part)
+        i += 1
+    return "".join(parts)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def regex_split(script):
+    return [s.strip() for s in re.split(r"\bGO\b", script, flags=re.IGNORECASE) if s.strip()]
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 50
+    script = make_script(size_mb)
+    mb = len(script) / (1024 * 1024)
+
+    regex_time, regex_batches = timed(regex_split, script)
+    parse_time, batches = timed(sql_splitter.split_batches, script)
+    cached_time, _ = timed(sql_splitter.split_batches, script)
+
+    print(f"script: {mb:.1f} MB")
+    print(f"{'method':<18} {'seconds':>8} {'MB/s':>8} {'batches':>8}")
+    print(f"{'regex':<18} {regex_time:8.3f} {mb / regex_time:8.1f} {len(regex_batches):>8}  (splits inside strings and comments)")
+    print(f"{'tokenizer':<18} {parse_time:8.3f} {mb / parse_time:8.1f} {len(batches):>8}")
+    print(f"{'tokenizer cached':<18} {cached_time:8.3f} {mb / cached_time:8.1f} {len(batches):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""End-to-end benchmark suite on the SQLite-backed fake driver (no SQL Server needed).
+
+Scenarios, each across a range of database counts:
+    run      - run_script with the GUI's collecting sink (what run_script_on_dbs does)
+    export   - run_script streaming into FileSink (csv, jsonl, parquet if pyarrow is installed)
+    catalog  - DatabaseCatalog.refresh over the fake sys.databases
+    render   - VirtualGrid.set_rows + scrolling over the collected rows (needs a display)
+
+Results are printed as JSON (or written with --output) so runs can be diffed:
+    python -m benchmarks.bench_suite --dbs 1,10,100,1000,5000 --output bench.json
+    python -m benchmarks.bench_suite --scenarios run --latency-ms 5 --error-rate 0.01
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_driver import FakeDriver
+from catalog import DatabaseCatalog
+from connection_pool import ConnectionPool
+from engine import DEFAULT_ENGINE, ENGINES, run_script
+from exporters import FileSink, pa
+from streaming import CollectingSink
+
+SCENARIOS = ("run", "export", "catalog", "render")
+SCRIPT = "SELECT * FROM t\nGO\nUPDATE t SET c0 = c0 + 1 WHERE c0 % 10 = 0\nGO\nSELECT COUNT(*) AS n FROM t"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the runner against a fake ODBC driver.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--dbs", default="1,10,100,1000", help="comma separated database counts")
+    parser.add_argument("--rows", type=int, default=100, help="rows returned by SELECT * per database")
+    parser.add_argument("--width", type=int, default=6, help="columns per row")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="latency per statement")
+    parser.add_argument("--connect-latency-ms", type=float, default=10.0, help="latency per new connection")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of statements that fail")
+    parser.add_argument("--parallel", type=int, default=16)
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser
+
+
+def make_driver(args, databases):
+    return FakeDriver(
+        latency=args.latency_ms / 1000, connect_latency=args.connect_latency_ms / 1000,
+        rows=args.rows, width=args.width, error_rate=args.error_rate, databases=databases,
+    )
+
+
+def run_once(args, driver, sinks):
+    pool = ConnectionPool(driver.connect, max_per_server=args.parallel)
+    start = time.perf_counter()
+    tasks, sink_errors = run_script(pool, "bench", driver.database_names, SCRIPT, sinks, args.parallel,
+                                    engine=args.engine)
+    elapsed = time.perf_counter() - start
+    pool.close_all()
+    statement_errors = sum(1 for task in tasks for stats in task.statement_stats if stats.error)
+    return elapsed, {
+        "failed_dbs": sum(task.status != "done" for task in tasks),
+        "statement_errors": statement_errors,
+        "rows": sum(task.row_count for task in tasks),
+        "connections": driver.connections,
+        "sink_errors": len(sink_errors),
+    }
+
+
+def bench_run(args, databases):
+    driver = make_driver(args, databases)
+    sink = CollectingSink()
+    elapsed, extra = run_once(args, driver, [sink])
+    return [dict(extra, seconds=elapsed, dbs_per_s=databases / elapsed)]
+
+
+def bench_export(args, databases):
+    results = []
+    formats = ["csv", "jsonl"] + (["parquet"] if pa is not None else [])
+    directory = tempfile.mkdtemp(prefix="sqlrunner-bench-")
+    try:
+        for fmt in formats:
+            driver = make_driver(args, databases)
+            sink = FileSink(os.path.join(directory, f"out.{fmt}"), fmt)
+            elapsed, extra = run_once(args, driver, [sink])
+            size = sum(os.path.getsize(path) for path in sink.files)
+            results.append(dict(extra, format=fmt, seconds=elapsed, rows_written=sink.rows_written,
+                                bytes_written=size, rows_per_s=sink.rows_written / elapsed))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def bench_catalog(args, databases):
+    driver = make_driver(args, databases)
+    pool = ConnectionPool(driver.connect)
+    directory = tempfile.mkdtemp(prefix="sqlrunner-bench-")
+    try:
+        catalog = DatabaseCatalog("bench", path=os.path.join(directory, "catalog.json"))
+        start = time.perf_counter()
+        catalog.refresh(pool)
+        refresh = time.perf_counter() - start
+
+        cached = DatabaseCatalog("bench", path=catalog.path)
+        start = time.perf_counter()
+        cached.load()
+        load = time.perf_counter() - start
+    finally:
+        pool.close_all()
+        shutil.rmtree(directory, ignore_errors=True)
+    return [{"seconds": refresh, "refresh_s": refresh, "cache_load_s": load, "names": len(cached.names)}]
+
+
+def bench_render(args, databases):
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return [{"skipped": f"no display: {e}"}]
+
+    from result_grid import VirtualGrid
+
+    driver = make_driver(args, databases)
+    sink = CollectingSink()
+    run_once(args, driver, [sink])
+    rows = sink.result_sets[0].rows if sink.result_sets else []
+    try:
+        grid = VirtualGrid(root)
+        grid.pack(fill=tk.BOTH, expand=True)
+        root.update()
+        start = time.perf_counter()
+        grid.set_columns(sink.result_sets[0].columns if sink.result_sets else ["dbname"])
+        grid.set_rows(rows)
+        root.update_idletasks()
+        first = time.perf_counter() - start
+
+        steps = 100
+        start = time.perf_counter()
+        for i in range(steps):
+            grid.scroll_to(i * max(1, len(rows) // steps))
+            root.update_idletasks()
+        per_scroll = (time.perf_counter() - start) / steps
+    finally:
+        root.destroy()
+    return [{"seconds": first, "rows": len(rows), "first_render_s": first, "scroll_s": per_scroll}]
+
+
+BENCHMARKS = {"run": bench_run, "export": bench_export, "catalog": bench_catalog, "render": bench_render}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown scenario(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    counts = [int(n) for n in args.dbs.split(",")]
+
+    report = {
+        "meta": {
+            "timestamp": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "scenarios", "dbs")},
+        },
+        "results": [],
+    }
+    for name in scenarios:
+        for databases in counts:
+            for result in BENCHMARKS[name](args, databases):
+                report["results"].append(dict({"scenario": name, "databases": databases}, **result))
+                print(f"{name:<8} {databases:>5} dbs  {result.get('seconds', 0):8.3f}s"
+                      + (f"  {result['format']}" if "format" in result else "")
+                      + (f"  ({result['skipped']})" if "skipped" in result else ""), file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
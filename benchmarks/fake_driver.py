@@ -0,0 +1,186 @@
+"""pyodbc-compatible stand-in driver backed by SQLite, for benchmarks only.
+
+Every connection gets a private in-memory SQLite copy of one generated table
+`t` (`rows` rows, `width` columns alternating integers and `text_size`-char
+strings), so SELECT/UPDATE/INSERT against `t` really run. On top of that:
+
+- every execute() waits `latency` seconds first (interruptible by
+  cursor.cancel(), like a real driver) and connect() waits `connect_latency`;
+- a fraction `error_rate` of statements fails with a transient-looking error;
+- USE [db], SELECT 1 and the sys.databases catalog queries are answered for
+  `databases` synthetic tenant databases;
+- Connection.timeout behaves like pyodbc's query timeout.
+
+Use FakeDriver(...).connect as a ConnectionPool connect callable.
+"""
+import random
+import re
+import sqlite3
+import threading
+import time
+
+_USE = re.compile(r"^\s*USE\s+\[?([^\]]+)\]?\s*$", re.IGNORECASE)
+
+
+class FakeError(Exception):
+    pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.driver = conn.driver
+        self.timeout = conn.timeout
+        self.fast_executemany = False
+        self.description = None
+        self.rowcount = -1
+        self._rows = None
+        self._sqlite = conn.sqlite.cursor()
+        self._cancelled = threading.Event()
+
+    def _wait(self):
+        latency = self.driver.latency
+        self._cancelled.clear()
+        wait = min(latency, self.timeout) if self.timeout else latency
+        if wait and self._cancelled.wait(wait):
+            raise FakeError("[HY008] Operation canceled")
+        if wait < latency:
+            raise FakeError("[HYT00] Query timeout expired")
+        if self.driver.error_rate and self.driver.random() < self.driver.error_rate:
+            raise FakeError("[40001] Transaction was deadlocked on lock resources and has been chosen as the deadlock victim")
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        self._wait()
+        self._rows = None
+        self.description = None
+        self.rowcount = -1
+
+        use = _USE.match(sql)
+        if use:
+            if use.group(1) not in self.driver.database_names and use.group(1) != "master":
+                raise FakeError(f"[08004] Database '{use.group(1)}' does not exist")
+            self.conn.database = use.group(1)
+            return self
+        if "sys.databases" in sql:
+            self._set_rows(self.driver.CATALOG_COLUMNS, self.driver.catalog_rows())
+            return self
+
+        try:
+            self._sqlite.execute(sql, params)
+        except sqlite3.Error as e:
+            raise FakeError(f"[42000] {e}") from e
+        if self._sqlite.description:
+            self.description = [(d[0], None, None, None, None, None, True) for d in self._sqlite.description]
+        else:
+            self.rowcount = self._sqlite.rowcount
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._wait()
+        self.description = None
+        try:
+            self._sqlite.executemany(sql, seq_of_params)
+        except sqlite3.Error as e:
+            raise FakeError(f"[42000] {e}") from e
+        self.rowcount = self._sqlite.rowcount
+        return self
+
+    def _set_rows(self, columns, rows):
+        self.description = [(name, None, None, None, None, None, True) for name in columns]
+        self._rows = list(rows)
+
+    def fetchmany(self, size):
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+        return self._sqlite.fetchmany(size) if self.description else []
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return rows
+        return self._sqlite.fetchall() if self.description else []
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def nextset(self):
+        return False
+
+    def cancel(self):
+        self._cancelled.set()
+        self.conn.sqlite.interrupt()
+
+    def close(self):
+        self._sqlite.close()
+
+
+class FakeConnection:
+    def __init__(self, driver, database):
+        self.driver = driver
+        self.database = database
+        self.timeout = 0
+        self.autocommit = False
+        self.sqlite = driver.clone()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+    def close(self):
+        self.sqlite.close()
+
+
+class FakeDriver:
+    CATALOG_COLUMNS = ("name", "state_desc", "compatibility_level", "recovery_model_desc", "size_mb")
+
+    def __init__(self, latency=0.01, connect_latency=0.0, rows=10, width=4, text_size=16,
+                 error_rate=0.0, databases=100, seed=42):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.rows = rows
+        self.width = width
+        self.error_rate = error_rate
+        self.database_names = [f"tenant_{i:05d}" for i in range(databases)]
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._template = sqlite3.connect(":memory:", check_same_thread=False)
+        self._build_template(rows, width, text_size)
+
+    def _build_template(self, rows, width, text_size):
+        columns = [f"c{i} {'INTEGER' if i % 2 == 0 else 'TEXT'}" for i in range(width)]
+        self._template.execute(f"CREATE TABLE t ({', '.join(columns)})")
+        text = "x" * text_size
+        values = [tuple(r + i if i % 2 == 0 else text for i in range(width)) for r in range(rows)]
+        self._template.executemany(f"INSERT INTO t VALUES ({', '.join('?' * width)})", values)
+        self._template.commit()
+
+    def clone(self):
+        """Private copy of the template database for one connection"""
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        with self._lock:
+            self._template.backup(conn)
+        return conn
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def catalog_rows(self):
+        return [(name, "ONLINE", 150, "FULL", 64.0) for name in self.database_names]
+
+    def connect(self, server, db):
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        with self._lock:
+            self.connections += 1
+        return FakeConnection(self, db)
@@ -0,0 +1,122 @@
+"""Bulk load of a CSV or Parquet file into one table of every selected database.
+
+The source is parsed once into row tuples and cut into batches once; every
+database worker then sends those same batch lists with pyodbc's
+fast_executemany, so memory does not grow with the number of databases.
+A BulkInsert is used as a statement in the list handed to engine.run_script.
+"""
+import csv
+import os
+
+from connection_pool import quote_name
+from exporters import pq
+from streaming import estimate_bytes
+
+SOURCE_FORMATS = ("csv", "parquet")
+
+# fast_executemany sends a batch as one parameter array; aim for about this much per batch
+TARGET_BATCH_BYTES = 4 * 1024 * 1024
+MIN_BATCH_ROWS = 100
+MAX_BATCH_ROWS = 50000
+
+
+def source_format(path):
+    ext = os.path.splitext(path.lower())[1]
+    if ext == ".parquet":
+        return "parquet"
+    if ext in (".csv", ".txt"):
+        return "csv"
+    raise ValueError(f"Cannot tell the format of {path}; expected a .csv or .parquet file")
+
+
+def read_csv(path):
+    """(columns, rows) of a CSV file with a header line; empty fields become NULL"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        columns = next(reader, None)
+        if not columns:
+            raise ValueError(f"{path} has no header line")
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(columns):
+                raise ValueError(f"{path}, line {reader.line_num}: {len(row)} field(s), expected {len(columns)}")
+            rows.append(tuple(value if value != "" else None for value in row))
+    return columns, rows
+
+
+def read_parquet(path):
+    """(columns, rows) of a Parquet file, with the values as Python objects"""
+    if pq is None:
+        raise RuntimeError("Reading Parquet needs the 'pyarrow' package")
+    table = pq.read_table(path)
+    columns = table.column_names
+    rows = list(zip(*(table.column(name).to_pylist() for name in columns)))
+    return columns, rows
+
+
+def read_source(path, fmt=None):
+    fmt = fmt or source_format(path)
+    if fmt == "csv":
+        return read_csv(path)
+    if fmt == "parquet":
+        return read_parquet(path)
+    raise ValueError(f"Unknown source format '{fmt}', expected one of: {', '.join(SOURCE_FORMATS)}")
+
+
+def table_name(name):
+    """Bracket-quoted table name: dbo.Countries -> [dbo].[Countries]"""
+    parts = [part.strip().strip("[]") for part in name.split(".")]
+    if not all(parts) or len(parts) > 3:
+        raise ValueError(f"Invalid table name '{name}'")
+    return ".".join(quote_name(part) for part in parts)
+
+
+def load_signature(path, table):
+    """Stands in for the script text in the run journal: same file, same table, same run"""
+    stat = os.stat(path)
+    return f"BULK LOAD {table_name(table)} FROM {os.path.abspath(path)} ({stat.st_size} bytes, {stat.st_mtime_ns})"
+
+
+def batch_rows_for(rows):
+    """Rows per batch so that one batch is about TARGET_BATCH_BYTES"""
+    sample = rows[:1000]
+    if not sample:
+        return MIN_BATCH_ROWS
+    per_row = max(1, estimate_bytes(sample) // len(sample))
+    return max(MIN_BATCH_ROWS, min(MAX_BATCH_ROWS, TARGET_BATCH_BYTES // per_row))
+
+
+class BulkInsert:
+    """INSERT ... VALUES (?, ...) of parsed rows, sent in batches with fast_executemany.
+
+    The batches are cut once here and shared read-only by every database.
+    batch_rows defaults to a size derived from the width of the rows.
+    """
+
+    def __init__(self, table, columns, rows, batch_rows=None, source=None):
+        self.table = table_name(table)
+        self.columns = list(columns)
+        self.source = source
+        self.row_count = len(rows)
+        placeholders = ", ".join("?" * len(self.columns))
+        self.sql = f"INSERT INTO {self.table} ({', '.join(quote_name(c) for c in self.columns)}) VALUES ({placeholders})"
+        self.batch_rows = max(1, int(batch_rows or batch_rows_for(rows)))
+        self.batches = [rows[i:i + self.batch_rows] for i in range(0, len(rows), self.batch_rows)]
+
+    @classmethod
+    def from_file(cls, path, table, fmt=None, batch_rows=None):
+        columns, rows = read_source(path, fmt)
+        return cls(table, columns, rows, batch_rows, source=path)
+
+    def __str__(self):
+        origin = os.path.basename(self.source) if self.source else "memory"
+        return f"{self.sql} -- {self.row_count} row(s) from {origin}"
+
+    def execute(self, cursor):
+        """Send every batch on cursor; returns the number of rows sent"""
+        cursor.fast_executemany = True
+        for batch in self.batches:
+            cursor.executemany(self.sql, batch)
+        return self.row_count
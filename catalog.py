@@ -0,0 +1,106 @@
+import json
+import os
+import re
+import time
+
+from config import get_config_path
+
+CATALOG_SQL = """
+SELECT d.name, d.state_desc, d.compatibility_level, d.recovery_model_desc,
+       CAST(SUM(CAST(mf.size AS bigint)) * 8 / 1024.0 AS float) AS size_mb
+FROM sys.databases d
+LEFT JOIN sys.master_files mf ON mf.database_id = d.database_id
+WHERE d.database_id > 4
+GROUP BY d.name, d.state_desc, d.compatibility_level, d.recovery_model_desc
+"""
+
+# Without VIEW ANY DEFINITION sys.master_files is not readable; sizes are then unknown
+CATALOG_NO_SIZE_SQL = """
+SELECT d.name, d.state_desc, d.compatibility_level, d.recovery_model_desc, NULL AS size_mb
+FROM sys.databases d
+WHERE d.database_id > 4
+"""
+
+
+def get_catalog_path(server):
+    """Cache file for one server, stored next to profiles.json"""
+    safe = re.sub(r"[^\w.-]", "_", server)
+    return os.path.join(os.path.dirname(get_config_path()), f"catalog_{safe}.json")
+
+
+class DatabaseCatalog:
+    """Database names plus metadata for one server, persisted between sessions.
+
+    load() gives an instant (possibly stale) view; refresh() re-reads
+    sys.databases, reports what was added, dropped or changed, and writes
+    the cache back.
+    """
+
+    def __init__(self, server, path=None):
+        self.server = server
+        self.path = path or get_catalog_path(server)
+        self.databases = {}
+        self.refreshed_at = None
+
+    @property
+    def names(self):
+        return list(self.databases)
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.databases = data.get("databases", {})
+        self.refreshed_at = data.get("refreshed_at")
+        return True
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"server": self.server, "refreshed_at": self.refreshed_at, "databases": self.databases}, f)
+        os.replace(tmp_path, self.path)
+
+    def fetch(self, pool):
+        with pool.connection(self.server, "master") as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(CATALOG_SQL)
+                rows = cursor.fetchall()
+            except Exception:
+                conn.rollback()
+                cursor.execute(CATALOG_NO_SIZE_SQL)
+                rows = cursor.fetchall()
+            cursor.close()
+
+        return {
+            row[0]: {
+                "state": row[1],
+                "compatibility_level": row[2],
+                "recovery_model": row[3],
+                "size_mb": round(row[4], 2) if row[4] is not None else None,
+            }
+            for row in rows
+        }
+
+    def refresh(self, pool):
+        """Re-read the server catalog; returns (added, dropped, changed) name lists"""
+        fresh = self.fetch(pool)
+        added = sorted(set(fresh) - set(self.databases))
+        dropped = sorted(set(self.databases) - set(fresh))
+        changed = sorted(name for name in set(fresh) & set(self.databases) if fresh[name] != self.databases[name])
+
+        self.databases = fresh
+        self.refreshed_at = time.time()
+        try:
+            self.save()
+        except OSError:
+            pass
+        return added, dropped, changed
+
+    def info(self, name):
+        return self.databases.get(name, {})
+
+    def is_online(self, name):
+        return self.info(name).get("state", "ONLINE") == "ONLINE"
@@ -0,0 +1,335 @@
+"""Headless runner: execute a script on many databases without the GUI.
+
+Examples:
+    python cli.py --profile prod --db "tenant_*" --script stats.sql
+    python cli.py --profile prod --db-regex "^shop_\\d+$" --script audit.sql --output audit.csv
+    python cli.py --profile prod --script audit.sql --output "audit/{db}.parquet" --per-db
+    python cli.py --profile prod --script sales.sql --group-by region --agg "sum(amount), count(*)"
+    python cli.py --profile prod --script report.sql --output report.csv --cache --cache-ttl 600
+    python cli.py --profile prod --list
+"""
+import argparse
+import csv
+import os
+import signal
+import sys
+
+from aggregation import AggregatingSink, parse_aggregates, parse_group_by
+from drift import COMPARE_MODES, DEFAULT_COMPARE_MODE, DriftSink
+
+from catalog import DatabaseCatalog
+from config import load_profiles
+from engine import (
+    COMMIT_MODES, DEFAULT_COMMIT_MODE, DEFAULT_ENGINE, DEFAULT_MAX_CONCURRENCY, ENGINES, RunControl, add_server,
+    create_pool, filter_databases, run_script, summary_lines,
+)
+from bulk_load import SOURCE_FORMATS, BulkInsert, load_signature
+from exporters import COMPRESSIONS, FORMATS, FileSink, guess_format, open_text, tagged_path
+from journal import RunJournal, get_journal_path
+from metrics import JsonlMetricsExporter, MetricsRecorder, PrometheusExporter
+from result_cache import DEFAULT_MAX_MB, DEFAULT_TTL, ResultCache, get_cache_dir
+from retry import DEFAULT_MAX_RETRIES, RetryPolicy
+from script_params import ScriptParams, parse_assignments
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run a SQL script on multiple databases.")
+    parser.add_argument("--profile", action="append", required=True,
+                        help="profile name from profiles.json; repeat to run on the servers of several profiles")
+    parser.add_argument("--db", action="append", default=[], metavar="GLOB",
+                        help="database name glob, repeatable (default: all user databases)")
+    parser.add_argument("--db-regex", action="append", default=[], metavar="REGEX",
+                        help="database name regex, repeatable")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="skip databases matching this glob, repeatable")
+    parser.add_argument("--online-only", action="store_true", help="skip databases that are not ONLINE")
+    parser.add_argument("--script", help="SQL script file to execute")
+    parser.add_argument("--params", metavar="FILE",
+                        help="values for :name placeholders: JSON {params, databases} or CSV with a dbname column")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="global value for a :name placeholder, repeatable; overrides --params")
+    parser.add_argument("--load", metavar="SOURCE",
+                        help="bulk load this CSV (with header) or Parquet file instead of running a script")
+    parser.add_argument("--table", help="target table of --load, e.g. dbo.Countries")
+    parser.add_argument("--source-format", choices=SOURCE_FORMATS, help="override the --load format")
+    parser.add_argument("--batch-rows", type=int, metavar="N",
+                        help="rows per fast_executemany batch of --load (default: sized from the row width)")
+    parser.add_argument("--output", help="stream result rows to this file ('-' for stdout); "
+                                         "format and compression follow the extension, e.g. out.jsonl.gz")
+    parser.add_argument("--format", choices=FORMATS, help="override the output format")
+    parser.add_argument("--compress", choices=COMPRESSIONS, help="override the output compression")
+    parser.add_argument("--per-db", action="store_true",
+                        help="write one output file per database ({db} in --output marks the name)")
+    parser.add_argument("--parallel", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help=f"databases executed at the same time (default {DEFAULT_MAX_CONCURRENCY})")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                        help=f"execution backend (default {DEFAULT_ENGINE})")
+    parser.add_argument("--statement-timeout", type=float, metavar="SECONDS",
+                        help="driver query timeout for each statement")
+    parser.add_argument("--db-timeout", type=float, metavar="SECONDS",
+                        help="wall-clock limit per database; the running statement is cancelled")
+    parser.add_argument("--commit", choices=COMMIT_MODES, default=DEFAULT_COMMIT_MODE,
+                        help="commit after every statement, once per database, or only if all databases succeeded "
+                             f"(default {DEFAULT_COMMIT_MODE})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f"retries for deadlocks and dropped connections (default {DEFAULT_MAX_RETRIES})")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip databases and statements the journal of this script records as done")
+    parser.add_argument("--journal", metavar="PATH",
+                        help="run journal file (default: journals/ next to profiles.json, named by server and script)")
+    parser.add_argument("--metrics-jsonl", metavar="PATH",
+                        help="append per-database and per-statement timing events to this JSON Lines file")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="write a Prometheus text-format metrics file when the run ends")
+    parser.add_argument("--timings", type=int, default=0, metavar="N",
+                        help="print the N slowest databases and statements at the end")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve repeated read-only statements from an on-disk result cache; any other "
+                             "statement clears the cached results of its database")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL, metavar="SECONDS",
+                        help=f"age after which a cached result is fetched again (default {DEFAULT_TTL})")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_MAX_MB, metavar="MB",
+                        help=f"result cache size, least recently used results evicted first (default {DEFAULT_MAX_MB})")
+    parser.add_argument("--cache-dir", metavar="PATH",
+                        help="result cache folder (default: result_cache/ next to profiles.json)")
+    parser.add_argument("--group-by", default="", metavar="COLUMNS",
+                        help="aggregate mode: comma separated group columns (dbname and server are allowed)")
+    parser.add_argument("--agg", default="", metavar="AGGREGATES",
+                        help="aggregate mode: e.g. \"sum(amount), avg(amount), distinct(user_id)\"; "
+                             "the aggregated rows are written as CSV to --output or stdout")
+    parser.add_argument("--compare", action="store_true",
+                        help="compare mode: group databases by identical results and diff each group against the "
+                             "baseline; the group table and diffs are written as CSV to --output (diffs to "
+                             "out.diff1.csv...) or stdout. Exit code 3 if databases differ")
+    parser.add_argument("--compare-mode", choices=COMPARE_MODES, default=DEFAULT_COMPARE_MODE,
+                        help="rows: row order is ignored, ordered: row order matters (default rows)")
+    parser.add_argument("--baseline", metavar="DB", help="compare mode: reference database (default: largest group)")
+    parser.add_argument("--list", action="store_true", help="only print the matching database names")
+    return parser
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def write_aggregate(sink, path, compression=None):
+    _, guessed_compression = guess_format(path)
+    out = open_text(path, compression or guessed_compression)
+    writer = csv.writer(out)
+    writer.writerow(sink.columns)
+    writer.writerows(sink.result_rows())
+    if out is sys.stdout:
+        out.flush()
+    else:
+        out.close()
+
+
+def write_comparison(sink, path, compression=None):
+    _, guessed_compression = guess_format(path)
+    for i, (label, columns, rows) in enumerate(sink.tables()):
+        target = path if i == 0 or path == "-" else tagged_path(path, f"diff{i}")
+        out = open_text(target, compression or guessed_compression)
+        if out is sys.stdout:
+            out.write(f"# {label}\n")
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        if out is sys.stdout:
+            out.flush()
+        else:
+            out.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    profiles = load_profiles()
+    unknown = [name for name in args.profile if name not in profiles]
+    if unknown:
+        log(f"❌ No saved profile named '{unknown[0]}'.")
+        return 2
+    creds = profiles[args.profile[0]]
+    server = creds["SQL_SERVER"]
+    servers = list(dict.fromkeys(profiles[name]["SQL_SERVER"] for name in args.profile))
+    multi_server = len(servers) > 1
+
+    if not args.list and not args.script and not args.load:
+        log("❌ --script or --load is required unless --list is given.")
+        return 2
+    if args.load and (args.script or not args.table):
+        log("❌ --load needs --table and cannot be combined with --script.")
+        return 2
+
+    aggregate_sink = None
+    if args.group_by or args.agg:
+        try:
+            aggregates = parse_aggregates(args.agg or "count(*)")
+        except ValueError as e:
+            log(f"❌ {e}")
+            return 2
+        aggregate_sink = AggregatingSink(parse_group_by(args.group_by), aggregates)
+    drift_sink = None
+    if args.compare:
+        if aggregate_sink is not None:
+            log("❌ --compare cannot be combined with --group-by / --agg.")
+            return 2
+        drift_sink = DriftSink(args.compare_mode, args.baseline)
+
+    params = None
+    if args.params or args.param:
+        try:
+            params = ScriptParams.from_file(args.params) if args.params else ScriptParams()
+            params = params.with_values(parse_assignments(args.param))
+        except (OSError, ValueError) as e:
+            log(f"❌ Cannot read the script parameters: {e}")
+            return 2
+
+    # One pool, separate connections and limits per server (profile MAX_CONCURRENCY, else --parallel)
+    pool = create_pool(creds, args.parallel)
+    for name in args.profile[1:]:
+        add_server(pool, profiles[name])
+    try:
+        dbs = []
+        for target_server in servers:
+            catalog = DatabaseCatalog(target_server)
+            try:
+                catalog.refresh(pool)
+            except Exception as e:
+                log(f"❌ Error loading DBs from {target_server}: {e}")
+                return 1
+            names = [db for db in sorted(catalog.names) if not args.online_only or catalog.is_online(db)]
+            dbs.extend((target_server, db) for db in filter_databases(names, args.db, args.db_regex, args.exclude))
+
+        if args.list:
+            for target_server, db in dbs:
+                print(f"{target_server}/{db}" if multi_server else db)
+            return 0
+        if not dbs:
+            log("❌ No databases match the given filters.")
+            return 1
+
+        if args.load:
+            try:
+                journal_key = load_signature(args.load, args.table)
+                load = BulkInsert.from_file(args.load, args.table, args.source_format, args.batch_rows)
+            except (OSError, ValueError, RuntimeError) as e:
+                log(f"❌ {e}")
+                return 2
+            log(f"📥 Read {load.row_count} row(s) from {args.load}, {len(load.batches)} batch(es) of up to {load.batch_rows}")
+            script = [load]
+        else:
+            try:
+                with open(args.script, 'r') as f:
+                    script = f.read()
+            except (OSError, ValueError) as e:
+                log(f"❌ Cannot read the script: {e}")
+                return 2
+            journal_key = script
+        if params is not None:
+            journal_key += f"\n-- params {params.signature()}"
+
+        sinks = []
+        if aggregate_sink is not None:
+            sinks.append(aggregate_sink)
+        elif drift_sink is not None:
+            sinks.append(drift_sink)
+        elif args.output:
+            try:
+                sinks.append(FileSink(args.output, args.format, args.compress, args.per_db, with_server=multi_server))
+            except ValueError as e:
+                log(f"❌ {e}")
+                return 2
+        done = [0]
+
+        def on_complete(task):
+            done[0] += 1
+
+        def on_merge(task):
+            for message in task.messages:
+                log(message)
+            log(f"[{done[0]}/{len(dbs)}]")
+
+        exporters = []
+        if args.metrics_jsonl:
+            exporters.append(JsonlMetricsExporter(args.metrics_jsonl))
+        if args.metrics_prom:
+            exporters.append(PrometheusExporter(args.metrics_prom))
+        metrics = MetricsRecorder(exporters)
+
+        run_server = "+".join(servers)
+        try:
+            journal = RunJournal(args.journal or get_journal_path(run_server, journal_key), run_server, journal_key,
+                                 args.resume)
+        except (OSError, ValueError) as e:
+            log(f"❌ {e}")
+            return 2
+        if journal.resumed:
+            log(f"♻️ Resuming from {journal.path}: {journal.completed_databases} database(s) already completed")
+
+        # An existing cache is opened even without --cache, so writes drop its stale results
+        cache = None
+        cache_dir = args.cache_dir or get_cache_dir()
+        if args.cache or os.path.isdir(cache_dir):
+            try:
+                cache = ResultCache(args.cache_ttl, args.cache_mb, cache_dir)
+            except OSError as e:
+                log(f"❌ Cannot open the result cache: {e}")
+                journal.close()
+                return 2
+        # Ctrl+C stops scheduling and cancels the running statements instead of killing the process
+        control = RunControl(args.statement_timeout, args.db_timeout, RetryPolicy(args.retries), journal, args.commit,
+                             cache, args.cache)
+
+        def on_interrupt(signum, frame):
+            log("🛑 Cancelling...")
+            control.cancel()
+
+        previous_handler = signal.signal(signal.SIGINT, on_interrupt)
+        log(f"🚀 Executing on {len(dbs)} DB(s)...")
+        try:
+            tasks, sink_errors = run_script(pool, server, dbs, script, sinks, args.parallel, on_complete, on_merge,
+                                             engine=args.engine, control=control, metrics=metrics, params=params,
+                                             server_limits=pool.server_limits)
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+            metrics.close()
+            journal.close()
+        for exporter, err in metrics.errors:
+            log(f"⚠️ Metrics exporter {type(exporter).__name__} failed: {err}")
+
+        for sink, err in sink_errors:
+            log(f"⚠️ Result sink {type(sink).__name__} failed: {err}")
+        for sink in sinks:
+            if isinstance(sink, FileSink) and sink.files:
+                log(f"💾 {sink.rows_written} row(s) written to {', '.join(sink.files[:3])}"
+                    + (f" and {len(sink.files) - 3} more file(s)" if len(sink.files) > 3 else ""))
+        if aggregate_sink is not None:
+            log(f"🧮 Aggregated {aggregate_sink.input_rows} row(s) into {len(aggregate_sink.totals)} group(s)"
+                f" ({aggregate_sink.backend} backend)")
+            if aggregate_sink.skipped_rows:
+                log(f"ℹ️ Skipped {aggregate_sink.skipped_rows} row(s) from result sets without the referenced columns")
+            write_aggregate(aggregate_sink, args.output or "-", args.compress)
+        if drift_sink is not None:
+            drift_sink.drop_unfinished(tasks)
+            if not drift_sink.baseline_found:
+                log(f"⚠️ Baseline {drift_sink.baseline} has no results; comparing against the largest group")
+            log(drift_sink.summary())
+            write_comparison(drift_sink, args.output or "-", args.compress)
+        if args.timings:
+            columns, rows = metrics.timing_table(args.timings)
+            log("⏱️ Slowest databases and statements:")
+            writer = csv.writer(sys.stderr, delimiter="\t", lineterminator="\n")
+            writer.writerow(columns)
+            writer.writerows(rows)
+        for line in summary_lines(tasks):
+            log(line)
+        unfinished = [task for task in tasks if task.status not in ("done", "skipped")]
+        if unfinished or sink_errors:
+            return 1
+        return 3 if drift_sink is not None and len(drift_sink.clusters) > 1 else 0
+    finally:
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
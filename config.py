@@ -1,3 +1,4 @@
+import json
 import os
 
 APP_NAME = "SQLRunner"
@@ -8,3 +9,20 @@ def get_config_path():
     os.makedirs(config_dir, exist_ok=True)
     return os.path.join(config_dir, "profiles.json")
 
+
+def load_profiles():
+    path = get_config_path()
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_profiles(profiles):
+    with open(get_config_path(), "w") as f:
+        json.dump(profiles, f, indent=4)
+
+
+def merge_profile(profile, server, user, password, driver):
+    """profile with the login fields replaced; its other settings (MAX_CONCURRENCY, COMMIT_MODE...) are kept"""
+    return dict(profile or {}, SQL_SERVER=server, USERNAME=user, PASSWORD=password, DRIVER=driver)
@@ -0,0 +1,244 @@
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_MAX_PER_SERVER = 8
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_HEALTH_CHECK_AFTER = 30
+# msodbcsql connection attribute: reset the session on its next request, as
+# ODBC connection pooling does with sp_reset_connection
+SQL_COPT_SS_RESET_CONNECTION = 1204
+SQL_RESET_CONNECTION_YES = 1
+
+
+def quote_name(name):
+    """Bracket-quote a SQL Server identifier"""
+    return "[" + name.replace("]", "]]") + "]"
+
+
+def reset_session(conn):
+    """Have the driver reset the session (temp tables, SET options, isolation level,
+    CONTEXT_INFO, database) before its next request; False if the driver cannot"""
+    set_attr = getattr(conn, "set_attr", None)
+    if set_attr is None:
+        return False
+    try:
+        set_attr(SQL_COPT_SS_RESET_CONNECTION, SQL_RESET_CONNECTION_YES)
+    except Exception:
+        return False
+    return True
+
+
+class PooledConnection:
+    """A driver connection plus the bookkeeping the pool needs"""
+
+    def __init__(self, server, db, conn):
+        self.server = server
+        self.db = db
+        # A session reset returns the connection to the database it was opened on
+        self.home_db = db
+        self.conn = conn
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Reusable connections keyed by server and database.
+
+    connect(server, db) opens a new driver connection. Each server has its own
+    limit on open connections; callers beyond it wait for a release. Idle
+    connections are closed after idle_timeout seconds and probed with
+    SELECT 1 before reuse once idle for more than health_check_after seconds.
+    A reused session is reset through the driver where it supports it
+    (reset_session), so #temp tables and SET options of one run do not
+    leak into the next.
+
+    By default a connection is only reused for the database it was opened
+    on; at the limit an idle connection of another database is closed to
+    make room. switch_databases=True (opt-in) moves idle connections to
+    another database with USE instead, which without a driver session
+    reset also carries that session state over to the other database.
+    """
+
+    def __init__(self, connect, max_per_server=DEFAULT_MAX_PER_SERVER, server_limits=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT, health_check_after=DEFAULT_HEALTH_CHECK_AFTER,
+                 switch_databases=False):
+        self.connect = connect
+        self.switch_databases = switch_databases
+        self.max_per_server = max_per_server
+        self.server_limits = dict(server_limits or {})
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self._idle = {}
+        self._open = {}
+        self._cond = threading.Condition()
+        self.stats = {"hits": 0, "misses": 0, "switches": 0, "resets": 0, "waits": 0, "evictions": 0, "broken": 0}
+
+    def limit_for(self, server):
+        return max(1, int(self.server_limits.get(server, self.max_per_server)))
+
+    def adopt(self, server, db, conn):
+        """Hand an already-open connection (e.g. from the login check) to the pool"""
+        with self._cond:
+            self._open[server] = self._open.get(server, 0) + 1
+            self._idle.setdefault(server, []).append(PooledConnection(server, db, conn))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, server, db, timeout=None):
+        pooled = self.acquire(server, db, timeout)
+        try:
+            yield pooled.conn
+        except Exception:
+            self.release(pooled, discard=True)
+            raise
+        self.release(pooled)
+
+    def acquire(self, server, db, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            pooled = self._checkout(server, db, deadline)
+            if pooled is None:
+                return self._open_new(server, db)
+            if self._is_healthy(pooled):
+                break
+            self._discard(pooled)
+
+        if reset_session(pooled.conn):
+            pooled.db = pooled.home_db
+            with self._cond:
+                self.stats["resets"] += 1
+        if pooled.db != db:
+            try:
+                cursor = pooled.conn.cursor()
+                cursor.execute(f"USE {quote_name(db)}")
+                cursor.close()
+            except Exception:
+                # The connection is fine, the database is not; report the real error
+                self.release(pooled)
+                raise
+            pooled.db = db
+            with self._cond:
+                self.stats["switches"] += 1
+
+        with self._cond:
+            self.stats["hits"] += 1
+        return pooled
+
+    def release(self, pooled, discard=False):
+        if not discard:
+            try:
+                # Drop anything the caller left uncommitted before the next reuse
+                pooled.conn.rollback()
+            except Exception:
+                discard = True
+        if discard:
+            self._discard(pooled)
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.setdefault(pooled.server, []).append(pooled)
+            self._cond.notify()
+        self.evict_idle()
+
+    def evict_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            for server, idle in self._idle.items():
+                keep = [p for p in idle if now - p.last_used < self.idle_timeout]
+                expired.extend(p for p in idle if now - p.last_used >= self.idle_timeout)
+                self._idle[server] = keep
+            for pooled in expired:
+                self._open[pooled.server] -= 1
+                self.stats["evictions"] += 1
+            if expired:
+                self._cond.notify_all()
+        for pooled in expired:
+            pooled.close()
+
+    def close_all(self):
+        with self._cond:
+            idle = [p for conns in self._idle.values() for p in conns]
+            self._idle.clear()
+            for pooled in idle:
+                self._open[pooled.server] -= 1
+            self._cond.notify_all()
+        for pooled in idle:
+            pooled.close()
+
+    def stats_text(self):
+        return ", ".join(f"{key}={value}" for key, value in self.stats.items())
+
+    def _checkout(self, server, db, deadline):
+        """Take an idle connection, or return None once a new one may be opened"""
+        stale = None
+        with self._cond:
+            waited = False
+            while True:
+                idle = self._idle.get(server, [])
+                # Prefer a connection already sitting in the wanted database
+                for i in range(len(idle) - 1, -1, -1):
+                    if idle[i].db == db:
+                        return idle.pop(i)
+                if idle and self.switch_databases:
+                    return idle.pop()
+
+                if self._open.get(server, 0) < self.limit_for(server):
+                    self._open[server] = self._open.get(server, 0) + 1
+                    break
+                if idle:
+                    # At the limit without switching: recycle an idle slot for this database
+                    stale = idle.pop(0)
+                    self.stats["evictions"] += 1
+                    break
+
+                if not waited:
+                    self.stats["waits"] += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No free connection to {server} within the pool timeout")
+                self._cond.wait(remaining)
+
+        if stale is not None:
+            stale.close()
+        return None
+
+    def _open_new(self, server, db):
+        try:
+            conn = self.connect(server, db)
+        except Exception:
+            with self._cond:
+                self._open[server] -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats["misses"] += 1
+        return PooledConnection(server, db, conn)
+
+    def _is_healthy(self, pooled):
+        if time.monotonic() - pooled.last_used <= self.health_check_after:
+            return True
+        try:
+            cursor = pooled.conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def _discard(self, pooled):
+        pooled.close()
+        with self._cond:
+            self._open[pooled.server] -= 1
+            self.stats["broken"] += 1
+            self._cond.notify()
@@ -0,0 +1,99 @@
+import platform
+import tkinter as tk
+from tkinter import font as tkfont, ttk
+
+CHECKED = "☑"
+UNCHECKED = "☐"
+
+
+class DatabaseList(tk.Frame):
+    """Checkbox-style list over a SelectionModel that only draws visible rows.
+
+    A Listbox sized to the window shows model.visible[offset:offset + rows];
+    scrolling rewrites those few lines, so the cost does not depend on how
+    many databases the server has. Clicking a row toggles its selection.
+    """
+
+    def __init__(self, parent, model, label_for=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.model = model
+        self.label_for = label_for or (lambda name: name)
+        self.offset = 0
+        self.rows = 1
+
+        self.listbox = tk.Listbox(self, activestyle="none", selectmode=tk.SINGLE, exportselection=False,
+                                  font=("Helvetica", 10), borderwidth=0, highlightthickness=0)
+        self.line_height = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill='y')
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.listbox.bind("<Configure>", self._on_resize)
+        self.listbox.bind("<ButtonRelease-1>", self._on_click)
+        self.listbox.bind("<space>", self._on_space)
+        if platform.system() in ['Windows', 'Darwin']:
+            self.listbox.bind("<MouseWheel>", self._on_mousewheel)
+        else:
+            self.listbox.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+            self.listbox.bind("<Button-5>", lambda e: self.scroll_rows(3))
+
+    def show_message(self, text):
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, text)
+
+    def refresh(self):
+        self.offset = max(0, min(self.offset, len(self.model.visible) - self.rows))
+        self._render()
+
+    def scroll_rows(self, delta):
+        self.offset = max(0, min(self.offset + delta, len(self.model.visible) - self.rows))
+        self._render()
+        return "break"
+
+    def _on_scrollbar(self, action, *args):
+        total = len(self.model.visible)
+        if action == "moveto":
+            self.offset = max(0, min(int(float(args[0]) * total), total - self.rows))
+            self._render()
+        elif action == "scroll":
+            step = self.rows if args[1] == "pages" else 1
+            self.scroll_rows(int(args[0]) * step)
+
+    def _on_mousewheel(self, event):
+        if platform.system() == 'Windows':
+            return self.scroll_rows(-3 * int(event.delta / 120))
+        return self.scroll_rows(-int(event.delta))
+
+    def _on_resize(self, event):
+        rows = max(1, event.height // self.line_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.refresh()
+
+    def _toggle_index(self, index):
+        position = self.offset + index
+        if 0 <= index < self.rows and position < len(self.model.visible):
+            self.model.toggle(self.model.visible[position])
+            self._render()
+
+    def _on_click(self, event):
+        self._toggle_index(self.listbox.nearest(event.y))
+
+    def _on_space(self, event):
+        active = self.listbox.index(tk.ACTIVE)
+        self._toggle_index(active)
+        return "break"
+
+    def _render(self):
+        window = self.model.visible[self.offset:self.offset + self.rows]
+        selected = self.model.selected
+        self.listbox.delete(0, tk.END)
+        if window:
+            self.listbox.insert(tk.END, *(
+                f"{CHECKED if name in selected else UNCHECKED}  {self.label_for(name)}" for name in window
+            ))
+        total = len(self.model.visible)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + len(window)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
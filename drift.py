@@ -0,0 +1,249 @@
+"""Compare mode: find the databases whose results differ, without keeping every row.
+
+Each database's result sets are reduced to digests while they stream:
+
+    rows     order-insensitive: the row count plus the sum of 64-bit row
+             hashes, so the same rows in another order still match
+    ordered  a running BLAKE2b over the row hashes, for queries with ORDER BY
+
+Databases with equal digests form one cluster. Only the rows of the first
+database of each cluster are kept (up to max_rows per result set), so memory
+grows with the number of different answers, not with the number of
+databases. Every cluster is then diffed against the baseline cluster (the one
+holding the baseline database, else the largest): rows it has that the
+baseline lacks (+) and rows of the baseline it lacks (-).
+"""
+import hashlib
+from collections import Counter
+
+from streaming import RowSink
+
+COMPARE_MODES = ("rows", "ordered")
+DEFAULT_COMPARE_MODE = "rows"
+# Rows kept per result set of a cluster's first database for the diff
+DEFAULT_MAX_ROWS = 100000
+# Members named in the cluster table before "and N more"
+MEMBERS_SHOWN = 10
+
+_MASK = (1 << 64) - 1
+
+
+def row_hash(row):
+    data = repr(tuple(row)).encode("utf-8", "surrogatepass")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def result_label(key):
+    statement_index, result_index, _ = key
+    return f"Statement {statement_index + 1} / result {result_index + 1}"
+
+
+class _Digest:
+    def __init__(self, mode):
+        self.count = 0
+        self.total = 0
+        self.hasher = hashlib.blake2b(digest_size=16) if mode == "ordered" else None
+
+    def add(self, hashes):
+        self.count += len(hashes)
+        if self.hasher is not None:
+            self.hasher.update(b"".join(h.to_bytes(8, "big") for h in hashes))
+        else:
+            self.total = (self.total + sum(hashes)) & _MASK
+
+    def value(self):
+        if self.hasher is not None:
+            return f"{self.count}:{self.hasher.hexdigest()}"
+        return f"{self.count}:{self.total:016x}"
+
+
+class _Database:
+    """Digests and (until its cluster is known) the rows of one running database"""
+
+    def __init__(self, mode, max_rows):
+        self.mode = mode
+        self.max_rows = max_rows
+        self.digests = {}
+        self.rows = {}
+        self.truncated = False
+
+    def add(self, key, rows):
+        digest = self.digests.get(key)
+        if digest is None:
+            digest = self.digests[key] = _Digest(self.mode)
+            self.rows[key] = []
+        hashes = [row_hash(row) for row in rows]
+        digest.add(hashes)
+        kept = self.rows[key]
+        room = max(0, self.max_rows - len(kept))
+        kept.extend(zip(hashes[:room], (tuple(row) for row in rows[:room])))
+        if room < len(rows):
+            self.truncated = True
+
+    def fingerprint(self):
+        text = repr(sorted((key, digest.value()) for key, digest in self.digests.items()))
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).hexdigest()
+
+
+class Cluster:
+    """Databases whose results have the same digests, and the rows of the first one"""
+
+    def __init__(self, fingerprint, database):
+        self.fingerprint = fingerprint
+        self.members = []
+        self.rows = database.rows
+        self.row_counts = {key: digest.count for key, digest in database.digests.items()}
+        self.truncated = database.truncated
+        self.number = None
+
+    @property
+    def total_rows(self):
+        return sum(self.row_counts.values())
+
+
+class DriftSink(RowSink):
+    """RowSink grouping databases into clusters of identical results.
+
+    baseline names the reference database (db or server/db); by default the
+    largest cluster is the reference. Call drop_unfinished(tasks) before
+    reading the report, so failed or skipped databases are not reported as
+    drift.
+    """
+
+    def __init__(self, mode=DEFAULT_COMPARE_MODE, baseline=None, max_rows=DEFAULT_MAX_ROWS):
+        if mode not in COMPARE_MODES:
+            raise ValueError(f"Unknown compare mode '{mode}', expected one of: {', '.join(COMPARE_MODES)}")
+        self.mode = mode
+        self.baseline = baseline or None
+        self.max_rows = max_rows
+        self.clusters = {}
+        self.input_rows = 0
+        self._running = {}
+        self._cluster_of = {}
+
+    def write_batch(self, batch):
+        state = self._running.get((batch.server, batch.db))
+        if state is None:
+            state = self._running[(batch.server, batch.db)] = _Database(self.mode, self.max_rows)
+        state.add(batch.schema_key, batch.rows)
+        self.input_rows += len(batch.rows)
+
+    def end_database(self, server, db):
+        state = self._running.pop((server, db), None) or _Database(self.mode, self.max_rows)
+        fingerprint = state.fingerprint()
+        cluster = self.clusters.get(fingerprint)
+        if cluster is None:
+            # First database with this answer: its rows stand for the whole cluster
+            cluster = self.clusters[fingerprint] = Cluster(fingerprint, state)
+        cluster.members.append((server, db))
+        self._cluster_of[(server, db)] = cluster
+
+    def finish(self):
+        for server, db in list(self._running):
+            self.end_database(server, db)
+
+    def forget(self, server, db):
+        cluster = self._cluster_of.pop((server, db), None)
+        if cluster is not None:
+            cluster.members.remove((server, db))
+            if not cluster.members:
+                del self.clusters[cluster.fingerprint]
+
+    def drop_unfinished(self, tasks):
+        for task in tasks:
+            if task.status != "done":
+                self.forget(task.server, task.db)
+
+    def summary(self):
+        clusters = self.ordered_clusters()
+        if not clusters:
+            return "🔍 No results to compare"
+        differing = sum(len(cluster.members) for cluster in clusters[1:])
+        return (f"🔍 {len(self._cluster_of)} database(s) in {len(clusters)} group(s) of identical results;"
+                f" {differing} differ from the baseline group")
+
+    def _is_baseline(self, member):
+        server, db = member
+        return self.baseline in (db, f"{server}/{db}")
+
+    @property
+    def baseline_found(self):
+        return not self.baseline or any(self._is_baseline(member) for member in self._cluster_of)
+
+    def ordered_clusters(self):
+        """Baseline cluster first (the largest unless a baseline database was given), then by size"""
+        clusters = sorted(self.clusters.values(), key=lambda c: (-len(c.members), min(c.members)))
+        if self.baseline:
+            for cluster in clusters:
+                if any(self._is_baseline(member) for member in cluster.members):
+                    clusters.remove(cluster)
+                    clusters.insert(0, cluster)
+                    break
+        for number, cluster in enumerate(clusters, 1):
+            cluster.number = number
+        return clusters
+
+    def cluster_table(self):
+        columns = ["cluster", "databases", "rows", "digest", "note", "members"]
+        rows = []
+        clusters = self.ordered_clusters()
+        baseline = clusters[0] if clusters else None
+        multi_server = len({server for server, _ in self._cluster_of}) > 1
+        for cluster in clusters:
+            names = sorted(f"{server}/{db}" if multi_server else db for server, db in cluster.members)
+            members = ", ".join(names[:MEMBERS_SHOWN])
+            if len(names) > MEMBERS_SHOWN:
+                members += f" and {len(names) - MEMBERS_SHOWN} more"
+            rows.append((cluster.number, len(names), cluster.total_rows, cluster.fingerprint,
+                         self._note(cluster, baseline), members))
+        return columns, rows
+
+    def _note(self, cluster, baseline):
+        notes = []
+        if cluster is baseline:
+            notes.append("baseline")
+        elif self.mode == "ordered" and not any(self._diff(cluster, baseline, key) for key in self._keys(cluster, baseline)):
+            notes.append("same rows, different order")
+        if cluster.truncated:
+            notes.append(f"diff limited to the first {self.max_rows} row(s)")
+        return "; ".join(notes)
+
+    @staticmethod
+    def _keys(cluster, baseline):
+        return sorted(set(cluster.rows) | set(baseline.rows))
+
+    @staticmethod
+    def _diff(cluster, baseline, key):
+        """(change, row) pairs: + rows only in cluster, - rows only in the baseline (as multisets)"""
+        ours = cluster.rows.get(key, [])
+        theirs = baseline.rows.get(key, [])
+        counts = Counter(h for h, _ in ours)
+        counts.subtract(h for h, _ in theirs)
+        changes = []
+        for change, rows, sign in (("+", ours, 1), ("-", theirs, -1)):
+            for h, row in rows:
+                if counts[h] * sign > 0:
+                    counts[h] -= sign
+                    changes.append((change, row))
+        return changes
+
+    def diff_tables(self):
+        """[(label, columns, rows)], one per result set with differences from the baseline"""
+        clusters = self.ordered_clusters()
+        if not clusters:
+            return []
+        baseline = clusters[0]
+        tables = []
+        keys = sorted({key for cluster in clusters for key in cluster.rows})
+        for key in keys:
+            rows = []
+            for cluster in clusters[1:]:
+                rows.extend((cluster.number, change) + row for change, row in self._diff(cluster, baseline, key))
+            if rows:
+                tables.append((f"Diff: {result_label(key)}", ["cluster", "change"] + list(key[2]), rows))
+        return tables
+
+    def tables(self):
+        """The cluster table followed by the diff tables, as (label, columns, rows)"""
+        columns, rows = self.cluster_table()
+        return [("Clusters", columns, rows)] + self.diff_tables()
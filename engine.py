@@ -0,0 +1,1013 @@
+"""Execution core shared by the GUI (main.py) and the command line (cli.py).
+
+Nothing here imports tkinter, and pyodbc is only imported when the first
+connection is opened.
+"""
+import fnmatch
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from connection_pool import ConnectionPool
+from retry import RetryPolicy, is_connection_error, is_deadlock
+from script_params import ParameterizedStatement, parameterize_all
+from sql_splitter import split_batches
+from streaming import RowBatch, ResultPipeline, estimate_bytes, fetch_batches, DEFAULT_FETCH_SIZE
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Executor backends selectable by name; see create_executor()
+ENGINES = ("threads", "asyncio")
+DEFAULT_ENGINE = "threads"
+
+# When changes are committed; see RunControl
+COMMIT_MODES = ("statement", "database", "all")
+DEFAULT_COMMIT_MODE = "statement"
+
+# Distinct statements kept prepared per connection; see StatementCache
+STATEMENT_CACHE_SIZE = 32
+
+LIST_DATABASES_SQL = "SELECT name FROM sys.databases WHERE database_id > 4"
+
+
+def connection_string(creds, db_name):
+    """ODBC connection string for a profile dict (SQL_SERVER, USERNAME, PASSWORD, DRIVER)"""
+    if creds.get("WINDOWS_AUTH"):
+        return f'DRIVER={creds["DRIVER"]};SERVER={creds["SQL_SERVER"]};Trusted_Connection=yes;DATABASE={db_name}'
+    else:
+        return f'DRIVER={creds["DRIVER"]};SERVER={creds["SQL_SERVER"]};UID={creds["USERNAME"]};PWD={creds["PASSWORD"]};DATABASE={db_name}'
+
+
+def odbc_connect(conn_str):
+    import pyodbc
+    return pyodbc.connect(conn_str)
+
+
+class ProfileConnector:
+    """connect(server, db) for a ConnectionPool, using the saved profile of each server"""
+
+    def __init__(self, profiles=(), connect=odbc_connect):
+        self.profiles = {}
+        self._connect = connect
+        for creds in profiles:
+            self.add(creds)
+
+    def add(self, creds):
+        self.profiles[creds["SQL_SERVER"]] = creds
+
+    def __call__(self, server, db):
+        if server not in self.profiles:
+            raise KeyError(f"No profile for server '{server}'")
+        return self._connect(connection_string(self.profiles[server], db))
+
+
+def create_pool(creds, max_per_server=DEFAULT_MAX_CONCURRENCY, connect=odbc_connect):
+    """Connection pool for the server described by a profile dict; add_server() adds more.
+
+    As with add_server(), the profile's MAX_CONCURRENCY, if set, is the
+    server's limit; max_per_server applies to servers without one.
+    SWITCH_DATABASES in the profile lets idle connections move between
+    databases with USE (see ConnectionPool).
+    """
+    pool = ConnectionPool(ProfileConnector([creds], connect), max_per_server=max_per_server,
+                          switch_databases=bool(creds.get("SWITCH_DATABASES", False)))
+    if creds.get("MAX_CONCURRENCY"):
+        pool.server_limits[creds["SQL_SERVER"]] = int(creds["MAX_CONCURRENCY"])
+    return pool
+
+
+def add_server(pool, creds):
+    """Let a create_pool() pool reach another profile's server.
+
+    The pool keeps separate idle connections and a separate limit per
+    server; the profile's MAX_CONCURRENCY, if set, becomes that limit.
+    """
+    pool.connect.add(creds)
+    if creds.get("MAX_CONCURRENCY"):
+        pool.server_limits[creds["SQL_SERVER"]] = int(creds["MAX_CONCURRENCY"])
+
+
+def split_statements(script):
+    # GO-separated batches; GO <n> repeats a batch n times
+    return split_batches(script)
+
+
+def list_databases(pool, server):
+    with pool.connection(server, "master") as conn:
+        cursor = conn.cursor()
+        cursor.execute(LIST_DATABASES_SQL)
+        names = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    return names
+
+
+def filter_databases(names, patterns=(), regexes=(), excludes=()):
+    """Names matching any glob pattern or regex (all names if none given), minus excludes"""
+    compiled = [re.compile(r, re.IGNORECASE) for r in regexes]
+    selected = []
+    for name in names:
+        included = not patterns and not compiled
+        included = included or any(fnmatch.fnmatch(name.lower(), p.lower()) for p in patterns)
+        included = included or any(r.search(name) for r in compiled)
+        if included and not any(fnmatch.fnmatch(name.lower(), e.lower()) for e in excludes):
+            selected.append(name)
+    return selected
+
+
+def apply_statement_timeout(conn, seconds):
+    """Set the driver query timeout (pyodbc Connection.timeout, 0 = none) for the next statements"""
+    try:
+        conn.timeout = int(math.ceil(seconds)) if seconds else 0
+    except AttributeError:
+        pass
+
+
+def is_timeout_error(err):
+    # ODBC SQLSTATE HYT00 is "Timeout expired"
+    return "HYT00" in str(err)
+
+
+class RunControl:
+    """Cancellation, timeouts, retries and the journal for one run.
+
+    cancel() may be called from any thread (e.g. a Cancel button): no new
+    database is started and the statements in flight are cancelled through
+    the driver (cursor.cancel()). statement_timeout is the driver query
+    timeout and db_timeout a wall-clock limit per database, both in seconds.
+    retry is a RetryPolicy for transient errors and journal an optional
+    journal.RunJournal recording (and on resume skipping) completed work.
+
+    commit_mode is one of COMMIT_MODES: "statement" commits after every
+    statement, "database" runs all statements of a database in one
+    transaction with a single commit, and "all" additionally holds every
+    database's transaction open until all of them succeeded (see
+    PreparedTransactions).
+
+    cache is an optional result_cache.ResultCache. Every statement that is
+    not read-only drops the cached results of its database; with
+    cache_results the read-only ones are also served from and stored in
+    it. Pass the cache even when caching is off, so a write never leaves
+    stale results for a later cached run.
+    """
+
+    def __init__(self, statement_timeout=None, db_timeout=None, retry=None, journal=None,
+                 commit_mode=DEFAULT_COMMIT_MODE, cache=None, cache_results=True):
+        if commit_mode not in COMMIT_MODES:
+            raise ValueError(f"Unknown commit mode '{commit_mode}', expected one of: {', '.join(COMMIT_MODES)}")
+        self.statement_timeout = statement_timeout or None
+        self.db_timeout = db_timeout or None
+        self.retry = retry or RetryPolicy()
+        self.journal = journal
+        self.commit_mode = commit_mode
+        self.prepared = PreparedTransactions() if commit_mode == "all" else None
+        self.cache = cache
+        self.cache_results = cache_results
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._cursors = {}
+        self._expired = set()
+        self._listeners = []
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def transactional(self):
+        """True when a database's statements share one transaction"""
+        return self.commit_mode != "statement"
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._lock:
+            cursors = list(self._cursors.values())
+            listeners = list(self._listeners)
+        for cursor in cursors:
+            _interrupt(cursor)
+        for listener in listeners:
+            listener()
+
+    def wait(self, seconds):
+        """Sleep unless cancelled first; True if the run was cancelled"""
+        return self._cancelled.wait(seconds)
+
+    def add_listener(self, func):
+        """func() is called on cancel(); used by executors with their own scheduling"""
+        with self._lock:
+            self._listeners.append(func)
+
+    def track(self, task, cursor):
+        with self._lock:
+            self._cursors[task] = cursor
+            expired = task in self._expired
+        if expired or self.cancelled:
+            _interrupt(cursor)
+
+    def untrack(self, task):
+        with self._lock:
+            self._cursors.pop(task, None)
+
+    def expire(self, task):
+        """The database ran past db_timeout: interrupt it"""
+        with self._lock:
+            self._expired.add(task)
+            cursor = self._cursors.get(task)
+        if cursor is not None:
+            _interrupt(cursor)
+
+    def stop_reason(self, task):
+        """"cancelled", "timeout" or None while the task may keep running"""
+        if task in self._expired:
+            return "timeout"
+        if self.cancelled:
+            return "cancelled"
+        return None
+
+
+class PreparedTransactions:
+    """Open transactions of an all-or-nothing run, committed or rolled back together.
+
+    Instead of committing, each database that ran all its statements parks
+    its connection here. Once every database has finished, resolve()
+    commits all of them if every one got this far and rolls all of them
+    back otherwise. SQL Server offers no prepare phase across connections
+    without a distributed transaction coordinator, so a commit failing half
+    way through resolve() leaves the databases committed before it; they
+    are reported, the rest are rolled back.
+    """
+
+    def __init__(self):
+        self._held = []
+        self._lock = threading.Lock()
+
+    def hold(self, task, pooled):
+        task.status = "prepared"
+        task.log(f"  ⏸️ Prepared on {task.db}, waiting for the other databases")
+        with self._lock:
+            self._held.append((task, pooled))
+
+    def resolve(self, pool, tasks, control):
+        """Commit every held transaction if all tasks prepared, else roll them back; True if committed"""
+        with self._lock:
+            held, self._held = self._held, []
+        commit = not control.cancelled and all(task.status in ("prepared", "skipped") for task in tasks)
+        failed = None
+        for task, pooled in held:
+            if not commit or failed is not None:
+                # release() rolls back whatever the connection left open
+                pool.release(pooled)
+                finish_db_task(task, control, stopped="rolledback")
+                continue
+            try:
+                commit_transaction(task, pooled.conn)
+            except Exception as err:
+                failed = task
+                pool.release(pooled, discard=True)
+                finish_db_task(task, control, error=err)
+                continue
+            pool.release(pooled)
+            finish_db_task(task, control)
+
+        if failed is not None:
+            committed = [task.db for task in tasks if task.status == "done"]
+            failed.log(f"⚠️ Commit failed on {failed.db} after {len(committed)} database(s) had committed: "
+                       + ", ".join(committed))
+        return commit and failed is None
+
+
+def _interrupt(cursor):
+    cancel = getattr(cursor, "cancel", None)
+    if cancel is not None:
+        try:
+            cancel()
+        except Exception:
+            pass
+
+
+def log_stopped(task, reason, db_timeout=None):
+    """Status and log line for a database stopped by cancel() or its timeout"""
+    task.status = reason
+    if reason == "timeout":
+        task.log(f"\n⏱️ Timed out on {task.db} after {db_timeout}s")
+    elif reason == "rolledback":
+        task.log(f"\n↩️ Rolled back on {task.db}: not every database succeeded")
+    else:
+        task.log(f"\n🚫 Cancelled on {task.db}")
+
+
+def retry_delay(task, control, err, attempt):
+    """Backoff before retrying err, or None if it is not retryable; counts and logs the retry"""
+    if not control.retry.should_retry(err, attempt) or control.stop_reason(task):
+        return None
+    task.retries += 1
+    delay = control.retry.delay(attempt + 1)
+    task.log(f"  🔁 Transient error, retry {attempt + 1}/{control.retry.max_retries} in {delay:.1f}s:\n    {err}")
+    return delay
+
+
+def retry_after(task, control, err, attempt, reset=None):
+    """Wait out the backoff for a retryable error; False if it should not (or can no longer) be retried"""
+    delay = retry_delay(task, control, err, attempt)
+    if delay is None:
+        return False
+    if reset is not None:
+        try:
+            reset()
+        except Exception:
+            pass
+    return not control.wait(delay)
+
+
+def summary_lines(tasks):
+    """Run summary: counts per outcome plus the names of every database that did not finish"""
+    multi_server = len({task.server for task in tasks}) > 1
+    by_status = {}
+    for task in tasks:
+        by_status.setdefault(task.status, []).append(f"{task.server}/{task.db}" if multi_server else task.db)
+    done = len(by_status.get("done", []))
+    lines = [
+        f"✅ {done} succeeded, ❌ {len(by_status.get('failed', []))} failed, "
+        f"⏱️ {len(by_status.get('timeout', []))} timed out, 🚫 {len(by_status.get('cancelled', []))} cancelled"
+    ]
+    if by_status.get("rolledback"):
+        lines[0] += f", ↩️ {len(by_status['rolledback'])} rolled back"
+    if by_status.get("indoubt"):
+        lines[0] += f", ❓ {len(by_status['indoubt'])} in doubt"
+    if by_status.get("skipped"):
+        lines[0] += f", ⏭️ {len(by_status['skipped'])} already done"
+    retried = sum(task.retries for task in tasks)
+    if retried:
+        lines[0] += f", 🔁 {retried} retr{'y' if retried == 1 else 'ies'}"
+    for status, label in (("failed", "Failed"), ("timeout", "Timed out"), ("cancelled", "Cancelled"),
+                          ("rolledback", "Rolled back"), ("indoubt", "Commit in doubt (check before rerunning)")):
+        if by_status.get(status):
+            lines.append(f"   {label}: " + ", ".join(by_status[status]))
+    slow = [f"{task.db} ({task.statement_timeouts})" for task in tasks if task.statement_timeouts]
+    if slow:
+        lines.append("   Statement timeouts: " + ", ".join(slow))
+    looked_up = [stats.cache for task in tasks for stats in task.statement_stats if stats.cache]
+    if looked_up:
+        hits = looked_up.count("hit")
+        lines.append(f"   🗃️ Result cache: {hits} hit(s), {len(looked_up) - hits} miss(es)")
+    return lines
+
+
+class StatementStats:
+    """Timings and volume of one statement on one database (seconds, approximate bytes)"""
+
+    def __init__(self, index, sql):
+        self.index = index
+        self.sql = sql
+        self.execute_s = 0.0
+        self.fetch_s = 0.0
+        self.commit_s = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.result_sets = 0
+        self.error = None
+        # "hit" or "miss" for a statement looked up in the result cache
+        self.cache = None
+
+    @property
+    def elapsed_s(self):
+        return self.execute_s + self.fetch_s + self.commit_s
+
+
+class DbTask:
+    """Unit of work: one script executed against one database"""
+
+    def __init__(self, index, server, db, statements):
+        self.index = index
+        self.server = server
+        self.db = db
+        self.statements = statements
+        self.status = "pending"
+        self.messages = []
+        self.columns = []
+        self.row_count = 0
+        self.statement_timeouts = 0
+        self.error = None
+        # Next statement to run; kept across reconnects
+        self.next_statement = 0
+        # Instrumentation, see metrics.py
+        self.connect_s = 0.0
+        self.elapsed_s = 0.0
+        # Single commit of the transactional commit modes
+        self.commit_s = 0.0
+        self.retries = 0
+        self.statement_stats = []
+        # Values for the :name placeholders of the script (script_params)
+        self.params = {}
+        # A statement that is not read-only ran, so later results are not cached
+        # while its transaction is open (result_cache)
+        self.wrote = False
+        # The connection was lost during a commit, which may or may not have gone through
+        self.in_doubt = False
+
+    def log(self, message):
+        self.messages.append(message)
+
+
+def stream_results(task, cursor, statement_index, emit=None, fetch_size=DEFAULT_FETCH_SIZE, stats=None,
+                   capture=None):
+    """Walk every result of the executed batch with description/nextset.
+
+    A result with a description is a row set (SELECT, WITH, EXEC, OUTPUT...)
+    and is streamed with its own column list; anything else is a row count.
+    Row and byte counts are added to stats when given, and the rows to
+    capture (a result_cache.ResultCapture).
+    """
+    result_index = 0
+    while True:
+        if cursor.description is not None:
+            columns = [desc[0] for desc in cursor.description]
+            if not task.columns:
+                task.columns = columns
+            if capture is not None:
+                capture.start(columns)
+
+            returned = 0
+            for rows in fetch_batches(cursor, fetch_size):
+                returned += len(rows)
+                if stats is not None or capture is not None:
+                    nbytes = estimate_bytes(rows)
+                    if stats is not None:
+                        # Counted per batch: rows already streamed must not be sent again on retry
+                        stats.rows += len(rows)
+                        stats.bytes += nbytes
+                    if capture is not None:
+                        capture.add(rows, nbytes)
+                if emit:
+                    emit(RowBatch(task.server, task.db, columns, rows, statement_index, result_index,
+                                  cursor.description))
+
+            task.row_count += returned
+            if stats is not None:
+                stats.result_sets += 1
+            task.log(f"  📊 Result set {result_index + 1} returned {returned} row(s)")
+            result_index += 1
+
+        elif cursor.rowcount != -1:
+            task.log(f"  🔄 {cursor.rowcount} row(s) affected")
+
+        if not cursor.nextset():
+            return
+
+
+def log_statement_error(task, err, statement_timeout=None):
+    if is_timeout_error(err):
+        task.statement_timeouts += 1
+        task.log(f"  ⏱️ Statement timed out after {statement_timeout}s:\n    {err}")
+    else:
+        task.log(f"  ⚠️ Statement error:\n    {err}")
+
+
+class StatementCache:
+    """Cursors of one connection keyed by statement text, least recently used evicted first.
+
+    pyodbc prepares the SQL of a cursor once and skips SQLPrepare while that
+    cursor keeps executing the same text with new parameters, so one cursor
+    per distinct statement keeps every statement of a run prepared on its
+    connection instead of re-preparing whenever another statement ran in
+    between. Evicted and remaining cursors are returned to the caller to
+    close (on a worker thread for the asyncio engine).
+    """
+
+    def __init__(self, size=STATEMENT_CACHE_SIZE):
+        self.size = max(1, size)
+        self._cursors = OrderedDict()
+
+    def get(self, key):
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+        return cursor
+
+    def put(self, key, cursor):
+        """Cache cursor; returns the evicted cursor, if any"""
+        self._cursors[key] = cursor
+        if len(self._cursors) > self.size:
+            return self._cursors.popitem(last=False)[1]
+        return None
+
+    def drain(self):
+        cursors = list(self._cursors.values())
+        self._cursors.clear()
+        return cursors
+
+
+def cached_cursor(cache, conn, statement):
+    key = str(statement)
+    cursor = cache.get(key)
+    if cursor is None:
+        cursor = conn.cursor()
+        evicted = cache.put(key, cursor)
+        if evicted is not None:
+            evicted.close()
+    return cursor
+
+
+def statement_args(task, statement):
+    """Arguments for cursor.execute: the SQL, plus the bound values of a parameterized statement"""
+    if isinstance(statement, ParameterizedStatement):
+        return statement, statement.bind(task.params)
+    return (statement,)
+
+
+def cache_lookup(task, args, stats, cache, cache_results=True):
+    """(key, cached result) of a statement in the result cache; key is None when the
+    statement is not read-only, which drops the cached results of its database, or
+    when cache_results is off"""
+    if cache is None:
+        return None, None
+    key = cache.key(task.server, task.db, *args)
+    if key is None:
+        task.wrote = True
+        cache.invalidate(task.server, task.db)
+        return None, None
+    if not cache_results:
+        return None, None
+    cached = cache.get(key)
+    stats.cache = "miss" if cached is None else "hit"
+    return key, cached
+
+
+def cached_batches(task, cached, statement_index, fetch_size=DEFAULT_FETCH_SIZE, stats=None):
+    """RowBatches replaying a cached result, logged and counted like streamed ones"""
+    age = round(cached.age)
+    for result_index, (columns, rows) in enumerate(cached.results):
+        if not task.columns:
+            task.columns = columns
+        for start in range(0, len(rows), fetch_size):
+            batch = rows[start:start + fetch_size]
+            if stats is not None:
+                stats.bytes += estimate_bytes(batch)
+            yield RowBatch(task.server, task.db, columns, batch, statement_index, result_index)
+        task.row_count += len(rows)
+        if stats is not None:
+            stats.rows += len(rows)
+            stats.result_sets += 1
+        task.log(f"  🗃️ Result set {result_index + 1} returned {len(rows)} row(s) from the cache ({age}s old)")
+
+
+def cache_store(task, key, capture, cache, transactional):
+    """Cache a captured result, unless the open transaction already changed the database.
+
+    Best effort: the statement already succeeded, so a failed write (disk
+    full, a value that cannot be pickled) is only logged.
+    """
+    if capture is not None and not (transactional and task.wrote):
+        try:
+            cache.put(key, capture)
+        except Exception as err:
+            task.log(f"  ⚠️ Result not cached: {err}")
+
+
+def execute_statement(task, conn, cursor, stats, emit=None, fetch_size=DEFAULT_FETCH_SIZE, commit=True,
+                      cache=None, cache_results=True):
+    """Execute, stream and (unless commit is False) commit one statement, timing each phase into stats.
+
+    With a result cache any statement that is not read-only drops its
+    database's cached results; with cache_results a read-only statement
+    the cache holds is replayed instead of executed, and the rows of any
+    other read-only statement are kept.
+    """
+    statement = task.statements[stats.index]
+    mark = time.perf_counter()
+    key = capture = None
+    if isinstance(statement, str):
+        args = statement_args(task, statement)
+        key, cached = cache_lookup(task, args, stats, cache, cache_results)
+        if cached is not None:
+            for batch in cached_batches(task, cached, stats.index, fetch_size, stats):
+                if emit:
+                    emit(batch)
+            stats.fetch_s = time.perf_counter() - mark
+            return
+        if key is not None:
+            capture = cache.capture()
+        cursor.execute(*args)
+        stats.execute_s = time.perf_counter() - mark
+        stream_results(task, cursor, stats.index, emit, fetch_size, stats, capture)
+        stats.fetch_s = time.perf_counter() - mark - stats.execute_s
+    else:
+        # A bulk statement (bulk_load.BulkInsert) sends its own batches
+        if cache is not None:
+            task.wrote = True
+            cache.invalidate(task.server, task.db)
+        loaded = statement.execute(cursor)
+        stats.execute_s = time.perf_counter() - mark
+        task.log(f"  📥 {loaded} row(s) loaded into {statement.table}")
+    if commit:
+        mark = time.perf_counter()
+        commit_or_doubt(task, conn)
+        stats.commit_s = time.perf_counter() - mark
+    cache_store(task, key, capture, cache, not commit)
+
+
+def commit_or_doubt(task, conn):
+    """conn.commit(); a connection lost during it leaves the outcome unknown.
+
+    The work may have been applied, so the task is marked in_doubt and
+    neither the statement nor the transaction is run again.
+    """
+    try:
+        conn.commit()
+    except Exception as err:
+        if is_connection_error(err):
+            task.in_doubt = True
+            task.log(f"  ⚠️ Connection lost while committing on {task.db}; "
+                     "the changes may have been applied and are not retried")
+        raise
+
+
+def commit_transaction(task, conn):
+    """The one commit of a database in the transactional commit modes"""
+    mark = time.perf_counter()
+    commit_or_doubt(task, conn)
+    task.commit_s += time.perf_counter() - mark
+    task.log(f"  💾 Committed the transaction on {task.db}")
+
+
+def run_statement(task, conn, cursor, index, control, emit=None, fetch_size=DEFAULT_FETCH_SIZE):
+    """Run statement index, retrying deadlocks; returns a stop reason or None.
+
+    A lost connection is raised so the caller can reconnect, unless it was
+    lost during the commit (task.in_doubt): then the database fails. A deadlock is
+    only retried while no rows of the statement have been streamed yet, so
+    sinks never see duplicates. In the transactional commit modes every
+    error is raised: the transaction is lost as a whole.
+    """
+    attempt = 0
+    while True:
+        stats = StatementStats(index, str(task.statements[index]))
+        task.statement_stats.append(stats)
+        try:
+            execute_statement(task, conn, cursor, stats, emit, fetch_size, not control.transactional, control.cache,
+                              control.cache_results)
+        except Exception as stmt_err:
+            stats.error = str(stmt_err)
+            if task.in_doubt:
+                raise
+            # An error caused by cancel() is not worth reporting
+            stopped = control.stop_reason(task)
+            if stopped:
+                return stopped
+            if control.transactional:
+                raise_in_transaction(task, index, stmt_err)
+            if is_connection_error(stmt_err):
+                if not stats.rows:
+                    raise
+                # Reconnecting would run the statement again and stream its rows twice
+                task.log(f"  ⚠️ Connection lost after {stats.rows} row(s) were streamed; statement {index + 1} is not retried")
+            if is_deadlock(stmt_err) and not stats.rows and retry_after(task, control, stmt_err, attempt, conn.rollback):
+                attempt += 1
+                continue
+            log_statement_error(task, stmt_err, control.statement_timeout)
+            return None
+
+        if control.journal is not None and not control.transactional:
+            control.journal.statement_done(task.server, task.db, index)
+        return None
+
+
+def raise_in_transaction(task, index, err):
+    """A statement failed inside a database transaction: count it and fail the database"""
+    if is_timeout_error(err):
+        task.statement_timeouts += 1
+    task.log(f"  ⚠️ Statement {index + 1} failed, rolling back the transaction on {task.db}")
+    raise err
+
+
+def run_statements(task, pool, control, emit=None, fetch_size=DEFAULT_FETCH_SIZE, started=None):
+    """Run task.next_statement onwards on one pooled connection; returns a stop reason or None.
+
+    Each distinct statement gets its own cursor (StatementCache). In
+    "database" commit mode the transaction is committed at the end; in
+    "all" mode the connection is handed to control.prepared still open.
+    """
+    stopped = None
+    journal = control.journal
+    pooled = pool.acquire(task.server, task.db)
+    held = False
+    cache = StatementCache()
+    try:
+        conn = pooled.conn
+        task.connect_s = time.perf_counter() - (started or time.perf_counter())
+        apply_statement_timeout(conn, control.statement_timeout)
+
+        try:
+            while task.next_statement < len(task.statements):
+                index = task.next_statement
+                stopped = control.stop_reason(task)
+                if stopped:
+                    break
+                if journal is not None and journal.statement_completed(task.server, task.db, index):
+                    task.log(f"  ⏭️ Statement {index + 1} already done in a previous run")
+                else:
+                    cursor = cached_cursor(cache, conn, task.statements[index])
+                    control.track(task, cursor)
+                    stopped = run_statement(task, conn, cursor, index, control, emit, fetch_size)
+                    if stopped:
+                        break
+                task.next_statement += 1
+        finally:
+            control.untrack(task)
+
+        for cursor in cache.drain():
+            cursor.close()
+        if not stopped and control.commit_mode == "database":
+            commit_transaction(task, conn)
+        elif not stopped and control.prepared is not None:
+            control.prepared.hold(task, pooled)
+            held = True
+    except Exception:
+        pool.release(pooled, discard=True)
+        raise
+    if not held:
+        pool.release(pooled)
+    return stopped
+
+
+def skip_completed(task, journal):
+    """Mark a task already finished (or left in doubt) in a resumed run; True if it needs no work"""
+    if journal is not None and journal.database_in_doubt(task.server, task.db):
+        task.status = "indoubt"
+        task.log(f"⏭️ Skipped {task.db}: a commit was in doubt in a previous run; check it and run it without resuming")
+        return True
+    if journal is None or not journal.database_completed(task.server, task.db):
+        return False
+    task.status = "skipped"
+    task.log(f"⏭️ Skipped {task.db} (completed in a previous run)")
+    return True
+
+
+def failed_statements(task):
+    """Indexes of the statements whose last attempt failed"""
+    last = {}
+    for stats in task.statement_stats:
+        last[stats.index] = stats
+    return sorted(index for index, stats in last.items() if stats.error)
+
+
+def finish_db_task(task, control, stopped=None, error=None):
+    """Final status, log lines and journal entry of a task"""
+    if error is not None and task.in_doubt:
+        task.status = "indoubt"
+        task.error = error
+        task.log(f"\n❓ Commit in doubt on {task.db}:\n   {error}\n   Check the database before running the script on it again")
+    elif error is not None:
+        task.status = "failed"
+        task.error = error
+        task.log(f"\n❌ Failed on {task.db}:\n   {error}")
+    elif stopped:
+        log_stopped(task, stopped, control.db_timeout)
+    else:
+        task.status = "done"
+        task.log(f"\n✅ Finished execution on {task.db}")
+
+    if control.transactional and task.status in ("failed", "timeout", "cancelled"):
+        task.log(f"↩️ Changes on {task.db} were rolled back")
+    if control.prepared is not None and task.status in ("failed", "timeout", "indoubt"):
+        # All-or-nothing: nothing can commit any more, stop the other databases
+        task.log("🛑 Cancelling the remaining databases (all-or-nothing)")
+        control.cancel()
+
+    if control.journal is not None:
+        status = task.status
+        failed = failed_statements(task)
+        if status == "done" and failed:
+            # Not complete: a resumed run reruns the statements not journaled as done
+            status = "incomplete"
+            task.log(f"⚠️ {len(failed)} statement(s) failed on {task.db}; a resumed run runs them again")
+        control.journal.database_done(task.server, task.db, status)
+    task.log(f"🟨========== Done with {task.db} ==========\n")
+
+
+def run_db_task(task, pool, emit=None, fetch_size=DEFAULT_FETCH_SIZE, control=None):
+    """Run every statement of a task in order, committed as control.commit_mode says.
+
+    Result rows are streamed to emit() in batches of fetch_size instead of
+    being kept on the task. With a RunControl the task stops at the first
+    statement after cancel() or its db_timeout, transient errors are
+    retried with backoff (a lost connection resumes at the failed statement
+    on a new one, or restarts the transaction in the transactional modes)
+    and journaled work is skipped. In "all" mode a task that succeeded is
+    left "prepared" for PreparedTransactions.resolve() to finish.
+    """
+    control = control or RunControl()
+    if skip_completed(task, control.journal):
+        return task
+    task.status = "running"
+    task.log(f"\n🟦========== Executing on database: {task.db} ==========")
+
+    started = time.perf_counter()
+    stopped = error = None
+    attempt = 0
+    while True:
+        try:
+            stopped = run_statements(task, pool, control, emit, fetch_size, started)
+            break
+        except Exception as db_err:
+            if retry_transaction(task, control) and retry_after(task, control, db_err, attempt):
+                attempt += 1
+                continue
+            stopped = control.stop_reason(task)
+            if not stopped or task.in_doubt:
+                error = db_err
+            break
+
+    task.elapsed_s = time.perf_counter() - started
+    if task.status != "prepared":
+        finish_db_task(task, control, stopped, error)
+    return task
+
+
+def retry_transaction(task, control):
+    """Whether a failed database may be retried; a lost transaction restarts at its first statement.
+
+    Not once its rows reached the sinks, which would see them twice, nor
+    after a commit in doubt, which may have applied the changes already.
+    """
+    if task.in_doubt:
+        return False
+    if not control.transactional:
+        # Resumes at the failed statement, unless some of its rows were streamed already
+        return not any(stats.rows for stats in task.statement_stats if stats.index == task.next_statement)
+    if task.row_count:
+        return False
+    task.next_statement = 0
+    return True
+
+
+class OrderedMerge:
+    """Calls on_merge(task) in task order while tasks finish in any order"""
+
+    def __init__(self, on_merge=None):
+        self.on_merge = on_merge
+        self._finished = {}
+        self._next = 0
+
+    def add(self, position, task):
+        self._finished[position] = task
+        while self._next in self._finished:
+            ready = self._finished.pop(self._next)
+            if self.on_merge:
+                self.on_merge(ready)
+            self._next += 1
+
+
+def worker_capacity(tasks, max_concurrency, server_limits):
+    """Workers needed to run tasks at the per-server concurrency limits"""
+    servers = {task.server for task in tasks}
+    capacity = sum(max(1, int(server_limits.get(s, max_concurrency))) for s in servers)
+    return max(1, min(len(tasks), capacity))
+
+
+class ParallelExecutor:
+    """Fans a list of DbTasks out over a worker pool.
+
+    Concurrency is bounded per server; results are handed back in task order
+    regardless of the order in which databases finish.
+
+    Every executor backend (see ENGINES) has this constructor and run()
+    signature, so callers can swap them freely.
+    """
+
+    def __init__(self, pool, max_concurrency=DEFAULT_MAX_CONCURRENCY, server_limits=None,
+                 pipeline=None, fetch_size=DEFAULT_FETCH_SIZE, control=None):
+        self.pool = pool
+        self.pipeline = pipeline
+        self.fetch_size = fetch_size
+        self.control = control or RunControl()
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.server_limits = dict(server_limits or {})
+        self._server_slots = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, server):
+        with self._lock:
+            if server not in self._server_slots:
+                limit = self.server_limits.get(server, self.max_concurrency)
+                self._server_slots[server] = threading.BoundedSemaphore(max(1, int(limit)))
+            return self._server_slots[server]
+
+    def cancel(self):
+        self.control.cancel()
+
+    def _run(self, task):
+        with self._slot(task.server):
+            if self.control.cancelled:
+                task.status = "cancelled"
+                task.log(f"🚫 Skipped {task.db} (cancelled)")
+                return task
+
+            timer = None
+            if self.control.db_timeout:
+                timer = threading.Timer(self.control.db_timeout, self.control.expire, (task,))
+                timer.daemon = True
+                timer.start()
+            emit = self.pipeline.emit if self.pipeline else None
+            try:
+                return run_db_task(task, self.pool, emit, self.fetch_size, self.control)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                if self.pipeline:
+                    self.pipeline.end_database(task.server, task.db)
+
+    def run(self, tasks, on_complete=None, on_merge=None):
+        """Execute tasks and block until all are finished.
+
+        on_complete(task) fires as each database finishes (completion order),
+        on_merge(task) fires in the original task order.
+        """
+        tasks = list(tasks)
+        merge = OrderedMerge(on_merge)
+        workers = worker_capacity(tasks, self.max_concurrency, self.server_limits)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlrunner") as pool:
+            futures = {pool.submit(self._run, task): position for position, task in enumerate(tasks)}
+            for future in as_completed(futures):
+                task = future.result()
+                if on_complete:
+                    on_complete(task)
+                merge.add(futures[future], task)
+
+        return tasks
+
+
+def create_executor(engine, pool, **options):
+    """Executor backend by name: "threads" (ParallelExecutor) or "asyncio" (AsyncExecutor)"""
+    if engine == "threads":
+        return ParallelExecutor(pool, **options)
+    if engine == "asyncio":
+        from async_engine import AsyncExecutor
+        return AsyncExecutor(pool, **options)
+    raise ValueError(f"Unknown engine '{engine}', expected one of: {', '.join(ENGINES)}")
+
+
+def run_script(pool, server, dbs, script, sinks=(), max_concurrency=DEFAULT_MAX_CONCURRENCY,
+               on_complete=None, on_merge=None, engine=DEFAULT_ENGINE, control=None, metrics=None, params=None,
+               server_limits=None):
+    """Run script on every database in dbs, streaming result rows into sinks.
+
+    dbs holds database names on server, or (server, name) pairs to fan out
+    over several servers at once; server_limits caps the databases run at
+    the same time per server (max_concurrency for the others).
+
+    script is SQL text split on GO, or a ready list of statements (SQL
+    strings or bulk_load.BulkInsert objects). With params (a
+    script_params.ScriptParams) :name placeholders are bound per database
+    through cursor.execute(sql, values) instead of being sent as text.
+    control is an optional RunControl to cancel the run, set timeouts or the
+    commit mode; metrics an optional metrics.MetricsRecorder fed with every
+    finished task. In "all" commit mode every database keeps a connection
+    until the end, so the pool limit of each server is raised to its number
+    of databases, and on_merge and metrics only see the tasks once the commit
+    or rollback verdict is known. Returns (tasks, sink_errors).
+    """
+    control = control or RunControl()
+    prepared = control.prepared
+    statements = split_statements(script) if isinstance(script, str) else list(script)
+    if params is not None:
+        statements = parameterize_all(statements)
+    pipeline = ResultPipeline(sinks).start()
+
+    targets = [db if isinstance(db, tuple) else (server, db) for db in dbs]
+    tasks = [DbTask(i, target_server, db, statements) for i, (target_server, db) in enumerate(targets)]
+    if params is not None:
+        for task in tasks:
+            task.params = params.values_for(task.db, task.server)
+    executor = create_executor(engine, pool, max_concurrency=max_concurrency, server_limits=server_limits,
+                               pipeline=pipeline, control=control)
+    if prepared is not None:
+        limits = dict(pool.server_limits)
+        for target_server in {task.server for task in tasks}:
+            count = sum(1 for task in tasks if task.server == target_server)
+            pool.server_limits[target_server] = max(pool.limit_for(target_server), count)
+
+    def completed(task):
+        if metrics is not None and prepared is None:
+            metrics.record(task)
+        if on_complete:
+            on_complete(task)
+
+    try:
+        executor.run(tasks, on_complete=completed, on_merge=on_merge if prepared is None else None)
+    finally:
+        if prepared is not None:
+            # Also rolls everything back if the executor itself failed
+            prepared.resolve(pool, tasks, control)
+            pool.server_limits = limits
+        pipeline.close()
+
+    if prepared is not None:
+        for task in tasks:
+            if metrics is not None:
+                metrics.record(task)
+            if on_merge:
+                on_merge(task)
+    return tasks, pipeline.errors
@@ -0,0 +1,293 @@
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import re
+import sys
+
+from streaming import DEFAULT_FETCH_SIZE, RowSink, source_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMATS = ("csv", "jsonl", "parquet", "arrow")
+COMPRESSIONS = ("gzip", "zstd")
+# Arrow IPC files only compress their buffers with zstd (or lz4)
+ARROW_COMPRESSIONS = ("zstd",)
+# Widest SQL Server DECIMAL; every decimal column is written with this precision
+DECIMAL_PRECISION = 38
+
+_EXTENSIONS = {
+    ".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl",
+    ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow",
+}
+_COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+
+def guess_format(path):
+    """(format, compression) implied by a file name such as out.csv.gz"""
+    root, ext = os.path.splitext(path.lower())
+    compression = _COMPRESSION_SUFFIXES.get(ext)
+    if compression:
+        root, ext = os.path.splitext(root)
+    return _EXTENSIONS.get(ext, "csv"), compression
+
+
+def check_compression(fmt, compression):
+    """ValueError for a compression the format cannot write (e.g. out.arrow.gz)"""
+    if fmt == "arrow" and compression and compression not in ARROW_COMPRESSIONS:
+        raise ValueError(f"Arrow files support {', '.join(ARROW_COMPRESSIONS)} compression, not {compression}")
+
+
+def decimal_scale(value):
+    return max(0, -value.as_tuple().exponent) if value.is_finite() else 0
+
+
+def tagged_path(path, tag):
+    """Insert a tag before the extension(s): out.csv.gz -> out.<tag>.csv.gz"""
+    head, name = os.path.split(path)
+    stem, dot, rest = name.partition(".")
+    return os.path.join(head, f"{stem}.{tag}{dot}{rest}" if dot else f"{stem}.{tag}")
+
+
+def per_database_path(path, db):
+    """Path for one database's file: fills {db} or inserts the name before the extension"""
+    safe = re.sub(r"[^\w.-]", "_", db)
+    if "{db}" in path:
+        return path.replace("{db}", safe)
+    return tagged_path(path, safe)
+
+
+def open_text(path, compression=None):
+    if path == "-":
+        return sys.stdout
+    if compression == "gzip":
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the 'zstandard' package")
+        raw = zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+        return io.TextIOWrapper(raw, newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def json_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
+
+
+class CsvWriter:
+    def __init__(self, path, compression=None):
+        self.file = open_text(path, compression)
+        self.writer = csv.writer(self.file)
+        self.header_written = False
+
+    def write(self, source_names, source, columns, rows, description=None):
+        if not self.header_written:
+            self.writer.writerow(source_names + list(columns))
+            self.header_written = True
+        self.writer.writerows(source + tuple(row) for row in rows)
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, compression=None):
+        self.file = open_text(path, compression)
+
+    def write(self, source_names, source, columns, rows, description=None):
+        keys = source_names + list(columns)
+        self.file.writelines(
+            json.dumps(dict(zip(keys, source + tuple(row))), default=json_value, ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+
+class ArrowWriter:
+    """Parquet or Arrow IPC file; the schema is inferred from the first batch.
+
+    A column that is all NULL in the first batch has no type yet; it is
+    written as text, so later batches with values still fit the schema.
+    Decimal columns get the widest precision and the scale of the cursor
+    description (else the largest scale in the first batch), so later
+    values with more digits fit too; a value with more decimal places than
+    that scale is rounded to it.
+    """
+
+    def __init__(self, path, compression=None, fmt="parquet"):
+        if pa is None:
+            raise RuntimeError(f"{fmt} export needs the 'pyarrow' package")
+        check_compression(fmt, compression)
+        self.path = path
+        self.compression = compression
+        self.fmt = fmt
+        self.schema = None
+        self.writer = None
+        self.text_columns = set()
+        self.decimal_quanta = {}
+
+    def _decimal_scales(self, columns, rows, description):
+        scales = {}
+        for i, name in enumerate(columns):
+            desc = description[i] if description and i < len(description) else None
+            if desc is not None and desc[1] is decimal.Decimal and desc[5] is not None:
+                scales[name] = desc[5]
+            else:
+                values = [row[i] for row in rows if isinstance(row[i], decimal.Decimal)]
+                if values:
+                    scales[name] = max(decimal_scale(value) for value in values)
+        return scales
+
+    def _create_schema(self, data, columns, rows, description):
+        scales = self._decimal_scales(columns, rows, description)
+        fields = []
+        for field in pa.table(data).schema:
+            if pa.types.is_null(field.type):
+                self.text_columns.add(field.name)
+                field = field.with_type(pa.string())
+            elif pa.types.is_decimal(field.type):
+                scale = min(DECIMAL_PRECISION, scales.get(field.name, field.type.scale))
+                self.decimal_quanta[field.name] = (scale, decimal.Decimal(1).scaleb(-scale))
+                field = field.with_type(pa.decimal128(DECIMAL_PRECISION, scale))
+            fields.append(field)
+        self.schema = pa.schema(fields)
+        if self.fmt == "parquet":
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression=self.compression or "snappy")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self.writer = pa.ipc.new_file(self.path, self.schema, options=options)
+
+    def write(self, source_names, source, columns, rows, description=None):
+        data = {name: [value] * len(rows) for name, value in zip(source_names, source)}
+        for i, name in enumerate(columns):
+            data[name] = [row[i] for row in rows]
+        if self.schema is None:
+            self._create_schema(data, columns, rows, description)
+        for name in self.text_columns:
+            data[name] = [value if value is None or isinstance(value, str) else str(value) for value in data[name]]
+        for name, (scale, quantum) in self.decimal_quanta.items():
+            data[name] = [
+                value.quantize(quantum) if isinstance(value, decimal.Decimal) and decimal_scale(value) > scale else value
+                for value in data[name]
+            ]
+        self.writer.write_table(pa.Table.from_pydict(data, schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def create_writer(path, fmt, compression=None):
+    if fmt == "csv":
+        return CsvWriter(path, compression)
+    if fmt == "jsonl":
+        return JsonlWriter(path, compression)
+    if fmt in ("parquet", "arrow"):
+        return ArrowWriter(path, compression, fmt)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_rows(path, columns, rows, batch_rows=DEFAULT_FETCH_SIZE):
+    """Write collected rows in the format implied by path (out.csv, out.jsonl.gz, out.parquet...).
+
+    rows may be a list of tuples or a ColumnStore/RowsView, which is read a
+    chunk at a time instead of being materialized as a whole.
+    """
+    fmt, compression = guess_format(path)
+    if hasattr(rows, "iter_batches"):
+        batches = rows.iter_batches()
+    else:
+        batches = (rows[i:i + batch_rows] for i in range(0, len(rows), batch_rows))
+    writer = create_writer(path, fmt, compression)
+    try:
+        for batch in batches:
+            writer.write([], (), columns, batch)
+    finally:
+        writer.close()
+
+
+class FileSink(RowSink):
+    """Writes streamed batches to disk as they are fetched.
+
+    One merged file, or with per_database=True one file per database that is
+    closed as soon as that database is done. Nothing is buffered beyond the
+    batch being written. The first result schema goes to the given path;
+    every further result set of the script gets its own file tagged rs2, rs3...
+    with_server adds a server column (and the server to per-database file
+    names) for runs spanning several servers.
+    """
+
+    def __init__(self, path, fmt=None, compression=None, per_database=False, with_server=False):
+        guessed_fmt, guessed_compression = guess_format(path)
+        self.path = path
+        self.fmt = fmt or guessed_fmt
+        self.compression = compression or guessed_compression
+        check_compression(self.fmt, self.compression)
+        self.per_database = per_database
+        self.with_server = with_server
+        self.source_names = source_columns(with_server)
+        self.rows_written = 0
+        self.files = []
+        self._writers = {}
+        self._schemas = {}
+
+    def _open(self, key):
+        source, schema = key
+        path = per_database_path(self.path, "_".join(source)) if self.per_database else self.path
+        if schema:
+            path = tagged_path(path, f"rs{schema + 1}")
+        self._writers[key] = create_writer(path, self.fmt, self.compression)
+        self.files.append(path)
+        return self._writers[key]
+
+    def start(self):
+        if not self.per_database:
+            # Open eagerly so a bad path fails before any query runs
+            self._open((None, 0))
+
+    def write_batch(self, batch):
+        schema = self._schemas.setdefault(batch.schema_key, len(self._schemas))
+        source = batch.source(self.with_server)
+        key = (source if self.per_database else None, schema)
+        writer = self._writers.get(key) or self._open(key)
+        writer.write(self.source_names, source, batch.columns, batch.rows, batch.description)
+        self.rows_written += len(batch.rows)
+
+    def end_database(self, server, db):
+        if self.per_database:
+            source = (server, db) if self.with_server else (db,)
+            for key in [k for k in self._writers if k[0] == source]:
+                self._writers.pop(key).close()
+
+    def finish(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
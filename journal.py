@@ -0,0 +1,115 @@
+"""Append-only run journal, so an interrupted run can be resumed.
+
+Each committed statement and each finished database is one short JSON line
+in the journal file. Lines are flushed to the OS as they are written (no
+fsync), which survives an application crash at the cost of a write syscall
+per statement. A statement that committed just before a crash but was not
+yet journaled will run again on resume.
+
+    {"run": "<script sha1>", "server": "...", "started_at": 1700000000.0}
+    {"server": "sql01", "db": "tenant_001", "stmt": 0}
+    {"server": "sql01", "db": "tenant_001", "status": "done"}
+
+Only "done" (every statement succeeded) completes a database; any other
+status ("incomplete", "failed"...) leaves it to run again on resume, except
+"indoubt": the connection was lost during a commit that may have been
+applied, so a resumed run skips the database until it has been checked.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from config import get_config_path
+
+
+def script_hash(script):
+    return hashlib.sha1(script.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def get_journal_path(server, script):
+    """Journal file for one server and script, kept in a journals folder next to profiles.json"""
+    directory = os.path.join(os.path.dirname(get_config_path()), "journals")
+    os.makedirs(directory, exist_ok=True)
+    safe = re.sub(r"[^\w.-]", "_", server)
+    return os.path.join(directory, f"{safe}_{script_hash(script)[:12]}.jsonl")
+
+
+class RunJournal:
+    """Records completed statements and databases of one script run.
+
+    With resume=True an existing journal for the same script is read first
+    and appended to; its completed databases are skipped and partly done
+    databases continue after their last committed statement.
+    """
+
+    def __init__(self, path, server, script, resume=False):
+        self.path = path
+        self.server = server
+        self.script_sha1 = script_hash(script)
+        self.resumed = False
+        self._done_statements = {}
+        self._done_databases = set()
+        self._in_doubt = set()
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            self._load()
+            self.resumed = True
+        self.file = open(path, "a" if self.resumed else "w", encoding="utf-8")
+        self._write({"run": self.script_sha1, "server": server, "started_at": time.time(), "resumed": self.resumed})
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+                if "run" in record and record["run"] != self.script_sha1:
+                    raise ValueError(f"Journal {self.path} belongs to a different script; cannot resume")
+                if "db" not in record:
+                    continue
+                # Older journals only name the database; it was on the run's server
+                key = (record.get("server", self.server), record["db"])
+                if "stmt" in record:
+                    self._done_statements.setdefault(key, set()).add(record["stmt"])
+                elif record.get("status") == "done":
+                    self._done_databases.add(key)
+                elif record.get("status") == "indoubt":
+                    self._in_doubt.add(key)
+
+    def _write(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def database_completed(self, server, db):
+        return (server, db) in self._done_databases
+
+    def database_in_doubt(self, server, db):
+        return (server, db) in self._in_doubt
+
+    def statement_completed(self, server, db, index):
+        return index in self._done_statements.get((server, db), ())
+
+    @property
+    def completed_databases(self):
+        return len(self._done_databases)
+
+    def statement_done(self, server, db, index):
+        self._done_statements.setdefault((server, db), set()).add(index)
+        self._write({"server": server, "db": db, "stmt": index})
+
+    def database_done(self, server, db, status):
+        if status == "done":
+            self._done_databases.add((server, db))
+        self._write({"server": server, "db": db, "status": status})
+
+    def close(self):
+        with self._lock:
+            self.file.close()
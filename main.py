@@ -1,15 +1,43 @@
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 import tkinter as tk
 import pyodbc
 import threading
-import csv
-import re
-import platform
+import time
 import os
 from thread_login import LoginDialog
+from config import load_profiles
+from engine import (
+    COMMIT_MODES, DEFAULT_COMMIT_MODE, DEFAULT_ENGINE, DEFAULT_MAX_CONCURRENCY, ENGINES, RunControl, create_pool,
+    add_server, run_script, summary_lines,
+)
+from catalog import DatabaseCatalog
+from selection import SelectionModel, MATCH_MODES
+from db_selector import DatabaseList
+from streaming import CollectingSink
+from aggregation import AggregatingSink, parse_aggregates, parse_group_by
+from drift import COMPARE_MODES, DEFAULT_COMPARE_MODE, DriftSink
+from metrics import MetricsRecorder
+from journal import RunJournal, get_journal_path
+from retry import DEFAULT_MAX_RETRIES, RetryPolicy
+from exporters import FileSink, export_rows
+from bulk_load import BulkInsert, load_signature, table_name
+from script_params import ScriptParams, parse_assignments
+from result_grid import VirtualGrid
+from result_store import DEFAULT_MEMORY_BUDGET_MB
+from result_query import ResultIndex, RowSelection, parse_filter
+from result_cache import DEFAULT_MAX_MB, DEFAULT_TTL, ResultCache, get_cache_dir
+from ui_bus import UIEventBus, BATCH, LAST
+
+# Rows kept for the results grid and export; the rest is only counted. Past the
+# memory budget (RESULT_MEMORY_MB) kept rows are spilled to a temporary file
+MAX_RESULT_ROWS = 5000000
+# Delay before the database list is filtered while typing in its search box
+SEARCH_DEBOUNCE_MS = 150
+# Databases and statements listed by the Timings view
+TIMING_TABLE_ROWS = 25
 
 class SQLApp:
-    def __init__(self, root,creds):
+    def __init__(self, root,creds, connection=None):
         self.root = root
         self.root.title("🎯 Multi-DB SQL Runner")
         self.root.geometry("900x700")
@@ -20,11 +48,23 @@ class SQLApp:
         self.PASSWORD = creds["PASSWORD"]
         self.DRIVER = creds["DRIVER"]
 
-        self.USE_WINDOWS_AUTH = False
+        self.USE_WINDOWS_AUTH = bool(creds.get("WINDOWS_AUTH", False))
+        self.creds = dict(creds, WINDOWS_AUTH=self.USE_WINDOWS_AUTH)
+        self.MAX_CONCURRENCY = int(creds.get("MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+        self.RESULT_MEMORY_BUDGET = int(creds.get("RESULT_MEMORY_MB", DEFAULT_MEMORY_BUDGET_MB)) * 1024 * 1024
+        # Read-only results served again without a round trip; RESULT_CACHE "disk" keeps them across sessions
+        self.result_cache = ResultCache(int(creds.get("RESULT_CACHE_TTL", DEFAULT_TTL)),
+                                        int(creds.get("RESULT_CACHE_MB", DEFAULT_MAX_MB)),
+                                        get_cache_dir() if creds.get("RESULT_CACHE") == "disk" else None)
 
         if not self.SQL_SERVER or not self.PASSWORD or not self.DRIVER:
             raise ValueError("Missing necessary environment variables.")
 
+        # Connections are reused across runs and switched between databases with USE
+        self.pool = create_pool(self.creds, self.MAX_CONCURRENCY, connect=pyodbc.connect)
+        if connection is not None:
+            self.pool.adopt(self.SQL_SERVER, "master", connection)
+
         # UI themes configuration
         self.themes = {
             "light": {
@@ -44,47 +84,48 @@ class SQLApp:
         self.tab_control.add(self.log_tab, text="📝 Output Log")
         self.tab_control.add(self.result_tab, text="📊 Query Results")
 
-        self.db_vars = {}
+        self.selection = SelectionModel()
         self.all_databases = []
+        self._search_after_id = None
         self.last_results = []
         self.last_columns = []
+        # Rows sort, filter and search apply to; last_results is what the grid shows
+        self.base_results = []
+        self.result_index = None
+        self.sort_column = None
+        self.sort_descending = False
+        self.query_active = False
+        self.query_generation = 0
+        # (label, columns, rows) computed at the end of an aggregate or compare run
+        self.static_tables = None
+        self.result_sink = None
+        self.run_control = None
+        self.metrics = None
+        self.result_set_index = 0
 
         self.root.rowconfigure(0, weight=1)
         self.root.columnconfigure(0, weight=1)
 
         self.build_ui()
         self.apply_theme()
-        threading.Thread(target=self.load_databases, daemon=True).start()
 
-    def bind_mousewheel(self, widget, target_canvas):
-        os_name = platform.system()
-
-        def _on_mousewheel(event):
-            if os_name == 'Windows':
-                target_canvas.yview_scroll(-1 * int(event.delta / 120), "units")
-            elif os_name == 'Darwin':  # macOS
-                target_canvas.yview_scroll(-1 * int(event.delta), "units")
-            return "break"
-
-        def _on_linux_scroll(event):
-            if event.num == 4:
-                target_canvas.yview_scroll(-1, "units")
-            elif event.num == 5:
-                target_canvas.yview_scroll(1, "units")
-            return "break"
-
-        if os_name in ['Windows', 'Darwin']:
-            widget.bind("<Enter>", lambda e: widget.bind_all("<MouseWheel>", _on_mousewheel))
-            widget.bind("<Leave>", lambda e: widget.unbind_all("<MouseWheel>"))
-        else:
-            widget.bind("<Enter>", lambda e: (
-                widget.bind_all("<Button-4>", _on_linux_scroll),
-                widget.bind_all("<Button-5>", _on_linux_scroll)
-            ))
-            widget.bind("<Leave>", lambda e: (
-                widget.unbind_all("<Button-4>"),
-                widget.unbind_all("<Button-5>")
-            ))
+        # All worker -> widget updates go through this bus, drained once per frame
+        self.ui_bus = UIEventBus(self.root)
+        self.ui_bus.subscribe("log", self.append_log, mode=BATCH)
+        self.ui_bus.subscribe("progress", self.set_progress, mode=LAST)
+        self.ui_bus.subscribe("results", self.refresh_results, mode=LAST)
+        self.ui_bus.start()
+
+        # Show the cached catalog right away and refresh it in the background
+        self.catalog = DatabaseCatalog(self.SQL_SERVER)
+        # Servers of other saved profiles added with 🌐 Servers; their databases are listed as server/db
+        self.extra_catalogs = {}
+        if self.catalog.load():
+            self.all_databases = self.all_database_names()
+            self.selection.set_names(self.all_databases)
+            self.update_checkboxes()
+            self.log(f"📚 {len(self.all_databases)} database(s) from cache, refreshing...")
+        threading.Thread(target=self.load_databases, daemon=True).start()
 
     def build_ui(self):
         # === Main Layout (Notebook) ===
@@ -116,33 +157,35 @@ class SQLApp:
         # Search DB
         tk.Label(top_frame, text="Search DB:").pack(side=tk.LEFT)
         self.search_var = tk.StringVar()
-        self.search_var.trace_add("write", lambda *args: self.update_checkboxes())
+        self.search_var.trace_add("write", lambda *args: self.schedule_filter())
         search_entry = tk.Entry(top_frame, textvariable=self.search_var, width=25)
         search_entry.pack(side=tk.LEFT, padx=10)
 
+        self.match_mode_var = tk.StringVar(value=MATCH_MODES[0])
+        match_mode = ttk.Combobox(top_frame, textvariable=self.match_mode_var, values=MATCH_MODES,
+                                  state="readonly", width=9)
+        match_mode.pack(side=tk.LEFT, padx=5)
+        match_mode.bind("<<ComboboxSelected>>", lambda e: self.update_checkboxes())
+
         tk.Button(top_frame, text="Select All", command=self.select_all).pack(side=tk.LEFT, padx=5)
         tk.Button(top_frame, text="Deselect All", command=self.deselect_all).pack(side=tk.LEFT, padx=5)
+        tk.Button(top_frame, text="🌐 Servers...", command=self.choose_servers).pack(side=tk.LEFT, padx=5)
 
+        self.online_only_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(top_frame, text="Online only", variable=self.online_only_var,
+                       command=self.update_checkboxes).pack(side=tk.LEFT, padx=5)
+
+        self.selection_label = tk.Label(top_frame, text="")
+        self.selection_label.pack(side=tk.RIGHT)
 
         # DB List
         db_frame = tk.LabelFrame(self.tab_databases, text="Select Databases", padx=10, pady=10)
         db_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        canvas = tk.Canvas(db_frame)
-        scrollbar = ttk.Scrollbar(db_frame, orient="vertical", command=canvas.yview)
-        self.checkbox_frame = tk.Frame(canvas)
-
-        self.checkbox_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=self.checkbox_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
 
-
-        self.loading_label = tk.Label(self.checkbox_frame, text="🔄 Loading databases...", font=("Helvetica", 12))
-        self.loading_label.pack(pady=20)
-
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill='y')
-        self.bind_mousewheel(canvas, canvas)
+        self.db_list = DatabaseList(db_frame, self.selection, label_for=self.database_label)
+        self.db_list.pack(fill=tk.BOTH, expand=True)
+        self.db_list.listbox.bind("<ButtonRelease-1>", lambda e: self.update_selection_label(), add="+")
+        self.db_list.show_message("🔄 Loading databases...")
 
     def build_script_tab(self):
         # Script Input Area
@@ -155,7 +198,99 @@ class SQLApp:
         script_btn_frame = tk.Frame(script_frame)
         script_btn_frame.pack(fill=tk.X, pady=10)
         tk.Button(script_btn_frame, text="📁 Upload SQL File", command=self.load_script_file).pack(side=tk.LEFT)
-        tk.Button(script_btn_frame, text="🚀 Execute Script", command=self.execute_script, bg="#5cb85c", fg="white").pack(side=tk.RIGHT)
+        self.bulk_load_button = tk.Button(script_btn_frame, text="📥 Bulk Load...", command=self.bulk_load)
+        self.bulk_load_button.pack(side=tk.LEFT, padx=5)
+        self.cancel_button = tk.Button(script_btn_frame, text="🛑 Cancel", command=self.cancel_execution, bg="#d9534f", fg="white", state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=(5, 0))
+        self.execute_button = tk.Button(script_btn_frame, text="🚀 Execute Script", command=self.execute_script, bg="#5cb85c", fg="white")
+        self.execute_button.pack(side=tk.RIGHT)
+
+        # Max databases executed at the same time on the server
+        self.concurrency_var = tk.IntVar(value=self.MAX_CONCURRENCY)
+        tk.Spinbox(script_btn_frame, from_=1, to=64, width=4, textvariable=self.concurrency_var).pack(side=tk.RIGHT, padx=5)
+        tk.Label(script_btn_frame, text="Parallel DBs:").pack(side=tk.RIGHT)
+
+        # Execution backend: thread pool or asyncio (see engine.ENGINES)
+        self.engine_var = tk.StringVar(value=DEFAULT_ENGINE)
+        ttk.Combobox(script_btn_frame, textvariable=self.engine_var, values=ENGINES, state="readonly", width=8).pack(side=tk.RIGHT, padx=5)
+        tk.Label(script_btn_frame, text="Engine:").pack(side=tk.RIGHT)
+
+        # statement: commit after each statement, database: one transaction per
+        # database, all: commit only if every database succeeded
+        self.commit_mode_var = tk.StringVar(value=self.creds.get("COMMIT_MODE", DEFAULT_COMMIT_MODE))
+        ttk.Combobox(script_btn_frame, textvariable=self.commit_mode_var, values=COMMIT_MODES, state="readonly", width=9).pack(side=tk.RIGHT, padx=5)
+        tk.Label(script_btn_frame, text="Commit per:").pack(side=tk.RIGHT)
+
+        # Optional file export that is written while the script runs
+        stream_frame = tk.Frame(script_frame)
+        stream_frame.pack(fill=tk.X)
+        self.stream_path = None
+        self.stream_per_db_var = tk.BooleanVar()
+        tk.Button(stream_frame, text="📎 Stream Results To...", command=self.choose_stream_target).pack(side=tk.LEFT)
+        tk.Checkbutton(stream_frame, text="One file per DB", variable=self.stream_per_db_var).pack(side=tk.LEFT, padx=5)
+        self.stream_label = tk.Label(stream_frame, text="(not streaming to a file)", anchor='w')
+        self.stream_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        # Timeouts in seconds, 0 = none
+        timeout_frame = tk.Frame(script_frame)
+        timeout_frame.pack(fill=tk.X, pady=(5, 0))
+        self.statement_timeout_var = tk.IntVar(value=int(self.creds.get("STATEMENT_TIMEOUT", 0)))
+        self.db_timeout_var = tk.IntVar(value=int(self.creds.get("DB_TIMEOUT", 0)))
+        tk.Label(timeout_frame, text="Statement timeout (s):").pack(side=tk.LEFT)
+        tk.Spinbox(timeout_frame, from_=0, to=86400, width=6, textvariable=self.statement_timeout_var).pack(side=tk.LEFT, padx=5)
+        tk.Label(timeout_frame, text="DB timeout (s):").pack(side=tk.LEFT)
+        tk.Spinbox(timeout_frame, from_=0, to=86400, width=6, textvariable=self.db_timeout_var).pack(side=tk.LEFT, padx=5)
+
+        # Transient errors (deadlocks, dropped connections) are retried with backoff
+        self.retries_var = tk.IntVar(value=int(self.creds.get("MAX_RETRIES", DEFAULT_MAX_RETRIES)))
+        tk.Label(timeout_frame, text="Retries:").pack(side=tk.LEFT)
+        tk.Spinbox(timeout_frame, from_=0, to=20, width=3, textvariable=self.retries_var).pack(side=tk.LEFT, padx=5)
+        # Skip databases and statements the journal of the same script records as done
+        self.resume_var = tk.BooleanVar()
+        tk.Checkbutton(timeout_frame, text="♻️ Resume previous run", variable=self.resume_var).pack(side=tk.LEFT, padx=5)
+
+        # Opt-in result cache for read-only statements; any other statement clears its database's entries
+        cache_frame = tk.Frame(script_frame)
+        cache_frame.pack(fill=tk.X, pady=(5, 0))
+        self.cache_var = tk.BooleanVar(value=bool(self.creds.get("RESULT_CACHE")))
+        tk.Checkbutton(cache_frame, text="🗃️ Cache read-only results", variable=self.cache_var).pack(side=tk.LEFT)
+        self.cache_ttl_var = tk.IntVar(value=self.result_cache.ttl)
+        tk.Label(cache_frame, text="TTL (s):").pack(side=tk.LEFT, padx=(5, 0))
+        tk.Spinbox(cache_frame, from_=1, to=86400, width=6, textvariable=self.cache_ttl_var).pack(side=tk.LEFT, padx=5)
+        tk.Button(cache_frame, text="🧹 Clear Cache", command=self.clear_result_cache).pack(side=tk.LEFT, padx=5)
+
+        # Aggregate mode: rows are reduced per database instead of kept in memory
+        aggregate_frame = tk.Frame(script_frame)
+        aggregate_frame.pack(fill=tk.X, pady=(5, 0))
+        self.group_by_var = tk.StringVar()
+        self.aggregates_var = tk.StringVar()
+        tk.Label(aggregate_frame, text="Group by:").pack(side=tk.LEFT)
+        tk.Entry(aggregate_frame, textvariable=self.group_by_var, width=25).pack(side=tk.LEFT, padx=5)
+        tk.Label(aggregate_frame, text="Aggregates:").pack(side=tk.LEFT)
+        tk.Entry(aggregate_frame, textvariable=self.aggregates_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        # Compare mode: databases are grouped by identical results, groups are diffed against a baseline
+        compare_frame = tk.Frame(script_frame)
+        compare_frame.pack(fill=tk.X, pady=(5, 0))
+        self.compare_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(compare_frame, text="🔍 Compare databases", variable=self.compare_var).pack(side=tk.LEFT)
+        self.compare_mode_var = tk.StringVar(value=DEFAULT_COMPARE_MODE)
+        ttk.Combobox(compare_frame, textvariable=self.compare_mode_var, values=COMPARE_MODES,
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+        tk.Label(compare_frame, text="Baseline DB (empty: largest group):").pack(side=tk.LEFT)
+        self.baseline_var = tk.StringVar()
+        tk.Entry(compare_frame, textvariable=self.baseline_var, width=25).pack(side=tk.LEFT, padx=5)
+
+        # :name placeholders in the script are bound from these values, per-database ones from a file
+        params_frame = tk.Frame(script_frame)
+        params_frame.pack(fill=tk.X, pady=(5, 0))
+        self.params_path = None
+        self.params_var = tk.StringVar()
+        tk.Button(params_frame, text="🔣 Parameters File...", command=self.choose_params_file).pack(side=tk.LEFT)
+        self.params_label = tk.Label(params_frame, text="(no parameters file)", anchor='w')
+        self.params_label.pack(side=tk.LEFT, padx=5)
+        tk.Label(params_frame, text="Values (a=1; b=x):").pack(side=tk.LEFT)
+        tk.Entry(params_frame, textvariable=self.params_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
        
     def build_output_tab(self):
         # === Progress & Status ===
@@ -166,24 +301,38 @@ class SQLApp:
         self.status_box.pack(fill=tk.X, padx=10)
 
         # === Results Table ===
-        result_frame = tk.Frame(self.tab_output)
-        result_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        vsb = ttk.Scrollbar(result_frame, orient="vertical")
-        hsb = ttk.Scrollbar(result_frame, orient="horizontal")
-
-        self.tree = ttk.Treeview(
-            result_frame,
-            yscrollcommand=vsb.set,
-            xscrollcommand=hsb.set
-        )
-        self.tree.pack(fill=tk.BOTH, expand=True)
-        vsb.config(command=self.tree.yview)
-        hsb.config(command=self.tree.xview)
-        vsb.pack(side=tk.RIGHT, fill='y')
-        hsb.pack(side=tk.BOTTOM, fill='x')
-
-        tk.Button(self.tab_output, text="💾 Export Results", command=self.export_results).pack(pady=10)
+        result_set_frame = tk.Frame(self.tab_output)
+        result_set_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        tk.Label(result_set_frame, text="Result set:").pack(side=tk.LEFT)
+        self.result_set_selector = ttk.Combobox(result_set_frame, state="readonly", width=60)
+        self.result_set_selector.pack(side=tk.LEFT, padx=5)
+        self.result_set_selector.bind("<<ComboboxSelected>>", self.on_result_set_selected)
+
+        # Click a heading to sort; sort, filter and search use per-column indexes built on first use
+        query_frame = tk.Frame(self.tab_output)
+        query_frame.pack(fill=tk.X, padx=10, pady=(5, 0))
+        self.filter_var = tk.StringVar()
+        self.result_search_var = tk.StringVar()
+        tk.Label(query_frame, text="Filter:").pack(side=tk.LEFT)
+        filter_entry = tk.Entry(query_frame, textvariable=self.filter_var, width=40)
+        filter_entry.pack(side=tk.LEFT, padx=5)
+        tk.Label(query_frame, text="Search:").pack(side=tk.LEFT)
+        search_entry = tk.Entry(query_frame, textvariable=self.result_search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        for entry in (filter_entry, search_entry):
+            entry.bind("<Return>", lambda e: self.apply_query())
+        tk.Button(query_frame, text="🔎 Apply", command=self.apply_query).pack(side=tk.LEFT, padx=5)
+        tk.Button(query_frame, text="✖ Clear", command=self.clear_query).pack(side=tk.LEFT)
+        self.query_label = tk.Label(query_frame, text="", anchor='w')
+        self.query_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        self.result_grid = VirtualGrid(self.tab_output, on_heading=self.sort_by)
+        self.result_grid.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        output_btn_frame = tk.Frame(self.tab_output)
+        output_btn_frame.pack(pady=10)
+        tk.Button(output_btn_frame, text="💾 Export Results", command=self.export_results).pack(side=tk.LEFT, padx=5)
+        tk.Button(output_btn_frame, text="⏱️ Timings", command=self.show_timings).pack(side=tk.LEFT, padx=5)
 
     def apply_theme(self):
         t = self.themes[self.theme]
@@ -191,43 +340,242 @@ class SQLApp:
         self.title_label.configure(bg=t["highlight"], fg="white")
 
     def log(self, message):
+        # Safe from any thread; the text box is updated on the next frame
+        self.ui_bus.post("log", message)
+
+    def append_log(self, messages):
         self.status_box.configure(state='normal')
-        self.status_box.insert(tk.END, message + "\n")
+        self.status_box.insert(tk.END, "".join(message + "\n" for message in messages))
         self.status_box.configure(state='disabled')
         self.status_box.see(tk.END)
 
-    def get_connection_string(self, db_name):
-        if self.USE_WINDOWS_AUTH:
-            return f'DRIVER={self.DRIVER};SERVER={self.SQL_SERVER};Trusted_Connection=yes;DATABASE={db_name}'
+    def set_progress(self, value):
+        self.progress['value'] = value
+
+    def refresh_results(self, _=None):
+        if self.result_sink is None or not self.result_sink.result_sets:
+            return
+
+        result_sets = list(self.result_sink.result_sets)
+        if len(self.result_set_selector["values"]) != len(result_sets):
+            self.result_set_selector["values"] = [
+                f"{rs.label}: {', '.join(rs.columns[1:])}" for rs in result_sets
+            ]
+            if self.result_set_selector.current() < 0:
+                self.result_set_selector.current(self.result_set_index)
+
+        selected = result_sets[self.result_set_index]
+        self.last_columns = selected.columns
+        self.base_results = selected.rows
+        if self.query_active:
+            # The sorted/filtered rows are a snapshot; Apply again to include rows that arrived since
+            return
+        self.last_results = selected.rows
+        self.show_results_table(self.last_columns, self.last_results)
+
+    def show_tables(self, tables):
+        """Show tables computed at the end of a run; the result set selector switches between them"""
+        self.static_tables = tables
+        self.result_set_selector["values"] = [f"{label}: {', '.join(map(str, columns))}" for label, columns, _ in tables]
+        self.result_set_selector.current(0)
+        self.show_static_table(0)
+
+    def show_static_table(self, index):
+        _, columns, rows = self.static_tables[index]
+        self.reset_query()
+        self.last_columns = columns
+        self.base_results = self.last_results = rows
+        self.show_results_table(columns, rows)
+
+    def show_timings(self):
+        # Slowest databases and statements of the last run, shown like a result set
+        if self.metrics is None or not self.metrics.databases:
+            messagebox.showinfo("No Timings", "Run a script first.")
+            return
+        columns, rows = self.metrics.timing_table(limit=TIMING_TABLE_ROWS)
+        self.reset_query()
+        self.result_set_selector.set("Timings: slowest databases and statements")
+        self.last_columns = columns
+        self.base_results = self.last_results = rows
+        self.show_results_table(columns, rows)
+
+    def on_result_set_selected(self, event=None):
+        self.result_set_index = max(0, self.result_set_selector.current())
+        if self.static_tables:
+            self.show_static_table(self.result_set_index)
+            return
+        self.reset_query()
+        self.refresh_results()
+
+    def sort_by(self, column_index):
+        # The first click on a heading sorts ascending, further clicks toggle the direction
+        if self.sort_column == column_index:
+            self.sort_descending = not self.sort_descending
         else:
-            return f'DRIVER={self.DRIVER};SERVER={self.SQL_SERVER};UID={self.USERNAME};PWD={self.PASSWORD};DATABASE={db_name}'
+            self.sort_column, self.sort_descending = column_index, False
+        self.apply_query()
+
+    def apply_query(self):
+        rows = self.base_results
+        try:
+            conditions = parse_filter(self.filter_var.get(), self.last_columns)
+        except ValueError as e:
+            self.query_label.config(text=f"❌ {e}")
+            return
+        search = self.result_search_var.get()
+        if self.sort_column is None and not conditions and not search.strip():
+            self.clear_query()
+            return
+
+        if self.result_index is None or self.result_index.rows is not rows:
+            self.result_index = ResultIndex(rows)
+        self.query_active = True
+        self.query_generation += 1
+        self.query_label.config(text="⏳ Sorting / filtering...")
+        args = (self.query_generation, self.result_index, self.sort_column, self.sort_descending, conditions, search)
+        threading.Thread(target=self.run_query, args=args, daemon=True).start()
+
+    def run_query(self, generation, index, sort, descending, conditions, search):
+        # Index builds can take seconds on millions of rows, so they stay off the Tk thread
+        start = time.perf_counter()
+        try:
+            ids = index.query(sort, descending, conditions, search)
+        except Exception as e:
+            self.ui_bus.call(self.query_label.config, text=f"❌ {e}")
+            return
+        self.ui_bus.call(self.show_query_result, generation, index, ids, time.perf_counter() - start)
+
+    def show_query_result(self, generation, index, ids, elapsed):
+        if generation != self.query_generation or not self.query_active:
+            # A newer query was started, or other rows are shown by now
+            return
+        self.last_results = index.rows if ids is None else RowSelection(index.rows, ids)
+        self.show_results_table(self.last_columns, self.last_results)
+        self.result_grid.scroll_to(0)
+        self.result_grid.set_sort_marker(self.sort_column, self.sort_descending)
+        self.query_label.config(text=f"🔎 {len(self.last_results)} of {index.count} row(s) in {elapsed:.2f}s")
+
+    def reset_query(self):
+        """Forget the sort and the indexes, e.g. when other rows are about to be shown"""
+        self.sort_column = None
+        self.sort_descending = False
+        self.query_active = False
+        self.result_index = None
+        self.query_label.config(text="")
+
+    def clear_query(self):
+        self.filter_var.set("")
+        self.result_search_var.set("")
+        self.reset_query()
+        self.last_results = self.base_results
+        self.show_results_table(self.last_columns, self.last_results)
+        self.result_grid.set_sort_marker()
 
     def load_databases(self):
         try:
-            conn = pyodbc.connect(self.get_connection_string("master"))
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sys.databases WHERE database_id > 4")
-            self.all_databases = [row[0] for row in cursor.fetchall()]
-            conn.close()
-            self.root.after(0, self.update_checkboxes)  
-            self.root.after(0, lambda: self.loading_label.destroy()) 
-            self.update_checkboxes()
+            added, dropped, changed = self.catalog.refresh(self.pool)
+            self.ui_bus.call(self.apply_catalog, added, dropped, changed)
         except Exception as e:
             self.log(f"❌ Error loading DBs: {e}")
-            messagebox.showerror("DB Load Error", str(e))
+            self.ui_bus.call(messagebox.showerror, "DB Load Error", str(e))
+
+    def apply_catalog(self, added, dropped, changed):
+        self.all_databases = self.all_database_names()
+        self.selection.set_names(self.all_databases)
+        self.update_checkboxes()
+        if added or dropped or changed:
+            self.log(f"📚 Catalog refreshed: +{len(added)} added, -{len(dropped)} dropped, {len(changed)} changed")
+            for db in dropped:
+                self.log(f"   - {db}")
+
+    def choose_servers(self):
+        profiles = {name: creds for name, creds in load_profiles().items()
+                    if creds.get("SQL_SERVER") and creds["SQL_SERVER"] != self.SQL_SERVER}
+        if not profiles:
+            messagebox.showinfo("Servers", "There are no other saved profiles.")
+            return
+
+        top = tk.Toplevel(self.root)
+        top.title("🌐 Servers")
+        tk.Label(top, text=f"Also run on the servers of these profiles (besides {self.SQL_SERVER}):").pack(padx=10, pady=5)
+        chosen = {}
+        for name, creds in profiles.items():
+            chosen[name] = tk.BooleanVar(value=creds["SQL_SERVER"] in self.extra_catalogs)
+            tk.Checkbutton(top, text=f"{name} ({creds['SQL_SERVER']})", variable=chosen[name], anchor='w').pack(fill=tk.X, padx=10)
+
+        def apply():
+            self.set_extra_servers([profiles[name] for name, var in chosen.items() if var.get()])
+            top.destroy()
+
+        tk.Button(top, text="OK", command=apply).pack(pady=10)
+
+    def set_extra_servers(self, profiles):
+        servers = {creds["SQL_SERVER"]: creds for creds in profiles}
+        for server in list(self.extra_catalogs):
+            if server not in servers:
+                del self.extra_catalogs[server]
+        for server, creds in servers.items():
+            if server in self.extra_catalogs:
+                continue
+            # Each server keeps its own connections in the pool, limited by its profile's MAX_CONCURRENCY
+            add_server(self.pool, dict(creds, WINDOWS_AUTH=bool(creds.get("WINDOWS_AUTH", False))))
+            catalog = self.extra_catalogs[server] = DatabaseCatalog(server)
+            catalog.load()
+            threading.Thread(target=self.load_server_catalog, args=(catalog,), daemon=True).start()
+        self.log(f"🌐 Servers: {', '.join([self.SQL_SERVER] + list(self.extra_catalogs))}")
+        self.apply_catalog((), (), ())
+
+    def load_server_catalog(self, catalog):
+        try:
+            catalog.refresh(self.pool)
+            self.ui_bus.call(self.apply_catalog, (), (), ())
+            self.log(f"📚 {len(catalog.names)} database(s) on {catalog.server}")
+        except Exception as e:
+            self.log(f"❌ Error loading DBs from {catalog.server}: {e}")
+
+    def all_database_names(self):
+        names = list(self.catalog.names)
+        for server, catalog in self.extra_catalogs.items():
+            names.extend(f"{server}/{db}" for db in catalog.names)
+        return names
+
+    def target_of(self, name):
+        """(server, database) of a listed name; server names cannot contain '/'"""
+        server, sep, db = name.partition("/")
+        if sep and server in self.extra_catalogs:
+            return server, db
+        return self.SQL_SERVER, name
+
+    def catalog_info(self, name):
+        server, db = self.target_of(name)
+        catalog = self.extra_catalogs.get(server, self.catalog)
+        return catalog.info(db)
+
+    def is_online(self, name):
+        return self.catalog_info(name).get("state", "ONLINE") == "ONLINE"
+
+    def database_label(self, db):
+        state = self.catalog_info(db).get("state")
+        return db if state in (None, "ONLINE") else f"{db} ({state})"
+
+    def schedule_filter(self):
+        # Debounce: filter once typing pauses instead of on every keystroke
+        if self._search_after_id is not None:
+            self.root.after_cancel(self._search_after_id)
+        self._search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.update_checkboxes)
 
     def update_checkboxes(self):
-        search = self.search_var.get().lower()
-        for widget in self.checkbox_frame.winfo_children():
-            widget.destroy()
-        self.db_vars.clear()
-
-        for db in sorted(self.all_databases):
-            if search in db.lower():
-                var = tk.BooleanVar()
-                self.db_vars[db] = var
-                cb = tk.Checkbutton(self.checkbox_frame, text=db, variable=var, anchor='w')
-                cb.pack(fill=tk.BOTH, expand=True, anchor='w')
+        self._search_after_id = None
+        predicate = self.is_online if self.online_only_var.get() else None
+        self.selection.filter(self.search_var.get(), self.match_mode_var.get(), predicate)
+        self.db_list.refresh()
+        self.update_selection_label()
+
+    def update_selection_label(self):
+        error = f"  ⚠️ {self.selection.error}" if self.selection.error else ""
+        self.selection_label.configure(
+            text=f"{len(self.selection.selected)} selected / {len(self.selection.visible)} shown{error}"
+        )
 
     def load_script_file(self):
         file_path = filedialog.askopenfilename(filetypes=[("SQL files", "*.sql")])
@@ -237,17 +585,42 @@ class SQLApp:
                 self.script_text.insert(tk.END, file.read())
             self.log(f"📁 Loaded script from {file_path}")
 
+    def choose_stream_target(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet"),
+                       ("Arrow", "*.arrow"), ("Gzip CSV", "*.csv.gz"), ("Gzip JSON Lines", "*.jsonl.gz"),
+                       ("All Files", "*.*")],
+        )
+        self.stream_path = file_path or None
+        self.stream_label.configure(text=file_path or "(not streaming to a file)")
+
+    def choose_params_file(self):
+        file_path = filedialog.askopenfilename(filetypes=[("JSON or CSV", "*.json *.csv"), ("All Files", "*.*")])
+        self.params_path = file_path or None
+        self.params_label.configure(text=os.path.basename(file_path) if file_path else "(no parameters file)")
+
+    def create_script_params(self):
+        # Parameter binding is on when a file is chosen or values are typed in
+        text = self.params_var.get().strip()
+        if not self.params_path and not text:
+            return None
+        params = ScriptParams.from_file(self.params_path) if self.params_path else ScriptParams()
+        return params.with_values(parse_assignments(item for item in text.split(";") if item.strip()))
+
     def select_all(self):
-        for var in self.db_vars.values():
-            var.set(True)
+        self.selection.select_visible()
+        self.db_list.refresh()
+        self.update_selection_label()
 
     def deselect_all(self):
-        for var in self.db_vars.values():
-            var.set(False)
+        self.selection.deselect_visible()
+        self.db_list.refresh()
+        self.update_selection_label()
 
     def execute_script(self):
         script = self.script_text.get("1.0", tk.END).strip()
-        selected_dbs = [db for db, var in self.db_vars.items() if var.get()]
+        selected_dbs = self.selection.selected_names()
 
         if not selected_dbs:
             messagebox.showwarning("Select Databases", "Please select at least one database.")
@@ -255,102 +628,284 @@ class SQLApp:
         if not script:
             messagebox.showwarning("Empty Script", "Please write or load a SQL script.")
             return
+        self.start_run(selected_dbs, script, script)
+
+    def bulk_load(self):
+        selected_dbs = self.selection.selected_names()
+        if not selected_dbs:
+            messagebox.showwarning("Select Databases", "Please select at least one database.")
+            return
+        file_path = filedialog.askopenfilename(
+            filetypes=[("CSV or Parquet", "*.csv *.parquet"), ("CSV Files", "*.csv"), ("Parquet", "*.parquet")]
+        )
+        if not file_path:
+            return
+        table = simpledialog.askstring("Bulk Load", "Target table (e.g. dbo.Countries):", parent=self.root)
+        if not table:
+            return
+        try:
+            table_name(table)
+            signature = load_signature(file_path, table)
+        except (OSError, ValueError) as e:
+            messagebox.showwarning("Bulk Load", str(e))
+            return
+
+        batch_rows = self.creds.get("BULK_BATCH_ROWS")
+
+        def prepare():
+            # Parsed once on the worker thread; every database shares the batches
+            load = BulkInsert.from_file(file_path, table, batch_rows=batch_rows)
+            self.log(f"📥 Read {load.row_count} row(s) from {file_path}, {len(load.batches)} batch(es) of up to {load.batch_rows}")
+            return [load]
+
+        self.start_run(selected_dbs, prepare, signature)
+
+    def start_run(self, selected_dbs, script, journal_key):
+        """Start a run in the background; script is SQL text or a callable returning the statement list"""
+        try:
+            aggregate_sink = self.create_aggregate_sink()
+        except ValueError as e:
+            messagebox.showwarning("Aggregates", str(e))
+            return
+        drift_sink = None
+        if self.compare_var.get():
+            if aggregate_sink is not None:
+                messagebox.showwarning("Compare", "Compare mode cannot be combined with aggregates.")
+                return
+            drift_sink = DriftSink(self.compare_mode_var.get(), self.baseline_var.get().strip())
+        try:
+            params = self.create_script_params()
+        except (OSError, ValueError) as e:
+            messagebox.showwarning("Parameters", f"Cannot read the script parameters:\n{e}")
+            return
+        if params is not None:
+            journal_key += f"\n-- params {params.signature()}"
 
         self.progress['value'] = 0
         self.progress['maximum'] = len(selected_dbs)
+        self.reset_query()
+        self.base_results = self.last_results = []
+        self.last_columns = []
+        self.result_set_index = 0
+        self.static_tables = None
+        self.result_set_selector.set("")
+        self.result_set_selector["values"] = []
+        self.clear_treeview()
+        if self.result_sink is not None:
+            # Frees the previous run's rows and deletes their spill file
+            self.result_sink.close()
+        self.result_sink = None
+        multi_server = bool(self.extra_catalogs)
+        if aggregate_sink is None and drift_sink is None:
+            self.result_sink = CollectingSink(limit=MAX_RESULT_ROWS, on_write=lambda: self.ui_bus.post("results"),
+                                              with_server=multi_server, memory_budget=self.RESULT_MEMORY_BUDGET)
         self.log(f"🚀 Executing on {len(selected_dbs)} DB(s)...")
 
-        threading.Thread(target=self.run_script_on_dbs, args=(selected_dbs, script), daemon=True).start()
+        run_server = "+".join([self.SQL_SERVER] + sorted(self.extra_catalogs))
+        try:
+            journal = RunJournal(get_journal_path(run_server, journal_key), run_server, journal_key,
+                                 resume=self.resume_var.get())
+        except (OSError, ValueError) as e:
+            messagebox.showwarning("Run Journal", f"Cannot open the run journal:\n{e}")
+            return
+        if journal.resumed:
+            self.log(f"♻️ Resuming: {journal.completed_databases} database(s) already completed will be skipped")
+
+        options = self.collect_run_options(journal)
+        options["aggregate_sink"] = aggregate_sink
+        options["drift_sink"] = drift_sink
+        options["params"] = params
+        options["with_server"] = multi_server
+        self.run_control = options["control"]
+        self.metrics = options["metrics"]
+        if self.run_control.commit_mode == "all":
+            self.log("🔒 All-or-nothing: changes are committed only once every database has succeeded")
+        self.execute_button.config(state=tk.DISABLED)
+        self.bulk_load_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        targets = [self.target_of(name) for name in selected_dbs]
+        threading.Thread(target=self.run_script_on_dbs, args=(targets, script, options), daemon=True).start()
+
+    def cancel_execution(self):
+        if self.run_control is not None and not self.run_control.cancelled:
+            self.log("🛑 Cancelling: no new databases will start, running statements are being cancelled...")
+            self.run_control.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+
+    def finish_execution(self):
+        self.run_control = None
+        self.execute_button.config(state=tk.NORMAL)
+        self.bulk_load_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+
+    def create_aggregate_sink(self):
+        # Aggregate mode is on when either field is filled in
+        group_by = parse_group_by(self.group_by_var.get())
+        aggregates = parse_aggregates(self.aggregates_var.get())
+        if not group_by and not aggregates:
+            return None
+        if not aggregates:
+            aggregates = parse_aggregates("count(*)")
+        return AggregatingSink(group_by, aggregates)
+
+    def collect_run_options(self, journal=None):
+        # Read every Tk variable here, on the Tk thread, before the worker starts
+        try:
+            max_concurrency = max(1, int(self.concurrency_var.get()))
+        except (tk.TclError, ValueError):
+            max_concurrency = self.MAX_CONCURRENCY
+        try:
+            retry = RetryPolicy(self.retries_var.get())
+        except (tk.TclError, ValueError):
+            retry = RetryPolicy()
+        commit_mode = self.commit_mode_var.get()
+        if commit_mode not in COMMIT_MODES:
+            commit_mode = DEFAULT_COMMIT_MODE
+        # The cache is passed even when unticked: writes must still drop its stale results
+        cache_results = self.cache_var.get()
+        try:
+            self.result_cache.ttl = max(1, int(self.cache_ttl_var.get()))
+        except (tk.TclError, ValueError):
+            pass
+        try:
+            control = RunControl(self.statement_timeout_var.get(), self.db_timeout_var.get(), retry, journal, commit_mode,
+                                 self.result_cache, cache_results)
+        except (tk.TclError, ValueError):
+            control = RunControl(retry=retry, journal=journal, commit_mode=commit_mode, cache=self.result_cache,
+                                 cache_results=cache_results)
+
+        return {
+            "result_sink": self.result_sink,
+            "max_concurrency": max_concurrency,
+            "engine": self.engine_var.get() or DEFAULT_ENGINE,
+            "control": control,
+            "metrics": MetricsRecorder(),
+            "stream_path": self.stream_path,
+            "stream_per_db": self.stream_per_db_var.get(),
+        }
+
+    def clear_result_cache(self):
+        # Only the selected databases' entries when there is a selection
+        selected = self.selection.selected_names()
+        if not selected:
+            self.result_cache.clear()
+            self.log("🧹 Result cache cleared")
+            return
+        for name in selected:
+            self.result_cache.invalidate(*self.target_of(name))
+        self.log(f"🧹 Cached results of {len(selected)} database(s) cleared")
 
     def clear_treeview(self):
-        self.tree.delete(*self.tree.get_children())
-        self.tree["columns"] = ()
-        self.tree["show"] = ""
+        self.result_grid.clear()
 
     def show_results_table(self, columns, rows):
-        # Clear previous Treeview content
-        self.tree.delete(*self.tree.get_children())
-
-        # Set up new columns
-        self.tree["columns"] = columns
-        self.tree["show"] = "headings"
-
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, anchor="center")
-
-        for row in rows:
-            self.tree.insert("", tk.END, values=row)
+        # Only the visible window is materialized, so this is cheap to call per batch
+        if tuple(columns) != self.result_grid.columns:
+            self.result_grid.set_columns(columns)
+        if rows is self.result_grid.rows:
+            self.result_grid.refresh()
+        else:
+            self.result_grid.set_rows(rows)
 
     def export_results(self):
         if not self.last_results:
             messagebox.showinfo("No Data", "There is no data to export.")
             return
 
-        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV Files", "*.csv")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[
+            ("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl"), ("Parquet", "*.parquet"), ("All Files", "*.*")])
         if file_path:
-            with open(file_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(self.last_columns)
-                for row in self.last_results:
-                    writer.writerow(row)
+            try:
+                export_rows(file_path, self.last_columns, self.last_results)
+            except Exception as e:
+                messagebox.showerror("Export Failed", str(e))
+                return
             self.log(f"💾 Results exported to {file_path}")
 
-    def run_script_on_dbs(self, dbs, script):
-        self.last_results.clear()
-        self.last_columns.clear()
-        self.clear_treeview()
-
-        # Split script into individual statements using GO delimiter
-        statements = [s.strip() for s in re.split(r"\bGO\b", script, flags=re.IGNORECASE) if s.strip()]
-
-        for i, db in enumerate(dbs):
-            self.log(f"\n🟦========== Executing on database: {db} ==========")
-
+    def run_script_on_dbs(self, dbs, script, options):
+        max_concurrency = options["max_concurrency"]
+        result_sink = options["result_sink"]
+        aggregate_sink = options["aggregate_sink"]
+        drift_sink = options["drift_sink"]
+        sinks = [aggregate_sink or drift_sink or result_sink]
+        if options["stream_path"]:
             try:
-                conn = pyodbc.connect(self.get_connection_string(db))
-                cursor = conn.cursor()
-
-                for stmt_index, stmt in enumerate(statements, start=1):
-                    lower_stmt = stmt.lower()
-
-                    try:
-                        cursor.execute(stmt)
-
-                        if lower_stmt.startswith("select"):
-                            rows = cursor.fetchall()
-                            columns = [desc[0] for desc in cursor.description]
-
-                            # Add 'dbname' to columns once
-                            if not self.last_columns:
-                                self.last_columns.extend(['dbname']+columns )
-
-                            db_rows = [(db,) + tuple(row)  for row in rows]
-                            self.last_results.extend(db_rows)
-
-                            self.log(f"  📊 SELECT returned {len(rows)} row(s)")
-
-                            # Optional: update view after each SELECT
-                            self.show_results_table(self.last_columns, self.last_results)
-
-                        else:
-                            affected = cursor.rowcount
-                            conn.commit()
-                            keyword = stmt.strip().split()[0].upper()
-                            self.log(f"  🔄 {keyword} affected {affected} row(s)")
-
-                    except Exception as stmt_err:
-                        self.log(f"  ⚠️ Statement error:\n    {stmt_err}")
-
-                conn.close()
-                self.log(f"\n✅ Finished execution on {db}")
-
-            except Exception as db_err:
-                self.log(f"\n❌ Failed on {db}:\n   {db_err}")
-
-            self.log(f"🟨========== Done with {db} ==========\n")
-            self.progress['value'] = i + 1
-            self.root.update_idletasks()
+                sinks.append(FileSink(options["stream_path"], per_database=options["stream_per_db"],
+                                      with_server=options["with_server"]))
+            except ValueError as e:
+                self.log(f"❌ Cannot stream to {options['stream_path']}: {e}")
+                if options["control"].journal is not None:
+                    options["control"].journal.close()
+                self.ui_bus.call(self.finish_execution)
+                return
+
+        self.pool.max_per_server = max_concurrency
+        self.completed_dbs = 0
+        try:
+            if callable(script):
+                script = script()
+            tasks, sink_errors = run_script(
+                self.pool, self.SQL_SERVER, dbs, script, sinks,
+                max_concurrency=max_concurrency,
+                on_complete=self.on_db_complete,
+                on_merge=self.merge_db_results,
+                engine=options["engine"],
+                control=options["control"],
+                metrics=options["metrics"],
+                params=options["params"],
+                server_limits=self.pool.server_limits,
+            )
+        except Exception as e:
+            self.log(f"❌ Execution failed: {e}")
+            self.ui_bus.call(self.finish_execution)
+            return
+        finally:
+            if options["control"].journal is not None:
+                options["control"].journal.close()
+        for line in summary_lines(tasks):
+            self.log(line)
+        slowest = options["metrics"].slowest_databases(3)
+        if slowest:
+            self.log("🐢 Slowest: " + ", ".join(f"{e['db']} ({e['elapsed_s']:.2f}s)" for e in slowest)
+                     + " — see ⏱️ Timings")
+
+        for sink, err in sink_errors:
+            self.log(f"⚠️ Result sink {type(sink).__name__} failed: {err}")
+        for sink in sinks[1:]:
+            if sink.files:
+                self.log(f"💾 Streamed {sink.rows_written} row(s) to {len(sink.files)} file(s): {sink.files[0]}")
+        if result_sink is not None and result_sink.dropped:
+            self.log(f"ℹ️ Showing first {MAX_RESULT_ROWS} row(s); {result_sink.dropped} more were not kept")
+        if result_sink is not None and result_sink.spilled_bytes:
+            self.log(f"💽 {result_sink.spilled_bytes / 1024 / 1024:.0f} MB of results spilled to disk"
+                     f" (memory budget {self.RESULT_MEMORY_BUDGET // 1024 // 1024} MB)")
+        if aggregate_sink is not None:
+            self.log(
+                f"🧮 Aggregated {aggregate_sink.input_rows} row(s) into {len(aggregate_sink.totals)} group(s)"
+                f" ({aggregate_sink.backend} backend)"
+            )
+            if aggregate_sink.skipped_rows:
+                self.log(f"ℹ️ Skipped {aggregate_sink.skipped_rows} row(s) from result sets without the referenced columns")
+            self.ui_bus.call(self.show_tables, [("Aggregate", aggregate_sink.columns, aggregate_sink.result_rows())])
+        if drift_sink is not None:
+            drift_sink.drop_unfinished(tasks)
+            if not drift_sink.baseline_found:
+                self.log(f"⚠️ Baseline {drift_sink.baseline} has no results; comparing against the largest group")
+            self.log(drift_sink.summary())
+            self.ui_bus.call(self.show_tables, drift_sink.tables())
+        self.log(f"🔌 Connection pool: {self.pool.stats_text()}")
+        self.ui_bus.post("results")
+        self.ui_bus.call(self.finish_execution)
+
+    def on_db_complete(self, task):
+        self.completed_dbs += 1
+        self.ui_bus.post("progress", self.completed_dbs)
+
+    def merge_db_results(self, task):
+        # Called in selection order so logs never interleave; rows reach the
+        # grid through the result pipeline
+        for message in task.messages:
+            self.log(message)
 
 
 if __name__ == "__main__":
@@ -361,8 +916,9 @@ if __name__ == "__main__":
     root.wait_window(login.top)
 
     if login.result:
-        app = SQLApp(root, login.result)  
+        app = SQLApp(root, login.result, login.connection)
         root.deiconify()  
         root.mainloop()
+        app.pool.close_all()
     else:
         root.destroy()
@@ -0,0 +1,182 @@
+"""Per-database and per-statement instrumentation of a run.
+
+Every finished DbTask is turned into events (plain dicts): one "statement"
+event per executed statement and one "database" event. MetricsRecorder hands
+them to its exporters as they happen and keeps them for timing_table(), which
+ranks the slowest databases and statements.
+"""
+import json
+import os
+import threading
+import time
+
+# Characters of SQL kept in events and in the timing table
+SQL_PREVIEW = 80
+
+
+def sql_preview(sql):
+    text = " ".join(sql.split())
+    return text if len(text) <= SQL_PREVIEW else text[:SQL_PREVIEW - 1] + "…"
+
+
+def task_events(task):
+    """Events for one finished task: its statements first, then the database summary"""
+    now = time.time()
+    events = []
+    for stats in task.statement_stats:
+        events.append({
+            "event": "statement", "ts": now, "server": task.server, "db": task.db,
+            "statement": stats.index + 1, "sql": sql_preview(stats.sql),
+            "execute_s": round(stats.execute_s, 6), "fetch_s": round(stats.fetch_s, 6),
+            "commit_s": round(stats.commit_s, 6), "rows": stats.rows, "bytes": stats.bytes,
+            "result_sets": stats.result_sets, "cache": stats.cache, "error": stats.error,
+        })
+    events.append({
+        "event": "database", "ts": now, "server": task.server, "db": task.db, "status": task.status,
+        "connect_s": round(task.connect_s, 6), "elapsed_s": round(task.elapsed_s, 6),
+        "execute_s": round(sum(s.execute_s for s in task.statement_stats), 6),
+        "fetch_s": round(sum(s.fetch_s for s in task.statement_stats), 6),
+        "commit_s": round(task.commit_s + sum(s.commit_s for s in task.statement_stats), 6),
+        "rows": sum(s.rows for s in task.statement_stats),
+        "bytes": sum(s.bytes for s in task.statement_stats),
+        "statements": len(task.statement_stats), "retries": task.retries,
+        "error": str(task.error) if task.error else None,
+    })
+    return events
+
+
+class JsonlMetricsExporter:
+    """Appends every event to a JSON Lines file as soon as it is recorded"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+
+    def export(self, events):
+        self.file.writelines(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class PrometheusExporter:
+    """Writes a Prometheus text-format snapshot (e.g. for node_exporter's textfile collector) on close()"""
+
+    DATABASE_METRICS = (
+        ("connect_s", "sqlrunner_db_connect_seconds", "gauge", "Time to get a connection for the database"),
+        ("elapsed_s", "sqlrunner_db_duration_seconds", "gauge", "Wall-clock time spent on the database"),
+        ("execute_s", "sqlrunner_db_execute_seconds", "gauge", "Time spent in cursor.execute"),
+        ("fetch_s", "sqlrunner_db_fetch_seconds", "gauge", "Time spent fetching result rows"),
+        ("commit_s", "sqlrunner_db_commit_seconds", "gauge", "Time spent committing"),
+        ("rows", "sqlrunner_db_rows", "gauge", "Result rows returned"),
+        ("bytes", "sqlrunner_db_bytes", "gauge", "Approximate result bytes returned"),
+        ("retries", "sqlrunner_db_retries", "gauge", "Retries needed"),
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self.databases = []
+        self.statements = {}
+
+    def export(self, events):
+        for event in events:
+            if event["event"] == "database":
+                self.databases.append(event)
+                continue
+            # Statements are summed over databases to keep the series count small
+            total = self.statements.setdefault(event["statement"], {"execute_s": 0.0, "fetch_s": 0.0, "count": 0})
+            total["execute_s"] += event["execute_s"]
+            total["fetch_s"] += event["fetch_s"]
+            total["count"] += 1
+
+    def render(self):
+        lines = []
+        for key, name, kind, help_text in self.DATABASE_METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for event in self.databases:
+                labels = f'server="{_label(event["server"])}",db="{_label(event["db"])}",status="{event["status"]}"'
+                lines.append(f"{name}{{{labels}}} {event[key]}")
+
+        for key, name in (("execute_s", "sqlrunner_statement_execute_seconds"),
+                          ("fetch_s", "sqlrunner_statement_fetch_seconds")):
+            lines.append(f"# HELP {name} Time per statement, summed over databases")
+            lines.append(f"# TYPE {name} summary")
+            for index, total in sorted(self.statements.items()):
+                lines.append(f'{name}_sum{{statement="{index}"}} {total[key]:.6f}')
+                lines.append(f'{name}_count{{statement="{index}"}} {total["count"]}')
+
+        lines.append("# HELP sqlrunner_run_timestamp_seconds When the snapshot was written")
+        lines.append("# TYPE sqlrunner_run_timestamp_seconds gauge")
+        lines.append(f"sqlrunner_run_timestamp_seconds {time.time():.3f}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        # Write-then-rename so a scraper never reads a half-written file
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self.path)
+
+
+def _statement_total(event):
+    return event["execute_s"] + event["fetch_s"] + event["commit_s"]
+
+
+class MetricsRecorder:
+    """Collects events from finished tasks (any thread) and forwards them to exporters"""
+
+    def __init__(self, exporters=()):
+        self.exporters = list(exporters)
+        self.databases = []
+        self.statements = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def record(self, task):
+        events = task_events(task)
+        with self._lock:
+            for event in events:
+                (self.databases if event["event"] == "database" else self.statements).append(event)
+            for exporter in list(self.exporters):
+                try:
+                    exporter.export(events)
+                except Exception as e:
+                    # A broken exporter must not fail the run
+                    self.errors.append((exporter, e))
+                    self.exporters.remove(exporter)
+
+    def close(self):
+        for exporter in self.exporters:
+            try:
+                exporter.close()
+            except Exception as e:
+                self.errors.append((exporter, e))
+
+    def slowest_databases(self, limit=10):
+        with self._lock:
+            return sorted(self.databases, key=lambda e: e["elapsed_s"], reverse=True)[:limit]
+
+    def slowest_statements(self, limit=10):
+        with self._lock:
+            return sorted(self.statements, key=_statement_total, reverse=True)[:limit]
+
+    def timing_table(self, limit=10):
+        """(columns, rows) ranking the slowest databases, then the slowest statements"""
+        columns = ["kind", "server", "db", "statement", "status", "connect_s", "execute_s", "fetch_s",
+                   "total_s", "rows", "bytes", "retries"]
+        rows = []
+        for e in self.slowest_databases(limit):
+            rows.append(("database", e["server"], e["db"], "", e["status"], e["connect_s"], e["execute_s"],
+                         e["fetch_s"], e["elapsed_s"], e["rows"], e["bytes"], e["retries"]))
+        for e in self.slowest_statements(limit):
+            status = "error" if e["error"] else "ok"
+            rows.append(("statement", e["server"], e["db"], f'{e["statement"]}: {e["sql"]}', status, "",
+                         e["execute_s"], e["fetch_s"], round(_statement_total(e), 6), e["rows"],
+                         e["bytes"], ""))
+        return columns, rows
@@ -0,0 +1,291 @@
+"""Opt-in cache of read-only statement results.
+
+Results are keyed by server, database, SQL text and parameter values. Only
+read-only statements are served from the cache: a batch that SELECTs and has
+no keyword that writes, runs code or switches database (is_read_only). Any
+other statement run through the tool first drops every cached result of its
+database, so a script that updates a table and reads it back never sees
+stale rows. Changes made outside the tool show up once an entry is older
+than ttl seconds.
+
+Entries are evicted least recently used first once their total size passes
+max_mb (approximate, see streaming.estimate_bytes); a result larger than a
+quarter of the budget is not cached. With a directory every entry is a
+pickle file named after its database and key, so the cache outlives the
+process (the command line uses this).
+"""
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from config import get_config_path
+from sql_splitter import skip_block_comment
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_MB = 256
+
+# Same scanning approach as script_params: literals, quoted names and comments are not code
+_NOISE = re.compile(
+    r"""'[^']*(?:''[^']*)*(?:'|\Z)
+    | "[^"]*(?:""[^"]*)*(?:"|\Z)
+    | \[[^\]]*(?:\]\][^\]]*)*(?:\]|\Z)
+    | --[^\n]*
+    | /\*""",
+    re.VERBOSE,
+)
+_WORD = re.compile(r"[#@]*\w+")
+# Keywords of statements that change data, schema, permissions or the session's database
+_WRITES = frozenset("""
+    ALTER BACKUP BULK COMMIT CREATE DBCC DELETE DENY DROP EXEC EXECUTE GRANT INSERT INTO KILL MERGE
+    OPENDATASOURCE OPENQUERY OPENROWSET RECONFIGURE RESTORE REVOKE ROLLBACK SAVE SHUTDOWN TRUNCATE
+    UPDATE UPDATETEXT USE WAITFOR WRITETEXT
+""".split())
+
+
+def _code(sql):
+    """sql with string literals, quoted identifiers and comments blanked out"""
+    parts = []
+    pos = 0
+    while True:
+        match = _NOISE.search(sql, pos)
+        if not match:
+            parts.append(sql[pos:])
+            return " ".join(parts)
+        parts.append(sql[pos:match.start()])
+        pos = skip_block_comment(sql, match.start()) if match.group() == "/*" else match.end()
+
+
+def is_read_only(sql):
+    """True for a batch that only reads: it SELECTs and has no writing keyword,
+    no NEXT VALUE FOR and no #temp table (those belong to one session)"""
+    words = [word.upper() for word in _WORD.findall(_code(sql))]
+    if "SELECT" not in words or _WRITES.intersection(words):
+        return False
+    if any(word.startswith("#") for word in words):
+        return False
+    return not any(a == "NEXT" and b == "VALUE" for a, b in zip(words, words[1:]))
+
+
+def get_cache_dir():
+    """On-disk cache kept in a result_cache folder next to profiles.json"""
+    return os.path.join(os.path.dirname(get_config_path()), "result_cache")
+
+
+def _database_id(server, db):
+    # SQL Server names are case-insensitive
+    return hashlib.blake2b(f"{server}\0{db}".lower().encode("utf-8"), digest_size=8).hexdigest()
+
+
+class CachedResult:
+    """Result sets of one statement, [(columns, rows)], and when they were fetched"""
+
+    def __init__(self, results, created=None):
+        self.results = results
+        self.created = created or time.time()
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+
+class ResultCapture:
+    """Rows of one statement collected while they stream; gives up once past limit bytes"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.results = []
+        self.nbytes = 0
+        self.overflow = False
+
+    def start(self, columns):
+        if not self.overflow:
+            self.results.append((columns, []))
+
+    def add(self, rows, nbytes):
+        if self.overflow:
+            return
+        self.nbytes += nbytes
+        if self.nbytes > self.limit:
+            self.overflow = True
+            self.results = []
+            return
+        # Driver rows (pyodbc.Row) are turned into plain tuples for pickling
+        self.results[-1][1].extend(tuple(row) for row in rows)
+
+
+class _Entry:
+    __slots__ = ("database", "created", "nbytes", "value")
+
+    def __init__(self, database, created, nbytes, value=None):
+        self.database = database
+        self.created = created
+        self.nbytes = nbytes
+        self.value = value
+
+
+class ResultCache:
+    """LRU cache of CachedResult by key(); thread-safe, in memory or in directory.
+
+    hits and misses count lookups since the cache was created; the run
+    summary counts per run through StatementStats.cache.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, max_mb=DEFAULT_MAX_MB, directory=None):
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.directory = directory
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # database id -> keys of its entries, so invalidate() needs no scan
+        self._by_database = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def max_entry_bytes(self):
+        return self.max_bytes // 4
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def _load_index(self):
+        """Entries left by earlier runs, oldest first; expired ones are deleted"""
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle") or "_" not in name:
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            found.append((info.st_mtime, name[:-len(".pickle")], info.st_size))
+        now = time.time()
+        for created, key, nbytes in sorted(found):
+            if now - created > self.ttl:
+                self._remove_file(key)
+                continue
+            self._add(key, _Entry(key.partition("_")[0], created, nbytes))
+        self._evict()
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _add(self, key, entry):
+        self._entries[key] = entry
+        self._by_database.setdefault(entry.database, set()).add(key)
+        self.nbytes += entry.nbytes
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+            keys = self._by_database.get(entry.database)
+            keys.discard(key)
+            if not keys:
+                del self._by_database[entry.database]
+        return entry
+
+    def _drop(self, key):
+        if self._pop(key) is not None and self.directory:
+            self._remove_file(key)
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+
+    def key(self, server, db, sql, params=()):
+        """Cache key of a statement, or None when it is not read-only"""
+        if not is_read_only(sql):
+            return None
+        text = repr((str(sql), tuple(params)))
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+        return f"{_database_id(server, db)}_{digest}"
+
+    def get(self, key):
+        """The CachedResult for key, or None when it is missing or older than ttl"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.created > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            value = entry.value
+        if value is None:
+            try:
+                with open(self._path(key), "rb") as f:
+                    value = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # Removed by another process, or cut short
+                with self._lock:
+                    self._drop(key)
+                    self.misses += 1
+                return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def capture(self):
+        return ResultCapture(self.max_entry_bytes)
+
+    def put(self, key, capture):
+        """Store the rows of a completed capture under key; False when they do not fit"""
+        if capture.overflow:
+            return False
+        value = CachedResult(capture.results)
+        value_in_memory = value
+        nbytes = capture.nbytes
+        if self.directory:
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(handle, "wb") as f:
+                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, self._path(key))
+            except Exception:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+            nbytes = os.path.getsize(self._path(key))
+            value_in_memory = None
+        with self._lock:
+            # The file of a previous entry was just replaced, so it is not removed
+            self._pop(key)
+            self._add(key, _Entry(key.partition("_")[0], value.created, nbytes, value_in_memory))
+            self._evict()
+        return True
+
+    def invalidate(self, server, db):
+        """Drop every cached result of one database this cache knows of (loaded at start or put since)"""
+        database = _database_id(server, db)
+        with self._lock:
+            keys = list(self._by_database.get(database, ()))
+            for key in keys:
+                self._pop(key)
+        # Files are removed outside the lock so other workers are not held up
+        if self.directory:
+            for key in keys:
+                self._remove_file(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
@@ -0,0 +1,135 @@
+import platform
+import tkinter as tk
+from tkinter import ttk
+
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualGrid(tk.Frame):
+    """Treeview that only materializes the rows currently on screen.
+
+    Rows live in any sequence supporting len() and slicing (the grid never
+    copies it). The Treeview holds a fixed pool of items, one per visible
+    line, whose values are rewritten on scroll, so scrolling and appending
+    cost the same whether the source holds a thousand rows or millions.
+    on_heading(column_index), if given, is called when a heading is clicked.
+    """
+
+    def __init__(self, parent, on_heading=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.on_heading = on_heading
+        self.rows = []
+        self.columns = ()
+        self.offset = 0
+        self.visible = 1
+        self._items = []
+
+        style = ttk.Style(self)
+        self.row_height = int(style.lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.hsb = ttk.Scrollbar(self, orient="horizontal")
+        self.tree = ttk.Treeview(self, show="", selectmode="browse", xscrollcommand=self.hsb.set)
+        self.hsb.config(command=self.tree.xview)
+
+        self.vsb.pack(side=tk.RIGHT, fill='y')
+        self.hsb.pack(side=tk.BOTTOM, fill='x')
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<Up>", lambda e: self.scroll_rows(-1))
+        self.tree.bind("<Down>", lambda e: self.scroll_rows(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll_rows(-self.visible))
+        self.tree.bind("<Next>", lambda e: self.scroll_rows(self.visible))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(len(self.rows)))
+        if platform.system() in ['Windows', 'Darwin']:
+            self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        else:
+            self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+            self.tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+
+    def set_columns(self, columns):
+        self.columns = tuple(columns)
+        self.tree["columns"] = self.columns
+        self.tree["show"] = "headings" if self.columns else ""
+        for i, col in enumerate(self.columns):
+            command = (lambda i=i: self.on_heading(i)) if self.on_heading else ""
+            self.tree.heading(col, text=col, command=command)
+            self.tree.column(col, anchor="center")
+        self._render()
+
+    def set_sort_marker(self, column_index=None, descending=False):
+        """Show ▲/▼ on the heading of the sorted column"""
+        for i, col in enumerate(self.columns):
+            mark = (" ▼" if descending else " ▲") if i == column_index else ""
+            self.tree.heading(col, text=f"{col}{mark}")
+
+    def set_rows(self, rows):
+        """Point the grid at a (possibly growing) row sequence and redraw"""
+        self.rows = rows
+        self.offset = min(self.offset, self._max_offset())
+        self._render()
+
+    def clear(self):
+        self.rows = []
+        self.offset = 0
+        self.set_columns(())
+
+    def refresh(self):
+        """Pick up rows appended to the source since the last call"""
+        if self.columns and len(self._items) == self.visible:
+            # Window already full: appended rows are off-screen, only the scrollbar moves
+            self._update_scrollbar(len(self._items))
+        else:
+            self._render()
+
+    def scroll_rows(self, delta):
+        self.scroll_to(self.offset + delta)
+        return "break"
+
+    def scroll_to(self, offset):
+        self.offset = max(0, min(int(offset), self._max_offset()))
+        self._render()
+
+    def _max_offset(self):
+        return max(0, len(self.rows) - self.visible)
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(float(args[0]) * len(self.rows))
+        elif action == "scroll":
+            step = self.visible if args[1] == "pages" else 1
+            self.scroll_rows(int(args[0]) * step)
+
+    def _on_mousewheel(self, event):
+        if platform.system() == 'Windows':
+            return self.scroll_rows(-3 * int(event.delta / 120))
+        return self.scroll_rows(-int(event.delta))
+
+    def _on_resize(self, event):
+        header = self.row_height if self.columns else 0
+        visible = max(1, (event.height - header) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = min(self.offset, self._max_offset())
+            self._render()
+
+    def _render(self):
+        window = self.rows[self.offset:self.offset + self.visible] if self.columns else []
+
+        # Grow or shrink the item pool to the window size, then rewrite values in place
+        while len(self._items) < len(window):
+            self._items.append(self.tree.insert("", tk.END))
+        while len(self._items) > len(window):
+            self.tree.delete(self._items.pop())
+        for iid, row in zip(self._items, window):
+            self.tree.item(iid, values=row)
+        self._update_scrollbar(len(window))
+
+    def _update_scrollbar(self, shown):
+        total = len(self.rows)
+        if total:
+            self.vsb.set(self.offset / total, min(1.0, (self.offset + shown) / total))
+        else:
+            self.vsb.set(0.0, 1.0)
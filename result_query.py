@@ -0,0 +1,292 @@
+"""Sort, filter and search collected result rows without re-running the script.
+
+Per-column indexes are built the first time a column is needed and kept
+until more rows arrive:
+
+    sort index  row ids ordered by the column, NULLs first; sorting is a
+                lookup and <, <=, >, >= filters are two bisections
+    hash index  distinct value -> row ids, for = and != filters; ~ (contains)
+                and search test each distinct value once instead of every
+                row. Columns with more than MAX_HASH_KEYS distinct values get
+                none and are scanned instead.
+
+A filter is one or more conditions joined by AND:
+
+    region = 'eu' and amount >= 100 and customer ~ smith and closed_at = null
+"""
+import array
+import datetime
+import decimal
+import re
+import threading
+
+MAX_HASH_KEYS = 100000
+OPERATORS = ("=", "!=", "<>", "<", "<=", ">", ">=", "~")
+
+_CONDITION = re.compile(r"""\s*(\[[^\]]+\]|[\w.]+)\s*(<=|>=|!=|<>|=|<|>|~)\s*('(?:[^']|'')*'|"[^"]*"|[^\s'"]+)\s*""")
+_AND = re.compile(r"and\s+", re.IGNORECASE)
+
+
+class Condition:
+    """column (an index into the result columns) op value; value None means NULL"""
+
+    def __init__(self, column, op, value):
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator '{op}', expected one of: {', '.join(OPERATORS)}")
+        self.column = column
+        self.op = "!=" if op == "<>" else op
+        self.value = value
+
+
+def _literal(text):
+    if text[0] == "'" and text[-1] == "'" and len(text) > 1:
+        return text[1:-1].replace("''", "'")
+    if text[0] == '"' and text[-1] == '"' and len(text) > 1:
+        return text[1:-1]
+    return None if text.lower() == "null" else text
+
+
+def parse_filter(text, columns):
+    """'amount > 100 and region = eu' -> [Condition, ...]; column names are case-insensitive"""
+    lookup = {}
+    for i, name in enumerate(columns):
+        lookup.setdefault(str(name).lower(), i)
+    conditions = []
+    text = text.strip()
+    pos = 0
+    while pos < len(text):
+        match = _CONDITION.match(text, pos)
+        if not match:
+            raise ValueError(f"Cannot parse filter at '{text[pos:]}', expected e.g. amount > 100")
+        name, op, literal = match.groups()
+        index = lookup.get(name.strip("[]").lower())
+        if index is None:
+            raise ValueError(f"Unknown column '{name}'")
+        conditions.append(Condition(index, op, _literal(literal)))
+        pos = match.end()
+        if pos < len(text):
+            separator = _AND.match(text, pos)
+            if not separator or separator.end() == len(text):
+                raise ValueError(f"Expected 'and' followed by a condition at '{text[pos:]}'")
+            pos = separator.end()
+    return conditions
+
+
+def coerce(text, sample):
+    """A filter literal converted to the type of sample (a value of the filtered column)"""
+    if text is None or sample is None or isinstance(sample, str):
+        return text
+    try:
+        if isinstance(sample, bool):
+            return text.strip().lower() in ("1", "true", "yes")
+        if isinstance(sample, float):
+            return float(text)
+        if isinstance(sample, (int, decimal.Decimal)):
+            return decimal.Decimal(text)
+        if isinstance(sample, datetime.datetime):
+            return datetime.datetime.fromisoformat(text)
+        if isinstance(sample, datetime.date):
+            return datetime.date.fromisoformat(text)
+        if isinstance(sample, datetime.time):
+            return datetime.time.fromisoformat(text)
+    except (ValueError, decimal.InvalidOperation):
+        raise ValueError(f"'{text}' is not a valid {type(sample).__name__} value")
+    return text
+
+
+def _compare(value, op, target):
+    try:
+        if op == "<":
+            return value < target
+        if op == "<=":
+            return value <= target
+        if op == ">":
+            return value > target
+        return value >= target
+    except TypeError:
+        return False
+
+
+class _SortIndex:
+    def __init__(self, values):
+        nulls = [i for i, value in enumerate(values) if value is None]
+        ids = [i for i, value in enumerate(values) if value is not None]
+        # Values of one type compare natively; a column mixing types sorts by type, then text
+        self.comparable = True
+        try:
+            ids.sort(key=values.__getitem__)
+        except TypeError:
+            self.comparable = False
+            ids.sort(key=lambda i: (type(values[i]).__name__, str(values[i])))
+        self.nulls = len(nulls)
+        self.ids = array.array("I", nulls + ids)
+
+    def bisect(self, value_at, target, right=False):
+        """First position among the non-NULL ids whose value is >= target (> target if right)"""
+        lo, hi = self.nulls, len(self.ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = value_at(self.ids[mid])
+            if value < target or right and value == target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _hash_index(values):
+    index = {}
+    try:
+        for i, value in enumerate(values):
+            ids = index.get(value)
+            if ids is None:
+                if len(index) >= MAX_HASH_KEYS:
+                    return None
+                ids = index[value] = array.array("I")
+            ids.append(i)
+    except TypeError:
+        # Unhashable values (bytearray)
+        return None
+    return index
+
+
+class ResultIndex:
+    """Lazily built per-column indexes over one result set's rows.
+
+    rows is a list of tuples or a ColumnStore; while it is still growing the
+    indexes cover the rows present when query() started and are rebuilt
+    once more rows have arrived.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.count = len(self.rows)
+        self._sort = {}
+        self._hash = {}
+
+    def _column(self, column):
+        if hasattr(self.rows, "column"):
+            return self.rows.column(column)[:self.count]
+        return [row[column] for row in self.rows[:self.count]]
+
+    def _value_at(self, column):
+        rows = self.rows
+        return lambda i: rows[i][column]
+
+    def sort_index(self, column):
+        if column not in self._sort:
+            self._sort[column] = _SortIndex(self._column(column))
+        return self._sort[column]
+
+    def hash_index(self, column):
+        if column not in self._hash:
+            self._hash[column] = _hash_index(self._column(column))
+        return self._hash[column]
+
+    def query(self, sort=None, descending=False, conditions=(), search=""):
+        """Ids of the matching rows in display order, or None when every row is shown as is"""
+        with self._lock:
+            if len(self.rows) != self.count:
+                self._reset()
+            selected = None
+            for term in search.lower().split():
+                selected = self._narrow(selected, self._search(term))
+            for condition in conditions:
+                selected = self._narrow(selected, self._matching(condition))
+
+            if sort is not None:
+                order = self.sort_index(sort).ids
+                if selected is not None:
+                    order = array.array("I", [i for i in order if i in selected])
+                return order[::-1] if descending else order
+            if selected is None:
+                return None
+            return array.array("I", sorted(selected))
+
+    @staticmethod
+    def _narrow(selected, ids):
+        return ids if selected is None else selected & ids
+
+    def _contains(self, column, term):
+        index = self.hash_index(column)
+        if index is not None:
+            ids = set()
+            for value, value_ids in index.items():
+                if value is not None and term in str(value).lower():
+                    ids.update(value_ids)
+            return ids
+        return {i for i, value in enumerate(self._column(column)) if value is not None and term in str(value).lower()}
+
+    def _search(self, term):
+        ids = set()
+        for column in range(len(self.rows[0]) if self.count else 0):
+            ids |= self._contains(column, term)
+        return ids
+
+    def _matching(self, condition):
+        column, op = condition.column, condition.op
+        if op == "~":
+            return self._contains(column, str(condition.value or "").lower())
+
+        if op in ("=", "!="):
+            index = self.hash_index(column)
+            values = self._column(column) if index is None else index
+            # Any non-NULL value tells the type the literal is converted to
+            target = coerce(condition.value, next((value for value in values if value is not None), None))
+            if index is not None:
+                if op == "=":
+                    return set(index.get(target, ()))
+                ids = set()
+                for value, value_ids in index.items():
+                    if value is not None and value != target:
+                        ids.update(value_ids)
+                return ids
+            if op == "=":
+                return {i for i, value in enumerate(values) if value == target}
+            return {i for i, value in enumerate(values) if value is not None and value != target}
+
+        if condition.value is None:
+            # Ordering against NULL matches nothing, as in SQL
+            return set()
+        order = self.sort_index(column)
+        if order.nulls == len(order.ids):
+            return set()
+        target = coerce(condition.value, self.rows[order.ids[order.nulls]][column])
+        if order.comparable:
+            value_at = self._value_at(column)
+            try:
+                if op in ("<", "<="):
+                    return set(order.ids[order.nulls:order.bisect(value_at, target, right=op == "<=")])
+                return set(order.ids[order.bisect(value_at, target, right=op == ">"):])
+            except TypeError:
+                pass
+        return {i for i, value in enumerate(self._column(column)) if value is not None and _compare(value, op, target)}
+
+
+class RowSelection:
+    """The rows at ids (in that order), read through to the underlying rows"""
+
+    def __init__(self, rows, ids):
+        self.rows = rows
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            yield from batch
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return RowSelection(self.rows, self.ids[key])
+        return self.rows[self.ids[key]]
+
+    def iter_batches(self, size=1000):
+        rows = self.rows
+        for start in range(0, len(self.ids), size):
+            yield [rows[i] for i in self.ids[start:start + size]]
@@ -0,0 +1,451 @@
+"""Compact columnar storage for result rows kept in memory.
+
+Rows are stored in chunks of CHUNK_ROWS. Within a chunk each column is a
+typed array ('q' integers, 'd' floats, 'B' bits) with an optional NULL mask,
+strings are 32-bit codes into one dictionary per column (so the dbname of
+every row costs four bytes), and any other value (Decimal, datetime,
+bytes...) stays a Python object. A column that mixes types falls back to
+Python objects for that chunk only.
+
+Full chunks can be spilled to an anonymous temporary file and are then read
+back through mmap, so a collecting sink stays within its memory budget.
+Slicing a store returns a RowsView; rows are only decoded when iterated.
+"""
+import array
+import mmap
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+CHUNK_ROWS = 65536
+# A data column stops dictionary-encoding new chunks once it has this many distinct strings
+# (dictionaries stay in memory); the source columns are always encoded
+MAX_DICTIONARY_SIZE = 4096
+DEFAULT_MEMORY_BUDGET_MB = 512
+# Spilled object columns decoded recently, kept so scrolling does not unpickle on every redraw
+_OBJECT_CACHE_SIZE = 4
+
+_TYPECODES = {"int": "q", "float": "d", "bool": "B", "dict": "I"}
+
+
+def _kind_of(value, dictionary_ok=True):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str) and dictionary_ok:
+        return "dict"
+    return "object"
+
+
+class _Dictionary:
+    """Distinct strings of one column; code 0 stands for NULL"""
+
+    def __init__(self, limit=MAX_DICTIONARY_SIZE):
+        self.limit = limit
+        self.values = [None]
+        self.codes = {None: 0}
+        self.nbytes = 0
+
+    @property
+    def full(self):
+        return self.limit is not None and len(self.values) >= self.limit
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            self.nbytes += sys.getsizeof(value) + 100
+        return code
+
+
+class _Pickled:
+    """An object column of a spilled chunk, pickled into the mmap"""
+
+    def __init__(self, mm, offset, nbytes):
+        self.mm = mm
+        self.offset = offset
+        self.nbytes = nbytes
+
+    def load(self):
+        return pickle.loads(self.mm[self.offset:self.offset + self.nbytes])
+
+
+class _Segment:
+    """One column of one chunk"""
+
+    def __init__(self, dictionary):
+        self.dictionary = dictionary
+        self.kind = None  # decided by the first non-NULL value; until then only NULLs were seen
+        self.data = None
+        self.nulls = None
+        self.count = 0
+        self.payload = 0
+
+    @property
+    def nbytes(self):
+        if self.kind is None or isinstance(self.data, (memoryview, _Pickled)):
+            return 0
+        if self.kind == "object":
+            return 8 * len(self.data) + self.payload
+        size = self.data.itemsize * len(self.data)
+        return size + (len(self.nulls) if self.nulls is not None else 0)
+
+    def _start(self, kind):
+        leading = self.count
+        self.kind = kind
+        if kind == "object":
+            self.data = [None] * leading
+        elif kind == "dict":
+            self.data = array.array("I", bytes(4 * leading))
+        else:
+            self.data = array.array(_TYPECODES[kind], bytes(array.array(_TYPECODES[kind]).itemsize * leading))
+            if leading:
+                self.nulls = array.array("B", b"\1" * leading)
+
+    def extend(self, values):
+        if self.kind is None:
+            first = next((value for value in values if value is not None), None)
+            if first is None:
+                self.count += len(values)
+                return
+            self._start(_kind_of(first, not self.dictionary.full))
+        if self.kind == "object":
+            self._extend_objects(values)
+        elif self.kind == "dict":
+            self._extend_codes(values)
+        else:
+            self._extend_typed(values)
+        self.count += len(values)
+
+    def extend_constant(self, value, n):
+        """n copies of value (the source columns of a batch)"""
+        if self.kind is None and value is not None:
+            self._start(_kind_of(value, not self.dictionary.full))
+        if self.kind == "dict" and (value is None or isinstance(value, str)) and not self.dictionary.full:
+            self.data.extend(array.array("I", [self.dictionary.code(value)]) * n)
+            self.count += n
+        else:
+            self.extend([value] * n)
+
+    def _extend_objects(self, values):
+        first = next((value for value in values if value is not None), None)
+        self.payload += sys.getsizeof(first) * len(values) if first is not None else 0
+        self.data.extend(values)
+
+    def _extend_codes(self, values):
+        codes = self.dictionary.codes
+        try:
+            new = array.array("I", [codes[value] for value in values])
+        except (KeyError, TypeError):
+            new = array.array("I")
+            for i, value in enumerate(values):
+                if value is not None and (not isinstance(value, str) or self.dictionary.full and value not in codes):
+                    self.data.extend(new)
+                    self._to_objects()
+                    self._extend_objects(values[i:])
+                    return
+                new.append(self.dictionary.code(value))
+        self.data.extend(new)
+
+    def _extend_typed(self, values):
+        try:
+            new = array.array(self.data.typecode, values)
+        except (TypeError, OverflowError):
+            self._extend_slow(values)
+            return
+        self.data.extend(new)
+        if self.nulls is not None:
+            self.nulls.frombytes(bytes(len(values)))
+
+    def _extend_slow(self, values):
+        for i, value in enumerate(values):
+            if value is None:
+                if self.nulls is None:
+                    self.nulls = array.array("B", bytes(len(self.data)))
+                self.data.append(0)
+                self.nulls.append(1)
+                continue
+            if _kind_of(value) != self.kind:
+                self._to_objects()
+                self._extend_objects(values[i:])
+                return
+            try:
+                self.data.append(value)
+            except OverflowError:
+                self._to_objects()
+                self._extend_objects(values[i:])
+                return
+            if self.nulls is not None:
+                self.nulls.append(0)
+
+    def _to_objects(self):
+        values = self.values(0, len(self.data), None)
+        self.kind = "object"
+        self.data = []
+        self.nulls = None
+        self.payload = 0
+        self._extend_objects(values)
+
+    def values(self, start, stop, cache):
+        """Python values of rows [start, stop) of this column"""
+        if self.kind is None:
+            return [None] * (stop - start)
+        data = self.data
+        if isinstance(data, _Pickled):
+            data = cache.get(self) if cache is not None else None
+            if data is None:
+                data = self.data.load()
+                if cache is not None:
+                    cache.put(self, data)
+        if self.kind == "object":
+            return data[start:stop]
+        if self.kind == "dict":
+            strings = self.dictionary.values
+            return [strings[code] for code in data[start:stop]]
+        values = data[start:stop].tolist()
+        if self.kind == "bool":
+            values = [bool(value) for value in values]
+        if self.nulls is not None:
+            nulls = self.nulls[start:stop]
+            values = [None if null else value for value, null in zip(values, nulls)]
+        return values
+
+
+class _ObjectCache:
+    def __init__(self, size=_OBJECT_CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+
+    def get(self, segment):
+        values = self._items.get(id(segment))
+        if values is not None:
+            self._items.move_to_end(id(segment))
+        return values
+
+    def put(self, segment, values):
+        self._items[id(segment)] = values
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+
+class _Chunk:
+    def __init__(self, dictionaries):
+        self.segments = [_Segment(dictionary) for dictionary in dictionaries]
+        self.count = 0
+        self.mm = None
+
+    @property
+    def nbytes(self):
+        return sum(segment.nbytes for segment in self.segments)
+
+    def extend(self, source, rows):
+        n = len(rows)
+        for segment, value in zip(self.segments, source):
+            segment.extend_constant(value, n)
+        columns = list(zip(*rows))
+        data_segments = self.segments[len(source):]
+        if len(columns) != len(data_segments):
+            columns = [[row[i] for row in rows] for i in range(len(data_segments))]
+        for segment, values in zip(data_segments, columns):
+            segment.extend(values)
+        self.count += n
+
+    def rows(self, start, stop, cache):
+        return list(zip(*(segment.values(start, stop, cache) for segment in self.segments)))
+
+    def spill(self, file):
+        """Write the columns to the end of file and map them back; returns the bytes moved"""
+        file.seek(0, 2)
+        base = file.tell()
+        offset = 0
+        placed = []
+        for segment in self.segments:
+            for field in ("data", "nulls"):
+                value = getattr(segment, field)
+                if value is None:
+                    continue
+                if isinstance(value, list):
+                    blob, typecode = pickle.dumps(value, pickle.HIGHEST_PROTOCOL), None
+                else:
+                    blob, typecode = value.tobytes(), value.typecode
+                pad = -offset % 8
+                file.write(b"\0" * pad + blob)
+                offset += pad
+                placed.append((segment, field, offset, len(blob), typecode))
+                offset += len(blob)
+        if not offset:
+            return 0
+        # The next chunk must start on a mapping boundary
+        file.write(b"\0" * (-(base + offset) % mmap.ALLOCATIONGRANULARITY))
+        file.flush()
+
+        moved = self.nbytes
+        self.mm = mmap.mmap(file.fileno(), offset, offset=base, access=mmap.ACCESS_READ)
+        view = memoryview(self.mm)
+        for segment, field, start, nbytes, typecode in placed:
+            if typecode is None:
+                setattr(segment, field, _Pickled(self.mm, start, nbytes))
+            else:
+                setattr(segment, field, view[start:start + nbytes].cast(typecode))
+            if field == "data":
+                segment.payload = 0
+        view.release()
+        return moved
+
+    def close(self):
+        for segment in self.segments:
+            for value in (segment.data, segment.nulls):
+                if isinstance(value, memoryview):
+                    value.release()
+        if self.mm is not None:
+            self.mm.close()
+
+
+class ColumnStore:
+    """Append-only rows of width columns, readable like a sequence of tuples.
+
+    The first source_width columns name where a row came from (dbname...)
+    and are given once per batch. append_batch() is called by one writer
+    thread while other threads read; len() only counts rows whose every
+    column has been written.
+    """
+
+    def __init__(self, width, source_width=0, spill_dir=None):
+        self.width = width
+        self.spill_dir = spill_dir
+        self.spilled_bytes = 0
+        self._dictionaries = [_Dictionary(None if i < source_width else MAX_DICTIONARY_SIZE) for i in range(width)]
+        self._chunks = []
+        self._count = 0
+        self._file = None
+        self._cache = _ObjectCache()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            yield from batch
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._count)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return RowsView(self, start, max(start, stop))
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError("row index out of range")
+        index, offset = divmod(key, CHUNK_ROWS)
+        with self._lock:
+            return self._chunks[index].rows(offset, offset + 1, self._cache)[0]
+
+    @property
+    def memory_bytes(self):
+        """Approximate bytes held in memory (chunks not spilled plus the string dictionaries)"""
+        with self._lock:
+            return sum(chunk.nbytes for chunk in self._chunks) + sum(d.nbytes for d in self._dictionaries)
+
+    def append_batch(self, source, rows):
+        """Append rows of the data columns, all coming from source, e.g. ("tenant_001",)"""
+        done = 0
+        with self._lock:
+            while done < len(rows):
+                if not self._chunks or self._chunks[-1].count >= CHUNK_ROWS:
+                    self._chunks.append(_Chunk(self._dictionaries))
+                chunk = self._chunks[-1]
+                part = rows[done:done + CHUNK_ROWS - chunk.count]
+                chunk.extend(source, part)
+                done += len(part)
+                self._count += len(part)
+
+    def iter_batches(self, start=0, stop=None):
+        """Lists of row tuples covering [start, stop), at most one chunk each"""
+        start, stop, _ = slice(start, stop).indices(self._count)
+        while start < stop:
+            index, offset = divmod(start, CHUNK_ROWS)
+            end = min(stop, start + CHUNK_ROWS - offset)
+            with self._lock:
+                batch = self._chunks[index].rows(offset, offset + end - start, self._cache)
+            yield batch
+            start = end
+
+    def column(self, index):
+        """Every value of one column, in row order (for building indexes)"""
+        values = []
+        count = self._count
+        for chunk_index in range(0, count, CHUNK_ROWS):
+            with self._lock:
+                chunk = self._chunks[chunk_index // CHUNK_ROWS]
+                values.extend(chunk.segments[index].values(0, min(chunk.count, count - chunk_index), self._cache))
+        return values
+
+    def spill(self):
+        """Move every full chunk still in memory to the spill file; returns the bytes freed"""
+        freed = 0
+        with self._lock:
+            for chunk in self._chunks:
+                if chunk.mm is not None or chunk.count < CHUNK_ROWS:
+                    continue
+                if self._file is None:
+                    self._file = tempfile.TemporaryFile(prefix="sqlrunner-results-", dir=self.spill_dir)
+                freed += chunk.spill(self._file)
+            self.spilled_bytes += freed
+        return freed
+
+    def close(self):
+        """Drop every row and delete the spill file"""
+        with self._lock:
+            self._cache.clear()
+            for chunk in self._chunks:
+                chunk.close()
+            self._chunks = []
+            self._count = 0
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class RowsView:
+    """Rows [start, stop) of a ColumnStore; slicing it copies nothing"""
+
+    def __init__(self, store, start, stop):
+        self.store = store
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        for batch in self.store.iter_batches(self.start, self.stop):
+            yield from batch
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return RowsView(self.store, self.start + start, self.start + max(start, stop))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("row index out of range")
+        return self.store[self.start + key]
+
+    def iter_batches(self):
+        return self.store.iter_batches(self.start, self.stop)
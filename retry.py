@@ -0,0 +1,50 @@
+"""Transient error detection and retry backoff for database work."""
+import random
+import re
+
+_SQLSTATE = re.compile(r"\[(\w{5})\]")
+
+# SQLSTATEs of a lost or refused connection worth reconnecting for
+CONNECTION_SQLSTATES = ("08S01", "08001", "HYT01")
+# Deadlock victim (SQL Server error 1205) and serialization failures
+DEADLOCK_SQLSTATES = ("40001",)
+
+DEFAULT_MAX_RETRIES = 3
+
+
+def sqlstate(err):
+    """SQLSTATE of a driver error: pyodbc puts it in args[0], other drivers in the message"""
+    args = getattr(err, "args", ())
+    if args and isinstance(args[0], str) and len(args[0]) == 5:
+        return args[0]
+    match = _SQLSTATE.search(str(err))
+    return match.group(1) if match else None
+
+
+def is_deadlock(err):
+    return sqlstate(err) in DEADLOCK_SQLSTATES or "(1205)" in str(err)
+
+
+def is_connection_error(err):
+    return sqlstate(err) in CONNECTION_SQLSTATES
+
+
+class RetryPolicy:
+    """How often and how long to wait before retrying transient errors.
+
+    Delays grow exponentially from base_delay up to max_delay, with full
+    jitter so workers hit by the same deadlock do not retry in lockstep.
+    """
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, base_delay=0.5, max_delay=10.0):
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Seconds to wait before retry number attempt (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def should_retry(self, err, attempt):
+        """attempt is the number of retries already made"""
+        return attempt < self.max_retries and (is_deadlock(err) or is_connection_error(err))
@@ -0,0 +1,144 @@
+"""Named script parameters, bound by the driver instead of pasted into the SQL.
+
+:name placeholders outside string literals, quoted or bracketed identifiers
+and comments are rewritten to ? markers and their values are passed to
+cursor.execute(sql, params). Every database then receives the same SQL
+text, so the server can reuse its plans, and a value can never change the
+statement itself.
+
+Values are global, optionally overridden per database by a mapping file:
+
+    JSON  {"params": {"region": "eu"}, "databases": {"tenant_001": {"region": "us"}}}
+    CSV   a dbname column plus one column per parameter, one row per database
+
+A database key may also be "server/dbname" to tell apart databases of the
+same name on different servers.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+
+from sql_splitter import skip_block_comment
+
+# Same scanning approach as sql_splitter; "::" (T-SQL scope qualifier) is not a parameter
+_TOKEN = re.compile(
+    r"""(?=[:'"\[/-])(?:
+      (?P<param>(?<![:\w]):(?P<name>[A-Za-z_]\w*))
+    | (?P<string>'[^']*(?:''[^']*)*(?:'|\Z))
+    | (?P<quoted>"[^"]*(?:""[^"]*)*(?:"|\Z))
+    | (?P<bracket>\[[^\]]*(?:\]\][^\]]*)*(?:\]|\Z))
+    | (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*)
+    )""",
+    re.VERBOSE,
+)
+
+
+class ParameterizedStatement(str):
+    """A batch with its :name placeholders replaced by ?; names lists them in marker order"""
+
+    def __new__(cls, sql, names, text):
+        statement = super().__new__(cls, sql)
+        statement.names = tuple(names)
+        statement.text = text
+        return statement
+
+    def bind(self, values):
+        """Parameter tuple for cursor.execute from a name -> value mapping"""
+        missing = sorted({name for name in self.names if name not in values})
+        if missing:
+            raise ValueError(f"No value for parameter(s): {', '.join(missing)}")
+        return tuple(values[name] for name in self.names)
+
+
+def parameterize(batch):
+    """batch rewritten to ? markers, or batch unchanged when it has no placeholders"""
+    parts = []
+    names = []
+    start = pos = 0
+    while pos < len(batch):
+        for match in _TOKEN.finditer(batch, pos):
+            kind = match.lastgroup
+            if kind == "param":
+                parts.append(batch[start:match.start()])
+                parts.append("?")
+                names.append(match.group("name"))
+                start = match.end()
+            elif kind == "block_comment":
+                pos = skip_block_comment(batch, match.start())
+                break
+        else:
+            break
+    if not names:
+        return batch
+    parts.append(batch[start:])
+    return ParameterizedStatement("".join(parts), names, batch)
+
+
+def parameterize_all(statements):
+    """parameterize() every SQL batch; a batch repeated by GO n is parsed once"""
+    seen = {}
+    result = []
+    for statement in statements:
+        if isinstance(statement, str):
+            if statement not in seen:
+                seen[statement] = parameterize(statement)
+            statement = seen[statement]
+        result.append(statement)
+    return result
+
+
+def parse_assignments(items):
+    """{"name": "value"} from NAME=VALUE strings (command line, GUI entry)"""
+    values = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or not re.fullmatch(r"[A-Za-z_]\w*", name):
+            raise ValueError(f"Invalid parameter '{item}', expected NAME=VALUE")
+        values[name] = value.strip()
+    return values
+
+
+class ScriptParams:
+    """Global parameter values plus per-database overrides"""
+
+    def __init__(self, values=None, databases=None):
+        self.values = dict(values or {})
+        self.databases = {db: dict(v) for db, v in (databases or {}).items()}
+
+    @classmethod
+    def from_file(cls, path):
+        if os.path.splitext(path.lower())[1] == ".csv":
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.DictReader(f)
+                if not reader.fieldnames or "dbname" not in reader.fieldnames:
+                    raise ValueError(f"{path} needs a dbname column")
+                databases = {}
+                for row in reader:
+                    db = row.pop("dbname")
+                    databases[db] = {name: value for name, value in row.items() if value != ""}
+            return cls(databases=databases)
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} must hold a JSON object")
+        return cls(data.get("params"), data.get("databases"))
+
+    def with_values(self, values):
+        """Copy with extra global values taking precedence (e.g. --param)"""
+        return ScriptParams(dict(self.values, **values), self.databases)
+
+    def values_for(self, db, server=None):
+        overrides = self.databases.get(f"{server}/{db}") if server else None
+        if overrides is None:
+            overrides = self.databases.get(db, {})
+        return dict(self.values, **overrides)
+
+    def signature(self):
+        """Short hash of every value, so a journal is only resumed with the same parameters"""
+        text = json.dumps([self.values, self.databases], sort_keys=True, default=str)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
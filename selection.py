@@ -0,0 +1,86 @@
+import bisect
+import re
+
+MATCH_MODES = ("substring", "prefix", "regex")
+
+
+class SelectionModel:
+    """Database names, the current filter result and the selected set.
+
+    Kept apart from any widget so filtering or rebuilding the list never
+    loses the selection. Names are held in one case-insensitively sorted
+    index: prefix filters are a bisect, and a substring filter that only
+    extends the previous query narrows the previous result instead of
+    rescanning every name.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self._lower = []
+        self.selected = set()
+        self.visible = []
+        self.error = None
+        self._last = None
+        self.set_names(names)
+
+    def set_names(self, names):
+        self.names = sorted(set(names), key=str.lower)
+        self._lower = [name.lower() for name in self.names]
+        self.selected &= set(self.names)
+        self.visible = list(self.names)
+        self._last = None
+
+    def filter(self, query="", mode="substring", predicate=None):
+        """Recompute visible names; predicate(name) can add a metadata filter"""
+        query_lower = query.lower()
+        self.error = None
+        last = self._last
+        narrowing = (
+            last is not None and mode == "substring" and last[1] == "substring"
+            and last[2] == predicate and query_lower.startswith(last[0])
+        )
+
+        if narrowing:
+            # visible already passed the predicate and the shorter query
+            visible = [name for name in self.visible if query_lower in name.lower()]
+        else:
+            if mode == "regex" and query:
+                try:
+                    pattern = re.compile(query, re.IGNORECASE)
+                except re.error as e:
+                    # Keep the previous result while the pattern is being typed
+                    self.error = str(e)
+                    return self.visible
+                visible = [name for name in self.names if pattern.search(name)]
+            elif mode == "prefix":
+                lo = bisect.bisect_left(self._lower, query_lower)
+                hi = bisect.bisect_right(self._lower, query_lower + "\uffff")
+                visible = self.names[lo:hi]
+            else:
+                visible = [name for name, lower in zip(self.names, self._lower) if query_lower in lower]
+
+            if predicate is not None:
+                visible = [name for name in visible if predicate(name)]
+
+        self.visible = visible
+        self._last = (query_lower, mode, predicate)
+        return self.visible
+
+    def is_selected(self, name):
+        return name in self.selected
+
+    def toggle(self, name):
+        if name in self.selected:
+            self.selected.discard(name)
+        else:
+            self.selected.add(name)
+
+    def select_visible(self):
+        self.selected.update(self.visible)
+
+    def deselect_visible(self):
+        self.selected.difference_update(self.visible)
+
+    def selected_names(self):
+        return [name for name in self.names if name in self.selected]
+
@@ -0,0 +1,91 @@
+"""Splits T-SQL scripts into batches on GO separators the way sqlcmd does.
+
+GO is only a separator when it stands alone on its line, optionally
+followed by a repeat count and a -- comment. GO inside string literals,
+quoted or bracketed identifiers and (nested) block comments is ignored.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+SCRIPT_CACHE_SIZE = 16
+
+# One alternation so the regex engine jumps straight to the next token that
+# matters; the lookahead lets it skip plain SQL text without trying every branch.
+# A GO line is matched from its leading newline (the script is scanned with a
+# newline prepended) and leaves the trailing newline for the next GO line.
+_TOKEN = re.compile(
+    r"""(?=[\n'"\[/-])(?:
+      (?P<go>\n[ \t]*GO(?:[ \t]+(?P<count>\d+))?[ \t]*(?:--[^\n]*)?(?=\n|\Z))
+    | (?P<string>'[^']*(?:''[^']*)*(?:'|\Z))
+    | (?P<quoted>"[^"]*(?:""[^"]*)*(?:"|\Z))
+    | (?P<bracket>\[[^\]]*(?:\]\][^\]]*)*(?:\]|\Z))
+    | (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*)
+    )""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_COMMENT_EDGE = re.compile(r"/\*|\*/")
+
+
+def skip_block_comment(script, pos):
+    """Position just after the block comment opened at pos (T-SQL comments nest)"""
+    depth = 0
+    for match in _COMMENT_EDGE.finditer(script, pos):
+        depth += 1 if match.group() == "/*" else -1
+        if depth == 0:
+            return match.end()
+    return len(script)
+
+
+def parse_batches(script):
+    """List of (batch_text, repeat_count) in script order, empty batches dropped"""
+    script = "\n" + script.replace("\r\n", "\n")
+    batches = []
+    start = pos = 0
+
+    while pos < len(script):
+        # finditer keeps the per-token loop cheap; it is only restarted to hop
+        # over block comments, which can nest and so need a manual scan
+        for match in _TOKEN.finditer(script, pos):
+            kind = match.lastgroup
+            if kind == "go":
+                text = script[start:match.start()].strip()
+                if text:
+                    batches.append((text, int(match.group("count") or 1)))
+                start = match.end()
+            elif kind == "block_comment":
+                pos = skip_block_comment(script, match.start())
+                break
+        else:
+            break
+
+    text = script[start:].strip()
+    if text:
+        batches.append((text, 1))
+    return batches
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def split_batches(script):
+    """Batches to execute in order, with GO <n> batches repeated n times.
+
+    Results are cached by script hash (small LRU), so rerunning the same
+    script skips parsing.
+    """
+    digest = hashlib.sha1(script.encode("utf-8", "surrogatepass")).digest()
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return list(_cache[digest])
+
+    batches = tuple(text for text, count in parse_batches(script) for _ in range(count))
+    with _cache_lock:
+        _cache[digest] = batches
+        while len(_cache) > SCRIPT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return list(batches)
@@ -0,0 +1,215 @@
+import queue
+import threading
+
+from result_store import ColumnStore
+
+DEFAULT_FETCH_SIZE = 1000
+DEFAULT_MAX_PENDING_BATCHES = 32
+
+_STOP = object()
+
+
+def source_columns(with_server=False):
+    """Leading columns naming where a row came from; server only in multi-server runs"""
+    return ["server", "dbname"] if with_server else ["dbname"]
+
+
+class RowBatch:
+    """A slice of one result set fetched from one database.
+
+    statement_index/result_index locate the result set inside the script;
+    schema_key groups batches of the same result set across databases.
+    description is the DB-API cursor.description (types, precision and
+    scale) when the batch came from a cursor.
+    """
+
+    def __init__(self, server, db, columns, rows, statement_index=0, result_index=0, description=None):
+        self.server = server
+        self.db = db
+        self.columns = columns
+        self.rows = rows
+        self.statement_index = statement_index
+        self.result_index = result_index
+        self.description = description
+
+    @property
+    def schema_key(self):
+        return (self.statement_index, self.result_index, tuple(self.columns))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def source(self, with_server=False):
+        """Values for source_columns(with_server)"""
+        return (self.server, self.db) if with_server else (self.db,)
+
+
+class RowSink:
+    """Base class for consumers of streamed row batches (grid, exporter, aggregator)"""
+
+    def start(self):
+        pass
+
+    def write_batch(self, batch):
+        raise NotImplementedError
+
+    def end_database(self, server, db):
+        """Called once a database has produced all of its rows"""
+        pass
+
+    def finish(self):
+        pass
+
+
+class _EndOfDatabase:
+    def __init__(self, server, db):
+        self.server = server
+        self.db = db
+
+
+class ResultSet:
+    """Rows of one result set gathered across databases, read as (db, *row) or (server, db, *row) tuples"""
+
+    def __init__(self, key, columns, with_server=False, spill_dir=None):
+        self.key = key
+        sources = source_columns(with_server)
+        self.columns = sources + list(columns)
+        self.rows = ColumnStore(len(self.columns), len(sources), spill_dir)
+
+    @property
+    def label(self):
+        statement_index, result_index, _ = self.key
+        return f"Statement {statement_index + 1} / result {result_index + 1}"
+
+
+class CollectingSink(RowSink):
+    """Keeps rows in memory, one ResultSet per distinct result schema.
+
+    limit caps the rows kept over all result sets; the rest is only counted
+    in dropped. on_write, if given, is called after every batch (e.g. to
+    schedule a grid refresh). with_server adds a server column for runs
+    spanning several servers. Once the rows held in memory exceed
+    memory_budget bytes, full chunks are spilled to a temporary file in
+    spill_dir and read back through mmap.
+    """
+
+    def __init__(self, limit=None, on_write=None, with_server=False, memory_budget=None, spill_dir=None):
+        self.result_sets = []
+        self.limit = limit
+        self.on_write = on_write
+        self.with_server = with_server
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.kept = 0
+        self.dropped = 0
+        self._by_key = {}
+
+    def write_batch(self, batch):
+        key = batch.schema_key
+        result_set = self._by_key.get(key)
+        if result_set is None:
+            result_set = self._by_key[key] = ResultSet(key, batch.columns, self.with_server, self.spill_dir)
+            self.result_sets.append(result_set)
+
+        room = len(batch.rows) if self.limit is None else max(0, self.limit - self.kept)
+        kept = batch.rows[:room]
+        result_set.rows.append_batch(batch.source(self.with_server), kept)
+        self.kept += len(kept)
+        self.dropped += len(batch.rows) - len(kept)
+        if self.memory_budget is not None and self.memory_bytes > self.memory_budget:
+            for result_set in self.result_sets:
+                result_set.rows.spill()
+        if self.on_write:
+            self.on_write()
+
+    @property
+    def memory_bytes(self):
+        return sum(result_set.rows.memory_bytes for result_set in self.result_sets)
+
+    @property
+    def spilled_bytes(self):
+        return sum(result_set.rows.spilled_bytes for result_set in self.result_sets)
+
+    def close(self):
+        """Release the kept rows and their spill files"""
+        for result_set in self.result_sets:
+            result_set.rows.close()
+
+
+def estimate_bytes(rows):
+    """Approximate payload size of a batch, extrapolated from its first row"""
+    if not rows:
+        return 0
+    size = 0
+    for value in rows[0]:
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value)
+        elif value is not None:
+            size += 8
+    return size * len(rows)
+
+
+def fetch_batches(cursor, size=DEFAULT_FETCH_SIZE):
+    """Yield lists of rows from the current result set until it is exhausted"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+class ResultPipeline:
+    """Bounded hand-off between database workers and row sinks.
+
+    Workers call emit() and block once max_pending batches are queued, so a
+    slow sink throttles fetching instead of letting rows pile up in memory.
+    A single consumer thread feeds every sink in arrival order.
+    """
+
+    def __init__(self, sinks, max_pending=DEFAULT_MAX_PENDING_BATCHES):
+        self.sinks = list(sinks)
+        self.queue = queue.Queue(maxsize=max(1, max_pending))
+        self.errors = []
+        self._thread = None
+
+    def start(self):
+        for sink in list(self.sinks):
+            self._call(sink, sink.start)
+        self._thread = threading.Thread(target=self._consume, name="sqlrunner-sinks", daemon=True)
+        self._thread.start()
+        return self
+
+    def emit(self, batch):
+        self.queue.put(batch)
+
+    def end_database(self, server, db):
+        self.queue.put(_EndOfDatabase(server, db))
+
+    def close(self):
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        for sink in list(self.sinks):
+            self._call(sink, sink.finish)
+
+    def _consume(self):
+        while True:
+            batch = self.queue.get()
+            if batch is _STOP:
+                return
+            if isinstance(batch, _EndOfDatabase):
+                for sink in list(self.sinks):
+                    self._call(sink, sink.end_database, batch.server, batch.db)
+                continue
+            for sink in list(self.sinks):
+                self._call(sink, sink.write_batch, batch)
+
+    def _call(self, sink, method, *args):
+        # A failing sink is dropped so it cannot stall the workers
+        try:
+            method(*args)
+        except Exception as e:
+            self.errors.append((sink, e))
+            if sink in self.sinks:
+                self.sinks.remove(sink)
@@ -0,0 +1,16 @@
+import pytest
+
+from aggregation import INT64_MAX, AggregatingSink, parse_aggregates
+from streaming import RowBatch
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+def test_integer_sums_past_int64_stay_exact(backend):
+    if backend == "numpy":
+        pytest.importorskip("numpy")
+    sink = AggregatingSink([], parse_aggregates("sum(n), avg(n)"), backend=backend)
+    values = [INT64_MAX, INT64_MAX, 1, -5]
+    sink.write_batch(RowBatch("sql01", "tenant_1", ["n"], [(v,) for v in values]))
+    sink.end_database("sql01", "tenant_1")
+    sink.finish()
+    assert sink.result_rows() == [(sum(values), sum(values) / len(values))]
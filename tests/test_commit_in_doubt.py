@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from benchmarks.fake_driver import FakeDriver
+from connection_pool import ConnectionPool
+from engine import ENGINES, RunControl, run_script, summary_lines
+from journal import RunJournal
+from retry import RetryPolicy
+
+SCRIPT = "UPDATE t SET c0 = c0 + 1\nGO\nSELECT c0 FROM t"
+
+
+class LinkFailure(Exception):
+    """Driver error of a connection dropped while the server answers (pyodbc puts the SQLSTATE first)"""
+
+    def __init__(self):
+        super().__init__("08S01", "[08S01] Communication link failure")
+
+
+class CommitThenDrop:
+    """FakeDriver connections whose first commit applies the write, then loses the connection"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.commits = 0
+
+    def __call__(self, server, db):
+        conn = self.driver.connect(server, db)
+        commit = conn.commit
+
+        def commit_then_drop():
+            commit()
+            self.commits += 1
+            if self.commits == 1:
+                raise LinkFailure()
+
+        conn.commit = commit_then_drop
+        return conn
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("commit_mode", ["statement", "database"])
+def test_commit_in_doubt_is_not_retried(engine, commit_mode, tmp_path):
+    connect = CommitThenDrop(FakeDriver(latency=0, rows=2, databases=1))
+    db = connect.driver.database_names[0]
+    pool = ConnectionPool(connect)
+    path = str(tmp_path / "journal.jsonl")
+    journal = RunJournal(path, "fake", SCRIPT)
+    control = RunControl(retry=RetryPolicy(3, base_delay=0), journal=journal, commit_mode=commit_mode)
+
+    tasks, _ = run_script(pool, "fake", [db], SCRIPT, [], 1, engine=engine, control=control)
+    journal.close()
+    task = tasks[0]
+    assert task.status == "indoubt"
+    assert task.retries == 0
+    assert connect.commits == 1
+    assert [stats.index for stats in task.statement_stats] == ([0] if commit_mode == "statement" else [0, 1])
+    assert "❓ 1 in doubt" in summary_lines(tasks)[0]
+    with open(path, encoding="utf-8") as f:
+        assert {"server": "fake", "db": db, "status": "indoubt"} in [json.loads(line) for line in f]
+
+    # A resumed run leaves the database alone until it has been checked
+    journal = RunJournal(path, "fake", SCRIPT, resume=True)
+    tasks, _ = run_script(pool, "fake", [db], SCRIPT, [], 1, engine=engine,
+                          control=RunControl(journal=journal, commit_mode=commit_mode))
+    journal.close()
+    assert tasks[0].status == "indoubt"
+    assert connect.commits == 1
+    pool.close_all()
@@ -0,0 +1,63 @@
+from benchmarks.fake_driver import FakeDriver
+from connection_pool import ConnectionPool
+from engine import RunControl, run_script
+
+# Session state: a temp table lives as long as the connection (like #t in SQL Server)
+SCRIPT = "CREATE TEMP TABLE session_tmp AS SELECT 1 AS x\nGO\nSELECT x FROM session_tmp"
+
+
+def test_sessions_are_not_shared_between_databases():
+    driver = FakeDriver(latency=0, databases=4)
+    pool = ConnectionPool(driver.connect, max_per_server=1)
+    tasks, _ = run_script(pool, "fake", driver.database_names, SCRIPT, [], 1, control=RunControl())
+    assert [task.status for task in tasks] == ["done"] * 4
+    assert all(not stats.error for task in tasks for stats in task.statement_stats)
+    assert pool.stats["switches"] == 0
+    pool.close_all()
+
+
+def test_switching_databases_is_opt_in():
+    driver = FakeDriver(latency=0, databases=2)
+    pool = ConnectionPool(driver.connect, max_per_server=1, switch_databases=True)
+    with pool.connection("fake", driver.database_names[0]):
+        pass
+    with pool.connection("fake", driver.database_names[1]) as conn:
+        assert conn.database == driver.database_names[1]
+    assert pool.stats["switches"] == 1
+    pool.close_all()
+
+
+class ResettableConnection:
+    """Records the driver session resets and statements the pool sends"""
+
+    def __init__(self):
+        self.calls = []
+
+    def set_attr(self, attr, value):
+        self.calls.append(("set_attr", attr, value))
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.calls.append(("execute", sql))
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_reused_session_is_reset_and_returned_to_its_database():
+    conn = ResettableConnection()
+    pool = ConnectionPool(lambda server, db: conn, max_per_server=1, switch_databases=True)
+    with pool.connection("s", "a"):
+        pass
+    with pool.connection("s", "b"):
+        pass
+    # The reset returns the session to "a", so going back there needs a USE again
+    with pool.connection("s", "b"):
+        pass
+    assert conn.calls == [("set_attr", 1204, 1), ("execute", "USE [b]"), ("set_attr", 1204, 1), ("execute", "USE [b]")]
+    assert pool.stats["resets"] == 2
@@ -0,0 +1,44 @@
+import pytest
+
+from config import merge_profile
+from engine import add_server, create_pool
+
+PROFILE = {
+    "SQL_SERVER": "old", "USERNAME": "sa", "PASSWORD": "old", "DRIVER": "ODBC Driver 17 for SQL Server",
+    "MAX_CONCURRENCY": 3, "COMMIT_MODE": "all", "STATEMENT_TIMEOUT": 30,
+}
+
+
+def test_login_keeps_profile_settings():
+    profile = merge_profile(PROFILE, "new", "sa", "secret", PROFILE["DRIVER"])
+    assert profile["SQL_SERVER"] == "new" and profile["PASSWORD"] == "secret"
+    assert profile["COMMIT_MODE"] == "all" and profile["MAX_CONCURRENCY"] == 3
+    assert merge_profile(None, "s", "u", "p", "d") == {"SQL_SERVER": "s", "USERNAME": "u", "PASSWORD": "p", "DRIVER": "d"}
+
+
+def test_every_profile_sets_its_server_limit():
+    pool = create_pool(PROFILE, max_per_server=8, connect=None)
+    add_server(pool, dict(PROFILE, SQL_SERVER="other", MAX_CONCURRENCY=2))
+    add_server(pool, dict(PROFILE, SQL_SERVER="plain", MAX_CONCURRENCY=None))
+    assert pool.limit_for("old") == 3
+    assert pool.limit_for("other") == 2
+    assert pool.limit_for("plain") == 8
+
+
+def test_profile_settings_reach_the_run(monkeypatch):
+    pytest.importorskip("pyodbc")
+    import tkinter as tk
+    import main
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    monkeypatch.setattr(main.SQLApp, "load_databases", lambda self: None)
+    try:
+        app = main.SQLApp(root, merge_profile(PROFILE, "old", "sa", "secret", PROFILE["DRIVER"]))
+        control = app.collect_run_options()["control"]
+        assert control.commit_mode == "all"
+        assert control.statement_timeout == 30
+        assert app.pool.limit_for("old") == 3
+    finally:
+        root.destroy()
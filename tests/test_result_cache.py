@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.fake_driver import FakeDriver
+from connection_pool import ConnectionPool
+from engine import ENGINES, RunControl, run_script
+from result_cache import ResultCache
+from streaming import CollectingSink
+
+
+def run(pool, db, script, cache, cache_results, engine):
+    sink = CollectingSink()
+    tasks, _ = run_script(pool, "fake", [db], script, [sink], 1, engine=engine,
+                          control=RunControl(cache=cache, cache_results=cache_results))
+    assert tasks[0].status == "done"
+    return [row for result in sink.result_sets for row in result.rows]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("directory", [False, True])
+def test_uncached_write_drops_cached_reads(engine, directory, tmp_path):
+    driver = FakeDriver(latency=0, rows=2, databases=1)
+    pool = ConnectionPool(driver.connect)
+    cache = ResultCache(directory=str(tmp_path) if directory else None)
+    db = driver.database_names[0]
+    select = "SELECT c0 FROM t ORDER BY c0"
+
+    assert [row[-1] for row in run(pool, db, select, cache, True, engine)] == [0, 1]
+    run(pool, db, "UPDATE t SET c0 = 99", cache, False, engine)
+    assert len(cache) == 0
+    assert [row[-1] for row in run(pool, db, select, cache, True, engine)] == [99, 99]
+    pool.close_all()
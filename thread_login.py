@@ -1,9 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, simpledialog
 import pyodbc
-import json
-import os
-from config import get_config_path
+from config import get_config_path, load_profiles, merge_profile, save_profiles
 import queue
 import threading
 
@@ -41,6 +39,7 @@ class LoginDialog:
         self.setup_styles()
         
         self.result = None
+        self.connection = None
         self.profiles = self.load_profiles()
         
         # Main container with padding
@@ -275,14 +274,10 @@ class LoginDialog:
         button.bind("<Leave>", lambda e: button.configure(bg=default_color))
 
     def load_profiles(self):
-        if os.path.exists(CREDENTIALS_FILE):
-            with open(CREDENTIALS_FILE, "r") as f:
-                return json.load(f)
-        return {}
+        return load_profiles()
 
     def save_profiles(self):
-        with open(CREDENTIALS_FILE, "w") as f:
-            json.dump(self.profiles, f, indent=4)
+        save_profiles(self.profiles)
 
     def delete_profile(self):
         profile = self.profile_var.get().strip()
@@ -393,7 +388,10 @@ class LoginDialog:
         try:
             conn_str = self.get_connection_string(server, user, password, driver)
             conn = pyodbc.connect(conn_str)
-            conn.close()
+            # Kept open so the main window's connection pool can reuse it
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = conn
             self.queue.put(("success", server, user, password, driver, profile_name, login_btn, original_text, progress_frame))
         except pyodbc.Error as e:
             self.queue.put(("error", str(e), login_btn, original_text, progress_frame))
@@ -417,6 +415,9 @@ class LoginDialog:
         # Reset cursor
         self.top.config(cursor="")
 
+        # Settings of the selected profile carry over, also when it is saved under a new name
+        profile = merge_profile(self.profiles.get(profile_name), server, user, password, driver)
+
         if self.remember_var.get():
             if not profile_name:
                 profile_name = simpledialog.askstring("Profile Name", "Enter a name for this profile:", parent=self.top)
@@ -439,22 +440,12 @@ class LoginDialog:
                     profile_name = new_name
                     self.profile_var.set(profile_name)
 
-            self.profiles[profile_name] = {
-                "SQL_SERVER": server,
-                "USERNAME": user,
-                "PASSWORD": password,
-                "DRIVER": driver,
-            }
+            self.profiles[profile_name] = profile
             self.save_profiles()
             self.profile_selector["values"] = list(self.profiles.keys())
 
         # Store result and close window
-        self.result = {
-            "SQL_SERVER": server,
-            "USERNAME": user,
-            "PASSWORD": password,
-            "DRIVER": driver,
-        }
+        self.result = dict(profile)
         progress_frame.destroy()
         self.top.destroy()
 
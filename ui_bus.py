@@ -0,0 +1,72 @@
+import queue
+
+FRAME_MS = 16
+
+# How pending events of one kind are folded into a single handler call per frame
+BATCH = "batch"   # handler(list_of_payloads)
+LAST = "last"     # handler(latest_payload)
+
+
+class UIEventBus:
+    """Single channel for worker threads to reach Tk widgets.
+
+    Workers post() into an unbounded queue and never wait on the UI. The Tk
+    thread drains everything pending once per frame via root.after (the same
+    polling approach LoginDialog uses for its connection result), coalesces
+    events per kind and calls each subscribed handler at most once per frame.
+    """
+
+    def __init__(self, root, interval_ms=FRAME_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.queue = queue.Queue()
+        self.handlers = {}
+        self._order = []
+        self._after_id = None
+
+    def subscribe(self, kind, handler, mode=BATCH):
+        if kind not in self.handlers:
+            self._order.append(kind)
+        self.handlers[kind] = (handler, mode)
+
+    def post(self, kind, payload=None):
+        self.queue.put_nowait((kind, payload))
+
+    def call(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the Tk thread, in posting order"""
+        self.queue.put_nowait((None, (func, args, kwargs)))
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _drain(self):
+        pending = {}
+        calls = []
+        # Only take what is queued right now so busy workers cannot starve the UI
+        for _ in range(self.queue.qsize()):
+            try:
+                kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind is None:
+                calls.append(payload)
+            else:
+                pending.setdefault(kind, []).append(payload)
+
+        try:
+            for kind in self._order:
+                if kind in pending:
+                    handler, mode = self.handlers[kind]
+                    handler(pending[kind] if mode == BATCH else pending[kind][-1])
+
+            for func, args, kwargs in calls:
+                func(*args, **kwargs)
+        finally:
+            # Keep polling even if a handler raised
+            self._after_id = self.root.after(self.interval_ms, self._drain)